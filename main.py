@@ -6,13 +6,19 @@ my--father-mother: lightweight local clipboard long-term memory.
 from __future__ import annotations
 
 import argparse
+import contextlib
+import functools
+import heapq
+import operator
 import hashlib
 import json
+import math
 import os
 import re
 import platform
+import queue
 import http.server
-import socketserver
+import threading
 import urllib.parse
 import urllib.request
 import sqlite3
@@ -20,10 +26,29 @@ import subprocess
 import sys
 import time
 import shutil
+import zlib
+from array import array
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timezone, timedelta
 from pathlib import Path
-from typing import Optional, Tuple, Iterable, Dict
+from typing import Callable, Optional, Tuple, Iterable, Dict
+
+try:  # optional: faster JSON encoding for the HTTP API (pip install orjson)
+    import orjson
+except ImportError:
+    orjson = None
+
+try:  # optional: vectorized top-k for semantic search (pip install numpy)
+    import numpy as np
+except ImportError:
+    np = None
+
+try:  # optional: one-pass multi-pattern secret scan (pip install hyperscan)
+    import hyperscan
+except ImportError:
+    hyperscan = None
 
 DB_DIR = Path.home() / ".my-father-mother"
 DB_PATH = DB_DIR / "mfm.db"
@@ -110,6 +135,13 @@ SECRET_PATTERNS = [
     re.compile(r"(?i)password[^a-z0-9]?[:=][^\\s]{6,}"),
 ]
 
+# A literal each SECRET_PATTERNS entry (same order) must contain, casefolded.
+# One lowercase copy plus substring checks is much cheaper than running every
+# regex over every clip, and only patterns whose anchor occurs get a regex pass.
+SECRET_ANCHORS = ("akia", "asia", "aws", "ghp_", "xox", "-----begin", "ssh-rsa", "apikey", "password")
+# re's IGNORECASE also matches dotless i and long s against i / s
+_ANCHOR_FOLD = str.maketrans("\u0131\u017f", "is")
+
 
 def say(persona: str, message: str) -> None:
     """Print a message with persona prefix."""
@@ -133,21 +165,174 @@ def toast(title: str, text: str) -> None:
 
 
 # ---------- Database setup ----------
-def connect_db() -> sqlite3.Connection:
+class Connection(sqlite3.Connection):
+    """sqlite3 connection that can carry per-connection state."""
+
+    pragmas_done = False
+    # get_or_create_tag cache; dropped with the config cache, since sync pull
+    # and restore can swap the database under a long-lived connection
+    tag_ids: Optional[dict[str, int]] = None
+    # settings/blocklist tables mirrored in memory; see config_cache()
+    config: Optional[dict[str, object]] = None
+    config_generation = -1
+    config_version = -1
+    config_checked = 0.0
+
+
+def tune_connection(conn: sqlite3.Connection) -> None:
+    if getattr(conn, "pragmas_done", False):
+        return
+    conn.execute("PRAGMA journal_mode=WAL;")
+    conn.execute("PRAGMA synchronous=NORMAL;")
+    conn.execute("PRAGMA mmap_size=268435456;")  # 256 MB
+    conn.execute("PRAGMA cache_size=-65536;")  # 64 MB
+    conn.execute("PRAGMA temp_store=MEMORY;")
+    if isinstance(conn, Connection):
+        conn.pragmas_done = True
+
+
+def connect_db(check_same_thread: bool = True, readonly: bool = False) -> sqlite3.Connection:
     DB_DIR.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
+    target = f"{DB_PATH.as_uri()}?mode=ro" if readonly else DB_PATH
+    conn = sqlite3.connect(
+        target, uri=readonly, cached_statements=256, factory=Connection, check_same_thread=check_same_thread
+    )
     conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA journal_mode=WAL;")
+    tune_connection(conn)
     conn.execute("PRAGMA foreign_keys=ON;")
     return conn
 
 
+class ReadPool:
+    """Read-only connections reused across server request threads.
+
+    Connections are opened on demand up to ``size``; once all are checked out,
+    acquire() waits for one to be released.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.idle: queue.LifoQueue = queue.LifoQueue()
+        self.opened = 0
+        self.lock = threading.Lock()
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            grow = self.opened < self.size
+            if grow:
+                self.opened += 1
+        if not grow:
+            return self.idle.get()
+        try:
+            return connect_db(check_same_thread=False, readonly=True)
+        except Exception:
+            with self.lock:
+                self.opened -= 1
+            raise
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        self.idle.put(conn)
+
+    def close(self) -> None:
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
 def column_exists(conn: sqlite3.Connection, table: str, column: str) -> bool:
     cur = conn.execute(f"PRAGMA table_info({table})")
     return any(row["name"] == column for row in cur.fetchall())
 
 
+# Database files this process has already created/migrated; init_db is a no-op
+# for them. In-memory databases are always initialized.
+_DB_READY: set[str] = set()
+
+# In-memory databases (tests, scratch copies) have nothing to make durable.
+EPHEMERAL_PRAGMAS = "PRAGMA journal_mode=MEMORY; PRAGMA synchronous=OFF; PRAGMA temp_store=MEMORY; PRAGMA locking_mode=EXCLUSIVE;"
+
+
+# Keep clips_fts in step with clips (see bulk_insert_context for the batch path).
+FTS_TRIGGERS_SQL = (
+    """
+    CREATE TRIGGER IF NOT EXISTS clips_ai AFTER INSERT ON clips BEGIN
+        INSERT INTO clips_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS clips_ad AFTER DELETE ON clips BEGIN
+        INSERT INTO clips_fts(clips_fts, rowid, content) VALUES('delete', old.id, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS clips_au AFTER UPDATE ON clips BEGIN
+        INSERT INTO clips_fts(clips_fts, rowid, content) VALUES('delete', old.id, old.content);
+        INSERT INTO clips_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+)
+FTS_TRIGGER_NAMES = ("clips_ai", "clips_ad", "clips_au")
+
+
+# Small keyed tables are stored WITHOUT ROWID: the primary key is the table's
+# only B-tree instead of a rowid table plus a separate key index.
+SETTINGS_DDL = """
+    CREATE TABLE IF NOT EXISTS {name} (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    ) WITHOUT ROWID
+"""
+BLOCKLIST_DDL = """
+    CREATE TABLE IF NOT EXISTS {name} (
+        app TEXT PRIMARY KEY
+    ) WITHOUT ROWID
+"""
+CLIP_TAGS_DDL = """
+    CREATE TABLE IF NOT EXISTS {name} (
+        clip_id INTEGER NOT NULL,
+        tag_id INTEGER NOT NULL,
+        PRIMARY KEY (clip_id, tag_id),
+        FOREIGN KEY (clip_id) REFERENCES clips(id) ON DELETE CASCADE,
+        FOREIGN KEY (tag_id) REFERENCES tags(id) ON DELETE CASCADE
+    ) WITHOUT ROWID
+"""
+
+
+def migrate_without_rowid(conn: sqlite3.Connection, table: str, ddl: str, columns: str) -> None:
+    """Copy a table created by an older schema into its WITHOUT ROWID form."""
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()[0]
+    if "WITHOUT ROWID" in sql.upper():
+        return
+    conn.commit()
+    conn.executescript(
+        f"""
+        BEGIN;
+        {ddl.format(name=table + "_new")};
+        INSERT INTO {table}_new ({columns}) SELECT {columns} FROM {table};
+        DROP TABLE {table};
+        ALTER TABLE {table}_new RENAME TO {table};
+        COMMIT;
+        """
+    )
+
+
+def database_file(conn: sqlite3.Connection) -> str:
+    return conn.execute("PRAGMA database_list").fetchone()[2]
+
+
 def init_db(conn: sqlite3.Connection) -> None:
+    tune_connection(conn)
+    db_file = database_file(conn)
+    if not db_file:
+        conn.executescript(EPHEMERAL_PRAGMAS)
+    if db_file in _DB_READY:
+        return
     conn.executescript(
         """
         CREATE TABLE IF NOT EXISTS clips (
@@ -162,38 +347,22 @@ def init_db(conn: sqlite3.Connection) -> None:
 
         CREATE INDEX IF NOT EXISTS idx_clips_hash ON clips(hash);
         CREATE INDEX IF NOT EXISTS idx_clips_created_at ON clips(created_at);
+        CREATE INDEX IF NOT EXISTS idx_clips_app_created ON clips(LOWER(source_app), created_at);
 
         CREATE VIRTUAL TABLE IF NOT EXISTS clips_fts USING fts5(
             content,
             content='clips',
             content_rowid='id'
         );
-
-        CREATE TRIGGER IF NOT EXISTS clips_ai AFTER INSERT ON clips BEGIN
-            INSERT INTO clips_fts(rowid, content) VALUES (new.id, new.content);
-        END;
-
-        CREATE TRIGGER IF NOT EXISTS clips_ad AFTER DELETE ON clips BEGIN
-            INSERT INTO clips_fts(clips_fts, rowid, content) VALUES('delete', old.id, old.content);
-        END;
-
-        CREATE TRIGGER IF NOT EXISTS clips_au AFTER UPDATE ON clips BEGIN
-            INSERT INTO clips_fts(clips_fts, rowid, content) VALUES('delete', old.id, old.content);
-            INSERT INTO clips_fts(rowid, content) VALUES (new.id, new.content);
-        END;
-
-        CREATE TABLE IF NOT EXISTS settings (
-            key TEXT PRIMARY KEY,
-            value TEXT NOT NULL
-        );
-
-        CREATE TABLE IF NOT EXISTS blocklist (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            app TEXT UNIQUE NOT NULL
-        );
         """
     )
+    conn.execute(SETTINGS_DDL.format(name="settings"))
+    conn.execute(BLOCKLIST_DDL.format(name="blocklist"))
+    for trigger in FTS_TRIGGERS_SQL:
+        conn.execute(trigger)
     # migrations
+    migrate_without_rowid(conn, "settings", SETTINGS_DDL, "key, value")
+    migrate_without_rowid(conn, "blocklist", BLOCKLIST_DDL, "app")
     if not column_exists(conn, "clips", "pinned"):
         conn.execute("ALTER TABLE clips ADD COLUMN pinned INTEGER NOT NULL DEFAULT 0")
     if not column_exists(conn, "clips", "title"):
@@ -220,7 +389,7 @@ def init_db(conn: sqlite3.Connection) -> None:
         CREATE TABLE IF NOT EXISTS clip_vectors (
             clip_id INTEGER PRIMARY KEY,
             dim INTEGER NOT NULL,
-            vector TEXT NOT NULL,
+            vector BLOB NOT NULL,
             model TEXT NOT NULL DEFAULT 'hash',
             FOREIGN KEY (clip_id) REFERENCES clips(id) ON DELETE CASCADE
         );
@@ -228,6 +397,35 @@ def init_db(conn: sqlite3.Connection) -> None:
     )
     if not column_exists(conn, "clip_vectors", "model"):
         conn.execute("ALTER TABLE clip_vectors ADD COLUMN model TEXT NOT NULL DEFAULT 'hash'")
+    # VectorIndex.refresh's per-model COUNT/MAX and clip_id > ? reads stay off the BLOB pages
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_clip_vectors_model ON clip_vectors(model, clip_id)")
+    if get_setting(conn, "vector_format") != "f32":
+        # vectors used to be stored as JSON text; repack them once as float32 BLOBs
+        legacy = conn.execute("SELECT clip_id, vector FROM clip_vectors WHERE typeof(vector) = 'text'").fetchall()
+        conn.executemany(
+            "UPDATE clip_vectors SET vector = ? WHERE clip_id = ?",
+            [(vector_array(data).tobytes(), clip_id) for clip_id, data in legacy],
+        )
+        set_setting(conn, "vector_format", "f32")
+    if get_setting(conn, "hash_embed") != "crc32":
+        # hash vectors from before crc32 bucketing used salted str hashes; rebuild them
+        last_id = 0
+        while True:
+            rows = conn.execute(
+                """
+                SELECT v.clip_id, c.content FROM clip_vectors v JOIN clips c ON c.id = v.clip_id
+                WHERE v.model = 'hash' AND v.clip_id > ? ORDER BY v.clip_id LIMIT 1000
+                """,
+                (last_id,),
+            ).fetchall()
+            if not rows:
+                break
+            conn.executemany(
+                "UPDATE clip_vectors SET dim = ?, vector = ? WHERE clip_id = ?",
+                [(EMBED_DIM, pack_vector(hash_embed(content)), clip_id) for clip_id, content in rows],
+            )
+            last_id = rows[-1][0]
+        set_setting(conn, "hash_embed", "crc32")
 
     conn.executescript(
         """
@@ -235,17 +433,12 @@ def init_db(conn: sqlite3.Connection) -> None:
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             name TEXT UNIQUE NOT NULL
         );
-        CREATE TABLE IF NOT EXISTS clip_tags (
-            clip_id INTEGER NOT NULL,
-            tag_id INTEGER NOT NULL,
-            PRIMARY KEY (clip_id, tag_id),
-            FOREIGN KEY (clip_id) REFERENCES clips(id) ON DELETE CASCADE,
-            FOREIGN KEY (tag_id) REFERENCES tags(id) ON DELETE CASCADE
-        );
-        CREATE INDEX IF NOT EXISTS idx_clip_tags_clip ON clip_tags(clip_id);
-        CREATE INDEX IF NOT EXISTS idx_clip_tags_tag ON clip_tags(tag_id);
         """
     )
+    conn.execute(CLIP_TAGS_DDL.format(name="clip_tags"))
+    migrate_without_rowid(conn, "clip_tags", CLIP_TAGS_DDL, "clip_id, tag_id")
+    # the (clip_id, tag_id) key already serves clip_id lookups
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_clip_tags_tag ON clip_tags(tag_id)")
     conn.executescript(
         """
         CREATE TABLE IF NOT EXISTS clip_notes (
@@ -271,6 +464,8 @@ def init_db(conn: sqlite3.Connection) -> None:
         """
     )
     conn.commit()
+    if db_file:
+        _DB_READY.add(db_file)
 
 
 # ---------- Clipboard + metadata ----------
@@ -315,6 +510,22 @@ def frontmost_app_and_window() -> Tuple[str, str]:
 
 
 # ---------- Persistence helpers ----------
+# Write statements shared by the single-row and batch helpers: one SQL text per
+# write keeps each on a single prepared statement in the connection's cache.
+INSERT_CLIP_SQL = """
+        INSERT INTO clips (created_at, source_app, window_title, content, hash, title, pinned, file_path, lang)
+        VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?)
+    """
+UPSERT_VECTOR_SQL = (
+    "INSERT INTO clip_vectors(clip_id, dim, vector, model) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT(clip_id) DO UPDATE SET dim=excluded.dim, vector=excluded.vector, model=excluded.model"
+)
+INSERT_EVENT_SQL = "INSERT INTO clip_events (clip_id, seen_at) VALUES (?, ?)"
+INSERT_CLIP_TAG_SQL = "INSERT OR IGNORE INTO clip_tags(clip_id, tag_id) VALUES (?, ?)"
+INSERT_NOTE_SQL = "INSERT INTO clip_notes (clip_id, note, created_at) VALUES (?, ?, ?)"
+INSERT_COPILOT_SQL = "INSERT INTO copilot_chats (created_at, title, model, content) VALUES (?, ?, ?, ?)"
+
+
 def clip_exists(conn: sqlite3.Connection, digest: str) -> bool:
     cur = conn.execute("SELECT 1 FROM clips WHERE hash = ? ORDER BY id DESC LIMIT 1", (digest,))
     return cur.fetchone() is not None
@@ -326,6 +537,23 @@ def get_clip_id_by_hash(conn: sqlite3.Connection, digest: str) -> Optional[int]:
     return row["id"] if row else None
 
 
+# Batched IN (...) lookups bind at most this many ids per statement, keeping
+# under SQLite's historic 999-variable limit and bounding the distinct
+# statement texts the cache has to hold.
+SQL_IN_CHUNK = 500
+
+
+def clip_ids_by_hash(conn: sqlite3.Connection, digests: list[str]) -> dict[str, int]:
+    """Batch form of get_clip_id_by_hash: newest clip id per known digest."""
+    found: dict[str, int] = {}
+    for start in range(0, len(digests), SQL_IN_CHUNK):
+        chunk = digests[start : start + SQL_IN_CHUNK]
+        marks = ",".join("?" * len(chunk))
+        cur = conn.execute(f"SELECT hash, MAX(id) FROM clips WHERE hash IN ({marks}) GROUP BY hash", chunk)
+        found.update(cur.fetchall())
+    return found
+
+
 def insert_clip(
     conn: sqlite3.Connection,
     content: str,
@@ -343,57 +571,13 @@ def insert_clip(
     if clip_exists(conn, digest):
         return None
     lang = detect_language(clean)
-    created_at = datetime.now(timezone.utc).isoformat()
-    cur = conn.execute(
-        """
-        INSERT INTO clips (created_at, source_app, window_title, content, hash, title, pinned, file_path, lang)
-        VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?)
-        """,
-        (created_at, app, window, clean, digest, title, file_path, lang),
-    )
-    conn.commit()
-    clip_id = cur.lastrowid
     vec, model = embed_text(conn, clean, embedder_override)
-    store_embedding(conn, clip_id, vec, model)
-    return clip_id
-
-
-def insert_clip_import(
-    conn: sqlite3.Connection,
-    content: str,
-    app: str,
-    window: str,
-    created_at: Optional[str],
-    pinned: bool,
-    title: Optional[str],
-    file_path: Optional[str],
-    lang: Optional[str],
-    tags: Optional[list[str]],
-) -> Optional[int]:
-    clean = content.strip()
-    if not clean:
-        return None
-    digest = hashlib.sha256(clean.encode("utf-8")).hexdigest()
-    existing = get_clip_id_by_hash(conn, digest)
-    if existing:
-        insert_event(conn, existing)
-        return existing
-    created = created_at or datetime.now(timezone.utc).isoformat()
-    lang_val = lang or detect_language(clean)
-    cur = conn.execute(
-        """
-        INSERT INTO clips (created_at, source_app, window_title, content, hash, title, pinned, file_path, lang)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """,
-        (created, app, window, clean, digest, title, 1 if pinned else 0, file_path, lang_val),
-    )
-    conn.commit()
-    clip_id = cur.lastrowid
-    vec, model = embed_text(conn, clean, None)
-    store_embedding(conn, clip_id, vec, model)
-    if tags:
-        for t in tags:
-            assign_tag(conn, clip_id, t)
+    created_at = datetime.now(timezone.utc).isoformat()
+    # the clip and its vector commit together (store_embedding's commit)
+    with conn:
+        cur = conn.execute(INSERT_CLIP_SQL, (created_at, app, window, clean, digest, title, file_path, lang))
+        clip_id = cur.lastrowid
+        store_embedding(conn, clip_id, vec, model)
     return clip_id
 
 
@@ -405,17 +589,20 @@ def export_items(
     since_iso: Optional[str] = None,
     pins_only: bool = False,
 ) -> list[dict]:
-    rows_db, tag_map = filtered_rows(
-        conn,
-        limit,
-        app=app,
-        contains=None,
-        tag=tag,
-        pins_only=pins_only,
-        since_iso=since_iso,
-        until_iso=None,
-    )
-    notes_map = notes_for_clips(conn, [row["id"] for row in rows_db])
+    if not (app or tag or since_iso or pins_only):
+        rows_db, tag_map, notes_map = recent_annotated_rows(conn, limit)
+    else:
+        rows_db, tag_map = filtered_rows(
+            conn,
+            limit,
+            app=app,
+            contains=None,
+            tag=tag,
+            pins_only=pins_only,
+            since_iso=since_iso,
+            until_iso=None,
+        )
+        notes_map = notes_for_clips(conn, [row["id"] for row in rows_db])
     items = []
     for row in rows_db:
         items.append(
@@ -458,16 +645,12 @@ def ingest_text(
         embedder_override=embedder_override,
     )
     if clip_id and tags:
-        for t in tags:
-            assign_tag(conn, clip_id, t)
+        assign_tags(conn, clip_id, tags)
     return clip_id
 
 
 def insert_event(conn: sqlite3.Connection, clip_id: int) -> None:
-    conn.execute(
-        "INSERT INTO clip_events (clip_id, seen_at) VALUES (?, ?)",
-        (clip_id, datetime.now(timezone.utc).isoformat()),
-    )
+    conn.execute(INSERT_EVENT_SQL, (clip_id, datetime.now(timezone.utc).isoformat()))
     conn.commit()
 
 
@@ -656,10 +839,59 @@ def sync_pull(target: str) -> tuple[bool, str]:
         shutil.copy2(DB_PATH, backup)
     DB_DIR.mkdir(parents=True, exist_ok=True)
     shutil.copy2(src, DB_PATH)
+    _DB_READY.discard(str(DB_PATH))  # the pulled copy may predate current migrations
+    mark_config_changed()
     return True, f"pulled db from {src}"
 
 
+# Bumped whenever this process writes settings or the blocklist, so every
+# connection in the process drops its config_cache on the next read.
+_CONFIG_GENERATION = 0
+# Writes from other processes are noticed via PRAGMA data_version, checked at
+# most this often per connection.
+CONFIG_RECHECK_SECS = 1.0
+
+
+def mark_config_changed() -> None:
+    global _CONFIG_GENERATION
+    _CONFIG_GENERATION += 1
+
+
+def config_cache(conn: sqlite3.Connection) -> Optional[dict[str, object]]:
+    """Per-connection memo for the settings and blocklist tables (None for plain connections)."""
+    if not isinstance(conn, Connection):
+        return None
+    now = time.monotonic()
+    cache = conn.config
+    if cache is not None and conn.config_generation == _CONFIG_GENERATION:
+        if now - conn.config_checked < CONFIG_RECHECK_SECS:
+            return cache
+        conn.config_checked = now
+        if conn.execute("PRAGMA data_version").fetchone()[0] == conn.config_version:
+            return cache
+    conn.config = cache = {}
+    conn.tag_ids = None
+    conn.config_generation = _CONFIG_GENERATION
+    conn.config_version = conn.execute("PRAGMA data_version").fetchone()[0]
+    conn.config_checked = now
+    return cache
+
+
+def cached_settings(conn: sqlite3.Connection) -> Optional[dict[str, str]]:
+    """Whole settings table held on a Connection, or None for plain connections."""
+    cache = config_cache(conn)
+    if cache is None:
+        return None
+    settings = cache.get("settings")
+    if settings is None:
+        settings = cache["settings"] = dict(conn.execute("SELECT key, value FROM settings").fetchall())
+    return settings
+
+
 def get_setting(conn: sqlite3.Connection, key: str, default: str = "") -> str:
+    cache = cached_settings(conn)
+    if cache is not None:
+        return cache.get(key, default)
     cur = conn.execute("SELECT value FROM settings WHERE key = ?", (key,))
     row = cur.fetchone()
     return row["value"] if row else default
@@ -671,17 +903,20 @@ def set_setting(conn: sqlite3.Connection, key: str, value: str) -> None:
         (key, value),
     )
     conn.commit()
+    mark_config_changed()
+
+
+_BOOL_VALUES = {"1": True, "true": True, "yes": True, "on": True, "0": False, "false": False, "no": False, "off": False}
 
 
 def parse_bool_value(value: str) -> Optional[bool]:
     if value is None:
         return None
-    val = str(value).strip().lower()
-    if val in ("1", "true", "yes", "on"):
-        return True
-    if val in ("0", "false", "no", "off"):
-        return False
-    return None
+    if isinstance(value, str):
+        parsed = _BOOL_VALUES.get(value)  # stored settings are already "1"/"0"
+        if parsed is not None:
+            return parsed
+    return _BOOL_VALUES.get(str(value).strip().lower())
 
 
 def get_bool_setting(conn: sqlite3.Connection, key: str, default: bool) -> bool:
@@ -876,9 +1111,14 @@ def set_paused(conn: sqlite3.Connection, paused: bool) -> None:
     set_setting(conn, "paused", "1" if paused else "0")
 
 
-def get_blocklist(conn: sqlite3.Connection) -> set[str]:
-    cur = conn.execute("SELECT app FROM blocklist")
-    return {row["app"] for row in cur.fetchall()}
+def get_blocklist(conn: sqlite3.Connection) -> frozenset[str]:
+    cache = config_cache(conn)
+    if cache is not None and "blocklist" in cache:
+        return cache["blocklist"]
+    apps = frozenset(row[0] for row in conn.execute("SELECT app FROM blocklist"))
+    if cache is not None:
+        cache["blocklist"] = apps
+    return apps
 
 
 def add_blocked_app(conn: sqlite3.Connection, app: str) -> bool:
@@ -887,6 +1127,7 @@ def add_blocked_app(conn: sqlite3.Connection, app: str) -> bool:
         return False
     conn.execute("INSERT OR IGNORE INTO blocklist(app) VALUES (?)", (app_norm,))
     conn.commit()
+    mark_config_changed()
     return True
 
 
@@ -894,6 +1135,7 @@ def remove_blocked_app(conn: sqlite3.Connection, app: str) -> bool:
     app_norm = app.strip().lower()
     cur = conn.execute("DELETE FROM blocklist WHERE app = ?", (app_norm,))
     conn.commit()
+    mark_config_changed()
     return cur.rowcount > 0
 
 
@@ -953,16 +1195,43 @@ def set_evict_mode(conn: sqlite3.Connection, mode: str) -> None:
     set_setting(conn, "evict_mode", mode_norm)
 
 
+def secret_candidates(text: str) -> list[re.Pattern]:
+    """SECRET_PATTERNS whose anchor literal occurs in text; the rest cannot match."""
+    folded = text.lower().translate(_ANCHOR_FOLD)
+    return [pat for anchor, pat in zip(SECRET_ANCHORS, SECRET_PATTERNS) if anchor in folded]
+
+
+@functools.lru_cache(maxsize=1)
+def secret_scanner():
+    """Hyperscan database of SECRET_PATTERNS, or None to fall back to re."""
+    if hyperscan is None:
+        return None
+    count = len(SECRET_PATTERNS)
+    try:
+        db = hyperscan.Database()
+        db.compile(
+            expressions=[pat.pattern.encode("utf-8") for pat in SECRET_PATTERNS],
+            ids=list(range(count)),
+            elements=count,
+            flags=[hyperscan.HS_FLAG_SINGLEMATCH | hyperscan.HS_FLAG_UTF8] * count,
+        )
+    except Exception:
+        return None  # a pattern this hyperscan build rejects; keep the re path
+    return db
+
+
 def looks_like_secret(text: str) -> bool:
-    for pat in SECRET_PATTERNS:
-        if pat.search(text):
-            return True
-    return False
+    db = secret_scanner()
+    if db is not None:
+        hits: list[int] = []
+        db.scan(text.encode("utf-8", errors="ignore"), match_event_handler=lambda pattern_id, *_: hits.append(pattern_id))
+        return bool(hits)
+    return any(pat.search(text) for pat in secret_candidates(text))
 
 
 def redact_secrets(text: str) -> str:
     redacted = text
-    for pat in SECRET_PATTERNS:
+    for pat in secret_candidates(text):
         redacted = pat.sub("[REDACTED]", redacted)
     return redacted
 
@@ -1005,9 +1274,19 @@ def set_allow_images(conn: sqlite3.Connection, allow: bool) -> None:
 
 def parse_iso_dt(val: str) -> Optional[str]:
     try:
-        return datetime.fromisoformat(val).isoformat()
+        parsed = datetime.fromisoformat(val)
     except Exception:
         return None
+    # Canonical YYYY-MM-DDTHH:MM:SS[+HH:MM] input (what isoformat() emits) is
+    # returned as-is; re-rendering it, offset included, costs more than the parse.
+    if (
+        (len(val) == 19 or len(val) == 25 and val[19] == "+" and val[22] == ":" and val[23] < "6")
+        and val[4] == val[7] == "-"
+        and val[10] == "T"
+        and val[13] == val[16] == ":"
+    ):
+        return val
+    return parsed.isoformat()
 
 
 def iso_hours_ago(hours: Optional[float]) -> Optional[str]:
@@ -1055,26 +1334,34 @@ def set_embedder(conn: sqlite3.Connection, name: str) -> None:
     set_setting(conn, "embedder", kind)
 
 
+_TOKEN_RE = re.compile(r"[A-Za-z0-9_]+")
+# Same tokens as _TOKEN_RE, matched on the encoded text (only ASCII bytes match).
+_TOKEN_BYTES_RE = re.compile(rb"[A-Za-z0-9_]+")
+
+
 def tokenize(text: str) -> list[str]:
-    return re.findall(r"[A-Za-z0-9_]+", text.lower())
+    return _TOKEN_RE.findall(text.lower())
 
 
 def hash_embed(text: str, dim: int = EMBED_DIM) -> list[float]:
+    # [0.0] * dim is a single C-level fill; an array("f") buffer plus tolist()
+    # costs several times more and would round query vectors to float32.
     vec = [0.0] * dim
-    tokens = tokenize(text)
+    tokens = _TOKEN_BYTES_RE.findall(text.lower().encode("utf-8", "surrogatepass"))
     if not tokens:
         return vec
-    for tok in tokens:
-        h = hash(tok)
-        idx = h % dim
-        vec[idx] += 1.0
-    norm = sum(v * v for v in vec) ** 0.5
-    if norm > 0:
-        vec = [v / norm for v in vec]
+    # crc32 is about as cheap as hash() but, unlike str hashing, is not salted
+    # per process, so stored vectors stay comparable with later queries.
+    # Bucket counts are small ints, so squaring and scaling only the touched
+    # buckets is exact.
+    counts = Counter([zlib.crc32(tok) % dim for tok in tokens])
+    norm = sum(count * count for count in counts.values()) ** 0.5
+    for idx, count in counts.items():
+        vec[idx] = count / norm
     return vec
 
 
-def e5_embed(text: str) -> Optional[list[float]]:
+def _e5_model():
     global _E5_MODEL, _E5_FAILED
     if _E5_FAILED:
         return None
@@ -1089,29 +1376,117 @@ def e5_embed(text: str) -> Optional[list[float]]:
         except Exception:
             _E5_FAILED = True
             return None
+    return _E5_MODEL
+
+
+def e5_embed_batch(texts: list[str]) -> Optional[list[list[float]]]:
+    global _E5_FAILED
+    model = _e5_model()
+    if model is None:
+        return None
     try:
-        vec = _E5_MODEL.encode(
-            f"passage: {text}",
+        mat = model.encode(
+            [f"passage: {text}" for text in texts],
             normalize_embeddings=True,
             convert_to_numpy=True,
             show_progress_bar=False,
         )
-        return vec.tolist()
+        return mat.tolist()
     except Exception:
         _E5_FAILED = True
         return None
 
 
+def e5_embed(text: str) -> Optional[list[float]]:
+    vecs = e5_embed_batch([text])
+    return vecs[0] if vecs else None
+
+
 def embed_from_kind(kind: str, text: str) -> tuple[list[float], str]:
+    vecs, model = embed_batch(kind, [text])
+    return vecs[0], model
+
+
+def embed_batch(kind: str, texts: list[str]) -> tuple[list[list[float]], str]:
     global _EMBEDDER_WARNED
     if kind == "e5-small":
-        vec = e5_embed(text)
-        if vec:
-            return vec, "e5-small"
+        vecs = e5_embed_batch(texts)
+        if vecs:
+            return vecs, "e5-small"
         if not _EMBEDDER_WARNED:
             say(FATHER, "embedder 'e5-small' unavailable; falling back to hash (pip install sentence-transformers)")
             _EMBEDDER_WARNED = True
-    return hash_embed(text), "hash"
+    return [hash_embed(text) for text in texts], "hash"
+
+
+class EmbedBatcher:
+    """Coalesce concurrent query embeds into one batched model call."""
+
+    BATCH_MAX = 16
+    WINDOW_S = 0.010
+
+    def __init__(self) -> None:
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="mfm-embed-batcher", daemon=True)
+        self._thread.start()
+
+    def embed(self, kind: str, text: str) -> tuple[list[float], str]:
+        if kind != "e5-small":
+            # hash embeds are cheaper than the coalescing window itself
+            return embed_from_kind(kind, text)
+        done = threading.Event()
+        slot: list = []
+        self._queue.put((kind, text, done, slot))
+        done.wait()
+        if not slot:
+            return embed_from_kind(kind, text)
+        return slot[0]
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.WINDOW_S
+            while len(batch) < self.BATCH_MAX:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            by_kind: dict[str, list] = {}
+            for job in batch:
+                by_kind.setdefault(job[0], []).append(job)
+            for kind, jobs in by_kind.items():
+                try:
+                    vecs, model = embed_batch(kind, [job[1] for job in jobs])
+                    for job, vec in zip(jobs, vecs):
+                        job[3].append((vec, model))
+                except Exception as e:
+                    # callers find their slot empty and embed on their own
+                    say(FATHER, f"batched embed failed ({kind}, {len(jobs)} queries): {e}")
+                finally:
+                    for job in jobs:
+                        job[2].set()
+
+
+_EMBED_BATCHER: Optional[EmbedBatcher] = None
+_EMBED_BATCHER_LOCK = threading.Lock()
+
+
+def get_embed_batcher() -> EmbedBatcher:
+    global _EMBED_BATCHER
+    with _EMBED_BATCHER_LOCK:
+        if _EMBED_BATCHER is None:
+            _EMBED_BATCHER = EmbedBatcher()
+        return _EMBED_BATCHER
+
+
+@functools.lru_cache(maxsize=1024)
+def cached_query_embed(kind: str, text: str) -> tuple[tuple[float, ...], str]:
+    """Query embedding memoized per (embedder, text); tuples keep cached vectors immutable."""
+    vec, model = get_embed_batcher().embed(kind, text)
+    return tuple(vec), model
 
 
 def embed_text(conn: sqlite3.Connection, text: str, embedder_override: Optional[str] = None) -> tuple[list[float], str]:
@@ -1120,76 +1495,284 @@ def embed_text(conn: sqlite3.Connection, text: str, embedder_override: Optional[
 
 
 def store_embedding(conn: sqlite3.Connection, clip_id: int, vec: list[float], model: str) -> None:
-    conn.execute(
-        "INSERT INTO clip_vectors(clip_id, dim, vector, model) VALUES (?, ?, ?, ?) ON CONFLICT(clip_id) DO UPDATE SET dim=excluded.dim, vector=excluded.vector, model=excluded.model",
-        (clip_id, len(vec), json.dumps(vec), model),
-    )
+    conn.execute(UPSERT_VECTOR_SQL, (clip_id, len(vec), pack_vector(vec), model))
     conn.commit()
+    if _VECTOR_INDEXES:
+        index = _VECTOR_INDEXES.get((database_file(conn), model))
+        if index is not None:
+            index.add(clip_id, vec)
 
 
-def load_embedding(row) -> list[float]:
+def pack_vector(vec: Iterable[float]) -> bytes:
+    """clip_vectors.vector payload: packed float32 in native byte order."""
+    return array("f", vec).tobytes()
+
+
+def vector_array(data) -> array:
+    """Decode a stored vector; rows written before the BLOB format hold JSON text."""
+    vec = array("f")
+    if isinstance(data, bytes):
+        vec.frombytes(data)
+        return vec
     try:
-        return json.loads(row["vector"])
+        vec.extend(json.loads(data))
     except Exception:
-        return []
+        pass
+    return vec
+
+
+def load_embedding(row) -> list[float]:
+    return vector_array(row["vector"]).tolist()
+
+
+def _dot_fallback(a: Iterable[float], b: Iterable[float]) -> float:
+    return sum(map(operator.mul, a, b))
+
 
+# Pure-Python dot product for knn without numpy: math.sumprod (3.12+) runs
+# the loop in C, about 3-4x faster than map/sum.
+_dot = getattr(math, "sumprod", _dot_fallback)
 
-def cosine(a: list[float], b: list[float]) -> float:
-    return sum(x * y for x, y in zip(a, b))
 
+def cosine(a: Iterable[float], b: Iterable[float]) -> float:
+    return _dot(a, b)
 
-def build_ann_index(rows: Iterable[sqlite3.Row]) -> tuple[list[int], list[list[float]]]:
+
+def build_ann_index(rows: Iterable[sqlite3.Row]) -> tuple[list[int], list[array]]:
     ids = []
     vecs = []
     for row in rows:
-        vec = load_embedding(row)
+        vec = vector_array(row["vector"])
         if vec:
             ids.append(row["id"])
             vecs.append(vec)
     return ids, vecs
 
 
-def knn(query: list[float], ids: list[int], vecs: list[list[float]], limit: int) -> list[tuple[float, int]]:
-    sims = []
-    for cid, vec in zip(ids, vecs):
-        sims.append((cosine(query, vec), cid))
-    sims.sort(key=lambda x: x[0], reverse=True)
-    return sims[:limit]
+def knn(query: list[float], ids: list[int], vecs: list, limit: int) -> list[tuple[float, int]]:
+    if not ids or limit <= 0:
+        return []
+    if np is not None:
+        if isinstance(vecs[0], array):
+            # float32 rows (fetched or indexed) concatenate straight into one matrix
+            mat = np.frombuffer(b"".join(vecs), dtype=np.float32).reshape(len(vecs), -1)
+        else:
+            mat = np.asarray(vecs, dtype=np.float32)
+        sims = mat @ np.asarray(query, dtype=np.float32)
+        k = min(limit, len(ids))
+        # O(n) selection of the k-th best score; everything at or above it is
+        # then sorted stably, so ties at the cut keep input order like nlargest
+        kth = np.partition(sims, len(sims) - k)[len(sims) - k]
+        top = np.flatnonzero(sims >= kth)
+        top = top[np.argsort(-sims[top], kind="stable")][:k]
+        return [(float(sims[i]), ids[i]) for i in top]
+    nonzero = [i for i, x in enumerate(query) if x]
+    if len(nonzero) * 2 <= len(query):
+        # Hash-embedded queries touch only a few buckets; skipping the zero terms
+        # gives the same sums for a fraction of the multiplications.
+        if not nonzero:
+            scored = ((0.0, cid) for cid in ids)
+        else:
+            weights = [query[i] for i in nonzero]
+            pick = operator.itemgetter(*nonzero) if len(nonzero) > 1 else (lambda vec: (vec[nonzero[0]],))
+            scored = ((_dot(weights, pick(vec)), cid) for cid, vec in zip(ids, vecs))
+    else:
+        scored = ((cosine(query, vec), cid) for cid, vec in zip(ids, vecs))
+    # nlargest keeps sorted()'s tie order without sorting the whole pool
+    return heapq.nlargest(limit, scored, key=operator.itemgetter(0))
+
+
+class VectorIndex:
+    """In-process copy of one model's vectors, kept current with clip_vectors.
+
+    Vectors are held as float32 arrays (about an eighth of the memory of float
+    lists). New vectors are appended on refresh; deletes or model switches
+    trigger a full reload into a fresh dict that is swapped in, so concurrent
+    searches never see a half-built index. Lookups only score the candidate ids
+    they are given.
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        self.vecs: dict[int, array] = {}
+        self.signature = (0, 0)
+        self.loaded = False
+        self.lock = threading.Lock()
+
+    def refresh(self, conn: sqlite3.Connection) -> None:
+        with self.lock:
+            count, max_id = conn.execute(
+                "SELECT COUNT(*), COALESCE(MAX(clip_id), 0) FROM clip_vectors WHERE model = ?", (self.model,)
+            ).fetchone()
+            if (count, max_id) == self.signature:
+                self.loaded = True
+                return
+            old_count, old_max = self.signature
+            sql = "SELECT clip_id AS id, vector FROM clip_vectors WHERE model = ? AND clip_id > ?"
+            rows = conn.execute(sql, (self.model, old_max)).fetchall()
+            target = self.vecs
+            if old_count + len(rows) != count:
+                target = {}
+                rows = conn.execute(sql, (self.model, 0)).fetchall()
+            for row in rows:
+                vec = vector_array(row["vector"])
+                if vec:
+                    target[row["id"]] = vec
+            self.vecs = target
+            self.signature = (count, max_id)
+            self.loaded = True
+
+    def add(self, clip_id: int, vec: list[float]) -> None:
+        """Write-through for vectors stored by this process; refresh() reconciles later."""
+        if vec:
+            self.vecs[clip_id] = array("f", vec)
+
+    def search(self, query: list[float], ids: Iterable[int], limit: int) -> list[tuple[float, int]]:
+        vecs = self.vecs
+        present = [cid for cid in ids if cid in vecs]
+        return knn(query, present, [vecs[cid] for cid in present], limit)
+
+
+_VECTOR_INDEXES: dict[tuple[str, str], VectorIndex] = {}
+_VECTOR_INDEXES_LOCK = threading.Lock()
+
+
+def get_vector_index(conn: sqlite3.Connection, model: str, refresh: bool = True) -> VectorIndex:
+    """Return the process-wide index for this database and model.
+
+    With refresh=False the index is only loaded if it never was; callers rely on
+    refresh_vector_indexes() running in the background to keep it current.
+    """
+    db_file = database_file(conn)
+    if not db_file:
+        index = VectorIndex(model)  # in-memory databases are private to their connection
+    else:
+        with _VECTOR_INDEXES_LOCK:
+            index = _VECTOR_INDEXES.setdefault((db_file, model), VectorIndex(model))
+    if refresh or not index.loaded:
+        index.refresh(conn)
+    return index
+
+
+def refresh_vector_indexes(conn: sqlite3.Connection) -> None:
+    """Bring every loaded index for this connection's database up to date."""
+    db_file = database_file(conn)
+    with _VECTOR_INDEXES_LOCK:
+        indexes = [index for (path, _), index in _VECTOR_INDEXES.items() if path == db_file]
+    for index in indexes:
+        index.refresh(conn)
+
+
+def start_index_refresher(interval: float = 2.0) -> threading.Thread:
+    """Keep the server's vector indexes current off the request path.
+
+    The thread polls on its own read-only connection and only refreshes when
+    PRAGMA data_version says another connection committed since the last pass.
+    Vectors rewritten in place under the same model (init_db's one-off
+    migrations) keep the count/max signature, so a running server only sees
+    those after a restart.
+    """
+
+    def run() -> None:
+        conn = connect_db(readonly=True)
+        seen_version = None
+        while True:
+            time.sleep(interval)
+            try:
+                version = conn.execute("PRAGMA data_version").fetchone()[0]
+                if version != seen_version:
+                    refresh_vector_indexes(conn)
+                    seen_version = version
+            except sqlite3.Error:
+                pass
+
+    thread = threading.Thread(target=run, name="mfm-index-refresh", daemon=True)
+    thread.start()
+    return thread
 
 
 # ---------- Tag helpers ----------
+TAG_CACHE_SIZE = 512  # names remembered per connection by get_or_create_tag
+
+
 def get_or_create_tag(conn: sqlite3.Connection, name: str) -> int:
     tag_norm = name.strip().lower()
     if not tag_norm:
         raise ValueError("empty tag")
+    cache = None
+    if config_cache(conn) is not None:  # revalidates, clearing tag_ids on a stale connection
+        if conn.tag_ids is None:
+            conn.tag_ids = {}
+        cache = conn.tag_ids
+        tag_id = cache.get(tag_norm)
+        if tag_id is not None:
+            return tag_id
     cur = conn.execute("SELECT id FROM tags WHERE name = ?", (tag_norm,))
     row = cur.fetchone()
     if row:
-        return row["id"]
-    cur = conn.execute("INSERT INTO tags(name) VALUES (?)", (tag_norm,))
-    conn.commit()
-    return cur.lastrowid
+        tag_id = row["id"]
+    else:
+        cur = conn.execute("INSERT INTO tags(name) VALUES (?)", (tag_norm,))
+        conn.commit()
+        tag_id = cur.lastrowid
+    if cache is not None:
+        if len(cache) >= TAG_CACHE_SIZE:
+            cache.clear()
+        cache[tag_norm] = tag_id
+    return tag_id
+
+
+def get_or_create_tags(conn: sqlite3.Connection, names: Iterable[str]) -> dict[str, int]:
+    """Map normalized tag names to ids, creating the missing ones in one batch."""
+    norm = list(dict.fromkeys(name.strip().lower() for name in names if name.strip()))
+    if not norm:
+        return {}
+    sql = f"SELECT name, id FROM tags WHERE name IN ({','.join('?' * len(norm))})"
+    tag_ids = dict(conn.execute(sql, norm).fetchall())
+    missing = [(name,) for name in norm if name not in tag_ids]
+    if missing:
+        conn.executemany("INSERT OR IGNORE INTO tags(name) VALUES (?)", missing)
+        tag_ids = dict(conn.execute(sql, norm).fetchall())
+    return tag_ids
+
+
+def enforce_tag_caps(conn: sqlite3.Connection, names: Iterable[str]) -> None:
+    cap_map = get_cap_map(conn, "cap_by_tag")
+    for name in names:
+        if name in cap_map:
+            ev = evict_tag_cap(conn, name, cap_map[name])
+            if ev:
+                say(FATHER, f"evicted {ev} old clips for tag cap ({name})")
 
 
 def assign_tag(conn: sqlite3.Connection, clip_id: int, tag: str) -> bool:
     tag_id = get_or_create_tag(conn, tag)
     try:
-        conn.execute(
-            "INSERT OR IGNORE INTO clip_tags(clip_id, tag_id) VALUES (?, ?)",
-            (clip_id, tag_id),
-        )
+        conn.execute(INSERT_CLIP_TAG_SQL, (clip_id, tag_id))
         conn.commit()
-        cap_map = get_cap_map(conn, "cap_by_tag")
-        tag_norm = tag.strip().lower()
-        if tag_norm in cap_map:
-            ev = evict_tag_cap(conn, tag_norm, cap_map[tag_norm])
-            if ev:
-                say(FATHER, f"evicted {ev} old clips for tag cap ({tag_norm})")
+        enforce_tag_caps(conn, [tag.strip().lower()])
         return True
     except sqlite3.IntegrityError:
         return False
 
 
+def assign_tags(conn: sqlite3.Connection, clip_id: int, tags: Iterable[str]) -> int:
+    """Attach several tags to a clip in one batch; returns how many were new."""
+    tag_ids = get_or_create_tags(conn, tags)
+    if not tag_ids:
+        return 0
+    try:
+        cur = conn.executemany(
+            INSERT_CLIP_TAG_SQL,
+            [(clip_id, tag_id) for tag_id in tag_ids.values()],
+        )
+        conn.commit()
+    except sqlite3.IntegrityError:
+        return 0
+    enforce_tag_caps(conn, tag_ids)
+    return cur.rowcount
+
+
 def remove_tag(conn: sqlite3.Connection, clip_id: int, tag: str) -> bool:
     tag_norm = tag.strip().lower()
     cur = conn.execute("SELECT id FROM tags WHERE name = ?", (tag_norm,))
@@ -1230,22 +1813,22 @@ def tags_for_clip(conn: sqlite3.Connection, clip_id: int) -> list[str]:
 
 
 def tags_for_clips(conn: sqlite3.Connection, clip_ids: list[int]) -> dict[int, list[str]]:
-    if not clip_ids:
-        return {}
-    placeholders = ",".join("?" for _ in clip_ids)
-    cur = conn.execute(
-        f"""
-        SELECT ct.clip_id, t.name
-        FROM clip_tags ct
-        JOIN tags t ON t.id = ct.tag_id
-        WHERE ct.clip_id IN ({placeholders})
-        ORDER BY t.name
-        """,
-        clip_ids,
-    )
     result: dict[int, list[str]] = {}
-    for row in cur.fetchall():
-        result.setdefault(row["clip_id"], []).append(row["name"])
+    for start in range(0, len(clip_ids), SQL_IN_CHUNK):
+        chunk = clip_ids[start : start + SQL_IN_CHUNK]
+        placeholders = ",".join("?" * len(chunk))
+        cur = conn.execute(
+            f"""
+            SELECT ct.clip_id, t.name
+            FROM clip_tags ct
+            JOIN tags t ON t.id = ct.tag_id
+            WHERE ct.clip_id IN ({placeholders})
+            ORDER BY t.name
+            """,
+            chunk,
+        )
+        for clip_id, name in cur.fetchall():
+            result.setdefault(clip_id, []).append(name)
     return result
 
 
@@ -1253,46 +1836,138 @@ def add_note(conn: sqlite3.Connection, clip_id: int, note: str) -> bool:
     note_clean = note.strip()
     if not note_clean:
         return False
-    conn.execute(
-        "INSERT INTO clip_notes (clip_id, note, created_at) VALUES (?, ?, ?)",
-        (clip_id, note_clean, datetime.now(timezone.utc).isoformat()),
-    )
+    conn.execute(INSERT_NOTE_SQL, (clip_id, note_clean, datetime.now(timezone.utc).isoformat()))
     conn.commit()
     return True
 
 
 def notes_for_clips(conn: sqlite3.Connection, clip_ids: list[int]) -> dict[int, list[dict]]:
-    if not clip_ids:
-        return {}
-    placeholders = ",".join("?" for _ in clip_ids)
-    cur = conn.execute(
-        f"""
-        SELECT clip_id, note, created_at
-        FROM clip_notes
-        WHERE clip_id IN ({placeholders})
-        ORDER BY created_at DESC
-        """,
-        clip_ids,
-    )
     result: dict[int, list[dict]] = {}
-    for row in cur.fetchall():
-        result.setdefault(row["clip_id"], []).append({"note": row["note"], "created_at": row["created_at"]})
+    for start in range(0, len(clip_ids), SQL_IN_CHUNK):
+        chunk = clip_ids[start : start + SQL_IN_CHUNK]
+        placeholders = ",".join("?" * len(chunk))
+        cur = conn.execute(
+            f"""
+            SELECT clip_id, note, created_at
+            FROM clip_notes
+            WHERE clip_id IN ({placeholders})
+            ORDER BY created_at DESC
+            """,
+            chunk,
+        )
+        for clip_id, note, created_at in cur.fetchall():
+            result.setdefault(clip_id, []).append({"note": note, "created_at": created_at})
     return result
 
 
-def add_copilot_chat(conn: sqlite3.Connection, content: str, title: Optional[str], model: Optional[str]) -> bool:
-    clean = content.strip()
-    if not clean:
-        return False
-    conn.execute(
-        "INSERT INTO copilot_chats (created_at, title, model, content) VALUES (?, ?, ?, ?)",
-        (datetime.now(timezone.utc).isoformat(), title, model, clean),
-    )
-    conn.commit()
-    return True
+def tags_and_notes_for_clips(
+    conn: sqlite3.Connection, clip_ids: list[int]
+) -> tuple[dict[int, list[str]], dict[int, list[dict]]]:
+    """tags_for_clips and notes_for_clips in one round trip (per chunk of ids)."""
+    tag_map: dict[int, list[str]] = {}
+    notes_map: dict[int, list[dict]] = {}
+    step = SQL_IN_CHUNK // 2  # the id list is bound twice
+    for start in range(0, len(clip_ids), step):
+        chunk = clip_ids[start : start + step]
+        placeholders = ",".join("?" * len(chunk))
+        cur = conn.execute(
+            f"""
+            SELECT kind, clip_id, value, created_at FROM (
+                SELECT 0 AS kind, ct.clip_id, t.name AS value, NULL AS created_at
+                FROM clip_tags ct
+                JOIN tags t ON t.id = ct.tag_id
+                WHERE ct.clip_id IN ({placeholders})
+                UNION ALL
+                SELECT 1, clip_id, note, created_at
+                FROM clip_notes
+                WHERE clip_id IN ({placeholders})
+            )
+            ORDER BY kind, CASE kind WHEN 0 THEN value END, created_at DESC
+            """,
+            chunk + chunk,
+        )
+        for kind, clip_id, value, created_at in cur.fetchall():
+            if kind == 0:
+                tag_map.setdefault(clip_id, []).append(value)
+            else:
+                notes_map.setdefault(clip_id, []).append({"note": value, "created_at": created_at})
+    return tag_map, notes_map
+
+
+# Hot per-request SELECTs live in module constants so every call hands sqlite3
+# the same SQL text and hits the connection's statement cache (cached_statements).
+
+# Correlated columns that return a clip's tags and notes (same order as
+# tags_for_clips / notes_for_clips) as JSON arrays, so one query can carry both.
+_TAGS_JSON_SQL = """(SELECT json_group_array(name) FROM (
+            SELECT t.name FROM clip_tags ct JOIN tags t ON t.id = ct.tag_id WHERE ct.clip_id = c.id ORDER BY t.name
+        )) AS tags_json"""
+_NOTES_JSON_SQL = """(SELECT json_group_array(json_object('note', note, 'created_at', created_at)) FROM (
+            SELECT note, created_at FROM clip_notes WHERE clip_id = c.id ORDER BY created_at DESC
+        )) AS notes_json"""
+
+CLIP_DETAIL_SQL = f"""
+        SELECT c.id, c.created_at, c.source_app, c.window_title, c.content, c.pinned, c.title, c.file_path, c.lang,
+        {_TAGS_JSON_SQL},
+        {_NOTES_JSON_SQL}
+        FROM clips c
+        WHERE c.id = ?
+    """
 
+# Unfiltered /recent and federate export: one statement, no WHERE to build,
+# walking idx_clips_created_at backwards with tags/notes folded in.
+RECENT_HOT_SQL = f"""
+        SELECT c.id, c.created_at, c.source_app, c.window_title, c.content, c.pinned, c.title, c.file_path, c.lang,
+        {_TAGS_JSON_SQL},
+        {_NOTES_JSON_SQL}
+        FROM clips c
+        ORDER BY c.created_at DESC, c.id DESC
+        LIMIT ?
+    """
 
-def list_copilot_chats(conn: sqlite3.Connection, limit: int) -> list[dict]:
+# NULL toggles, otherwise sets; RETURNING needs SQLite 3.35+
+PIN_SQL = "UPDATE clips SET pinned = COALESCE(?, 1 - pinned) WHERE id = ? RETURNING pinned"
+
+RECAP_SQL = """
+        SELECT id, created_at, source_app, window_title, content, title, lang
+        FROM clips
+        WHERE datetime(created_at) >= datetime(?)
+        ORDER BY created_at DESC
+        LIMIT ?;
+    """
+
+
+def recent_annotated_rows(
+    conn: sqlite3.Connection, limit: int
+) -> tuple[list[sqlite3.Row], Dict[int, list[str]], dict[int, list[dict]]]:
+    """Newest clips with their tag and note maps, for callers with no filters."""
+    rows = conn.execute(RECENT_HOT_SQL, (limit,)).fetchall()
+    tag_map = {row["id"]: json_loads(row["tags_json"]) for row in rows}
+    notes_map = {row["id"]: json_loads(row["notes_json"]) for row in rows}
+    return rows, tag_map, notes_map
+
+
+def add_copilot_chat(conn: sqlite3.Connection, content: str, title: Optional[str], model: Optional[str]) -> bool:
+    return add_copilot_chats(conn, [(content, title, model)]) == 1
+
+
+def add_copilot_chats(
+    conn: sqlite3.Connection, chats: Iterable[tuple[str, Optional[str], Optional[str]]]
+) -> int:
+    """Save (content, title, model) chats in one transaction; blank ones are skipped.
+
+    Returns how many were saved.
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    rows = [(now, title, model, content.strip()) for content, title, model in chats if content and content.strip()]
+    if not rows:
+        return 0
+    with conn:
+        conn.executemany(INSERT_COPILOT_SQL, rows)
+    return len(rows)
+
+
+def list_copilot_chats(conn: sqlite3.Connection, limit: int) -> list[dict]:
     cur = conn.execute(
         "SELECT id, created_at, title, model FROM copilot_chats ORDER BY created_at DESC LIMIT ?",
         (limit,),
@@ -1376,6 +2051,18 @@ def copy_to_clipboard(text: str) -> bool:
         return False
 
 
+_COPY_POOL: Optional[ThreadPoolExecutor] = None
+COPY_BACKGROUND_CHARS = 64 * 1024
+
+
+def copy_pool() -> ThreadPoolExecutor:
+    # Worker threads are joined at interpreter exit, so a queued copy still lands.
+    global _COPY_POOL
+    if _COPY_POOL is None:
+        _COPY_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mfm-copy")
+    return _COPY_POOL
+
+
 def command_exists(cmd: str) -> bool:
     return subprocess.call(["/bin/sh", "-c", f"command -v {cmd} >/dev/null 2>&1"]) == 0
 
@@ -1434,8 +2121,7 @@ def run_user_helper_on_clip(
     )
     if not new_id:
         return False, "failed to save helper output (duplicate?)", None, out
-    assign_tag(conn, new_id, kind)
-    assign_tag(conn, new_id, f"from:{row['id']}")
+    assign_tags(conn, new_id, [kind, f"from:{row['id']}"])
     return True, f"saved {kind} of #{row['id']} as #{new_id}", new_id, out
 
 
@@ -1488,8 +2174,7 @@ def run_ai_helper(
             title=title_line,
         )
         if new_id:
-            assign_tag(conn, new_id, tag_label)
-            assign_tag(conn, new_id, f"helper:{setting_key}")
+            assign_tags(conn, new_id, [tag_label, f"helper:{setting_key}"])
         else:
             return True, "helper output ok (not saved; duplicate?)", None, out
     return True, "helper output ok", new_id, out
@@ -1563,7 +2248,9 @@ def cmd_watch(args: argparse.Namespace) -> None:
                 if not ltm_enabled:
                     allow_summary = False
                     allow_tags = False
-                digest = hashlib.sha256(clip.encode("utf-8")).hexdigest()
+                # one encode feeds both the dedupe hash and the max_bytes check
+                clip_bytes = clip.encode("utf-8", errors="ignore")
+                digest = hashlib.sha256(clip_bytes).hexdigest()
                 if digest != last_digest:
                     app, window = frontmost_app_and_window()
                     cap_by_app = get_cap_map(conn, "cap_by_app")
@@ -1572,7 +2259,6 @@ def cmd_watch(args: argparse.Namespace) -> None:
                         last_digest = digest
                         time.sleep(interval)
                         continue
-                    clip_bytes = clip.encode("utf-8", errors="ignore")
                     if len(clip_bytes) > max_bytes:
                         say(MOTHER, f"skipped large clip ({len(clip_bytes)} bytes > max {max_bytes})")
                         if notify_enabled:
@@ -1614,9 +2300,7 @@ def cmd_watch(args: argparse.Namespace) -> None:
                                 tags_out = run_helper(auto_tag_cmd, clip, timeout=6.0)
                                 if tags_out:
                                     # split on comma or whitespace
-                                    parts = [t.strip().lower() for t in re.split(r"[,\s]+", tags_out) if t.strip()]
-                                    for t in parts:
-                                        assign_tag(conn, inserted_id, t)
+                                    assign_tags(conn, inserted_id, re.split(r"[,\s]+", tags_out))
                             if app and app.strip().lower() in cap_by_app:
                                 ev = evict_app_cap(conn, app.strip().lower(), cap_by_app[app.strip().lower()])
                                 if ev:
@@ -1648,45 +2332,184 @@ def cmd_watch(args: argparse.Namespace) -> None:
         say(MOTHER, "stopped.")
 
 
-def filtered_rows(
-    conn: sqlite3.Connection,
-    limit: int,
-    app: Optional[str] = None,
-    contains: Optional[str] = None,
-    tag: Optional[str] = None,
-    pins_only: bool = False,
-    since_iso: Optional[str] = None,
-    until_iso: Optional[str] = None,
-) -> tuple[list[sqlite3.Row], Dict[int, list[str]]]:
+_TAG_FILTER_SQL = "{p}id IN (SELECT clip_id FROM clip_tags ct JOIN tags t ON t.id = ct.tag_id WHERE LOWER(t.name) = LOWER(?))"
+
+
+def _filter_clauses(
+    prefix: str,
+    app: bool,
+    contains: bool,
+    tag: bool,
+    pins_only: bool,
+    since: bool,
+    until: bool,
+    before: bool = False,
+    after: bool = False,
+) -> list[str]:
     clauses = []
-    params = []
     if app:
-        clauses.append("LOWER(source_app) = LOWER(?)")
+        clauses.append(f"LOWER({prefix}source_app) = LOWER(?)")
+    if contains:
+        clauses.append(f"{prefix}content LIKE ?")
+    if tag:
+        clauses.append(_TAG_FILTER_SQL.format(p=prefix))
+    if pins_only:
+        clauses.append(f"{prefix}pinned = 1")
+    if since:
+        clauses.append(f"datetime({prefix}created_at) >= datetime(?)")
+    if until:
+        clauses.append(f"datetime({prefix}created_at) <= datetime(?)")
+    # keyset cursors are (created_at, id) so rows sharing the boundary timestamp
+    # aren't skipped; the outer <= / >= keeps the created_at index range usable
+    if before:
+        clauses.append(f"{prefix}created_at <= ? AND ({prefix}created_at < ? OR {prefix}id < ?)")
+    if after:
+        clauses.append(f"{prefix}created_at >= ? AND ({prefix}created_at > ? OR {prefix}id > ?)")
+    return clauses
+
+
+# A cursor without an id matches no row at its own timestamp, i.e. a plain
+# created_at comparison.
+_NO_ROW_ID_BELOW = 0
+_NO_ROW_ID_ABOVE = 2**63 - 1
+
+
+def _filter_params(
+    app: Optional[str],
+    contains: Optional[str],
+    tag: Optional[str],
+    since_iso: Optional[str],
+    until_iso: Optional[str],
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+) -> list:
+    params: list = []
+    if app:
         params.append(app)
     if contains:
-        clauses.append("content LIKE ?")
         params.append(f"%{contains}%")
     if tag:
-        clauses.append(
-            "id IN (SELECT clip_id FROM clip_tags ct JOIN tags t ON t.id = ct.tag_id WHERE LOWER(t.name) = LOWER(?))"
-        )
         params.append(tag)
-    if pins_only:
-        clauses.append("pinned = 1")
     if since_iso:
-        clauses.append("datetime(created_at) >= datetime(?)")
         params.append(since_iso)
     if until_iso:
-        clauses.append("datetime(created_at) <= datetime(?)")
         params.append(until_iso)
+    if before:
+        params.extend((before, before, _NO_ROW_ID_BELOW if before_id is None else before_id))
+    if after:
+        params.extend((after, after, _NO_ROW_ID_ABOVE if after_id is None else after_id))
+    return params
+
+
+def preview_sql(width: int, column: str = "content") -> str:
+    # One extra character lets clip_preview() tell whether to add an ellipsis.
+    return f"replace(substr({column}, 1, {width + 1}), char(10), '\\n') AS preview"
+
+
+def clip_preview(row, width: int) -> str:
+    try:
+        text = row["preview"]
+    except (IndexError, KeyError):
+        # slicing first keeps the escape pass proportional to the preview, not the clip
+        text = row["content"][: width + 1].replace("\n", "\\n")
+    if len(text) > width:
+        return text[: width - 3] + "..."
+    return text
+
+
+_CLIP_LINE = "{pin}#{id:>5} {meta}[{app}] {preview}{title}{tags}{notes}{lang}".format
+
+
+def clip_line(row, width: int, tags: Iterable[str] = (), meta: str = "", notes: int = 0) -> str:
+    title = row["title"]
+    lang = row["lang"]
+    return _CLIP_LINE(
+        pin="*" if row["pinned"] else " ",
+        id=row["id"],
+        meta=meta,
+        app=row["source_app"],
+        preview=clip_preview(row, width),
+        title=f' "{title}"' if title else "",
+        tags=f" tags={','.join(tags)}" if tags else "",
+        notes=f" notes={notes}" if notes else "",
+        lang=f" lang={lang}" if lang and lang != "unk" else "",
+    )
+
+
+# SQL text is built once per predicate combination so sqlite3's statement
+# cache (keyed on the exact string) can reuse the compiled statement.
+@functools.lru_cache(maxsize=None)
+def filtered_rows_sql(
+    app: bool,
+    contains: bool,
+    tag: bool,
+    pins_only: bool,
+    since: bool,
+    until: bool,
+    before: bool = False,
+    after: bool = False,
+    preview: int = 0,
+) -> str:
+    clauses = _filter_clauses("", app, contains, tag, pins_only, since, until, before, after)
     where = "WHERE " + " AND ".join(clauses) if clauses else ""
-    sql = f"""
-        SELECT id, created_at, source_app, window_title, content, pinned, title, lang, file_path
+    body = preview_sql(preview) if preview else "content"
+    return f"""
+        SELECT id, created_at, source_app, window_title, {body}, pinned, title, lang, file_path
         FROM clips
         {where}
-        ORDER BY created_at DESC
+        ORDER BY created_at DESC, id DESC
+        LIMIT ?;
+    """
+
+
+@functools.lru_cache(maxsize=None)
+def fts_search_sql(
+    app: bool,
+    tag: bool,
+    pins_only: bool,
+    since: bool,
+    until: bool,
+    before: bool = False,
+    after: bool = False,
+    preview: int = 0,
+    sort: str = "time",
+) -> str:
+    clauses = ["clips_fts MATCH ?"] + _filter_clauses("c.", app, False, tag, pins_only, since, until, before, after)
+    where = " AND ".join(clauses)
+    body = preview_sql(preview, "c.content") if preview else "c.content"
+    # rank is FTS5's bm25() column; ordering by it stays inside the FTS index
+    order = "f.rank" if sort == "rank" else "c.created_at DESC, c.id DESC"
+    return f"""
+        SELECT c.id, c.created_at, c.source_app, c.window_title, {body}, c.pinned, c.title, c.lang
+        FROM clips_fts f
+        JOIN clips c ON c.id = f.rowid
+        WHERE {where}
+        ORDER BY {order}
         LIMIT ?;
     """
+
+
+def filtered_rows(
+    conn: sqlite3.Connection,
+    limit: int,
+    app: Optional[str] = None,
+    contains: Optional[str] = None,
+    tag: Optional[str] = None,
+    pins_only: bool = False,
+    since_iso: Optional[str] = None,
+    until_iso: Optional[str] = None,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    preview: int = 0,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+) -> tuple[list[sqlite3.Row], Dict[int, list[str]]]:
+    sql = filtered_rows_sql(
+        bool(app), bool(contains), bool(tag), bool(pins_only), bool(since_iso), bool(until_iso), bool(before), bool(after), preview
+    )
+    params = _filter_params(app, contains, tag, since_iso, until_iso, before, after, before_id, after_id)
     params.append(limit)
     cur = conn.execute(sql, params)
     rows = cur.fetchall()
@@ -1694,6 +2517,30 @@ def filtered_rows(
     return rows, tag_map
 
 
+def search_rows(
+    conn: sqlite3.Connection,
+    query: str,
+    limit: int,
+    app: Optional[str] = None,
+    tag: Optional[str] = None,
+    pins_only: bool = False,
+    since_iso: Optional[str] = None,
+    until_iso: Optional[str] = None,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    preview: int = 0,
+    sort: str = "time",
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+) -> list[sqlite3.Row]:
+    sql = fts_search_sql(
+        bool(app), bool(tag), bool(pins_only), bool(since_iso), bool(until_iso), bool(before), bool(after), preview, sort
+    )
+    params = [query] + _filter_params(app, None, tag, since_iso, until_iso, before, after, before_id, after_id)
+    params.append(limit)
+    return conn.execute(sql, params).fetchall()
+
+
 def cmd_recent(args: argparse.Namespace) -> None:
     conn = connect_db()
     init_db(conn)
@@ -1732,67 +2579,30 @@ def cmd_recent(args: argparse.Namespace) -> None:
         print(json.dumps({"items": payload}, ensure_ascii=False))
         return
     for row in rows:
-        preview = row["content"].replace("\n", "\\n")
-        if len(preview) > 120:
-            preview = preview[:117] + "..."
-        pin_mark = "*" if row["pinned"] else " "
-        tags = tag_map.get(row["id"], [])
-        tags_str = f" tags={','.join(tags)}" if tags else ""
-        title = f" \"{row['title']}\"" if row["title"] else ""
-        lang = row["lang"] if row["lang"] not in (None, "", "unk") else ""
-        lang_str = f" lang={lang}" if lang else ""
-        say(FATHER, f"{pin_mark}#{row['id']:>5} {row['created_at']} [{row['source_app']}] {preview}{title}{tags_str}{lang_str}")
+        say(FATHER, clip_line(row, 120, tag_map.get(row["id"], []), meta=f"{row['created_at']} "))
 
 
 def cmd_search(args: argparse.Namespace) -> None:
     conn = connect_db()
     init_db(conn)
-    clauses = ["clips_fts MATCH ?"]
-    params = [args.query]
-    if args.app:
-        clauses.append("LOWER(c.source_app) = LOWER(?)")
-        params.append(args.app)
-    if args.tag:
-        clauses.append(
-            "c.id IN (SELECT clip_id FROM clip_tags ct JOIN tags t ON t.id = ct.tag_id WHERE LOWER(t.name) = LOWER(?))"
-        )
-        params.append(args.tag)
-    if args.pins_only:
-        clauses.append("c.pinned = 1")
     since_iso = parse_iso_dt(args.since) if getattr(args, "since", None) else None
     if args.since_hours is not None:
         since_iso = iso_hours_ago(args.since_hours)
     until_iso = parse_iso_dt(args.until) if getattr(args, "until", None) else None
-    if since_iso:
-        clauses.append("datetime(c.created_at) >= datetime(?)")
-        params.append(since_iso)
-    if until_iso:
-        clauses.append("datetime(c.created_at) <= datetime(?)")
-        params.append(until_iso)
-    where = " AND ".join(clauses)
-    sql = f"""
-        SELECT c.id, c.created_at, c.source_app, c.window_title, c.content, c.pinned, c.title, c.lang
-        FROM clips_fts f
-        JOIN clips c ON c.id = f.rowid
-        WHERE {where}
-        ORDER BY c.created_at DESC
-        LIMIT ?;
-    """
-    params.append(args.limit)
-    cur = conn.execute(sql, params)
-    rows = cur.fetchall()
+    rows = search_rows(
+        conn,
+        args.query,
+        args.limit,
+        app=args.app,
+        tag=args.tag,
+        pins_only=args.pins_only,
+        since_iso=since_iso,
+        until_iso=until_iso,
+        sort=args.sort,
+    )
     tag_map = tags_for_clips(conn, [row["id"] for row in rows])
     for row in rows:
-        preview = row["content"].replace("\n", "\\n")
-        if len(preview) > 120:
-            preview = preview[:117] + "..."
-        pin_mark = "*" if row["pinned"] else " "
-        tags = tag_map.get(row["id"], [])
-        tags_str = f" tags={','.join(tags)}" if tags else ""
-        title = f" \"{row['title']}\"" if row["title"] else ""
-        lang = row["lang"] if row["lang"] not in (None, "", "unk") else ""
-        lang_str = f" lang={lang}" if lang else ""
-        say(FATHER, f"{pin_mark}#{row['id']:>5} {row['created_at']} [{row['source_app']}] {preview}{title}{tags_str}{lang_str}")
+        say(FATHER, clip_line(row, 120, tag_map.get(row["id"], []), meta=f"{row['created_at']} "))
 
 
 def topic_groups(
@@ -1863,46 +2673,76 @@ def topic_groups(
     return output
 
 
-def fetch_semantic_candidates(
+@functools.lru_cache(maxsize=None)
+def candidate_vectors_sql(app: bool, tag: bool, pins_only: bool, since: bool, until: bool, vectors: bool = True) -> str:
+    clauses = ["v.model = ?"] + _filter_clauses("c.", app, False, tag, pins_only, since, until)
+    where = " AND ".join(clauses)
+    columns = "v.clip_id AS id, v.vector" if vectors else "v.clip_id AS id"
+    return f"""
+        SELECT {columns}
+        FROM clip_vectors v
+        JOIN clips c ON c.id = v.clip_id
+        WHERE {where}
+        ORDER BY c.created_at DESC
+        LIMIT ?
+    """
+
+
+def fetch_candidate_vectors(
     conn: sqlite3.Connection,
-    app: Optional[str],
-    tag: Optional[str],
+    model: str,
     limit: int,
+    app: Optional[str] = None,
+    tag: Optional[str] = None,
+    since_iso: Optional[str] = None,
+    until_iso: Optional[str] = None,
+    pins_only: bool = False,
+) -> tuple[list[int], list[array]]:
+    sql = candidate_vectors_sql(bool(app), bool(tag), bool(pins_only), bool(since_iso), bool(until_iso))
+    params = [model] + _filter_params(app, None, tag, since_iso, until_iso)
+    params.append(limit)
+    return build_ann_index(conn.execute(sql, params))
+
+
+def fetch_candidate_ids(
+    conn: sqlite3.Connection,
     model: str,
+    limit: int,
+    app: Optional[str] = None,
+    tag: Optional[str] = None,
     since_iso: Optional[str] = None,
     until_iso: Optional[str] = None,
     pins_only: bool = False,
-) -> list[sqlite3.Row]:
-    clauses = ["v.model = ?"]
-    params = [model]
-    if app:
-        clauses.append("LOWER(c.source_app) = LOWER(?)")
-        params.append(app)
-    if tag:
-        clauses.append(
-            "c.id IN (SELECT clip_id FROM clip_tags ct JOIN tags t ON t.id = ct.tag_id WHERE LOWER(t.name) = LOWER(?))"
-        )
-        params.append(tag)
-    if since_iso:
-        clauses.append("datetime(c.created_at) >= datetime(?)")
-        params.append(since_iso)
-    if until_iso:
-        clauses.append("datetime(c.created_at) <= datetime(?)")
-        params.append(until_iso)
-    if pins_only:
-        clauses.append("c.pinned = 1")
-    where = "WHERE " + " AND ".join(clauses) if clauses else ""
-    sql = f"""
-        SELECT c.id, c.created_at, c.source_app, c.window_title, c.content, c.pinned, c.title, c.lang, v.vector, v.model
+) -> list[int]:
+    """Same candidate pool as fetch_candidate_vectors, without loading the vectors."""
+    sql = candidate_vectors_sql(bool(app), bool(tag), bool(pins_only), bool(since_iso), bool(until_iso), vectors=False)
+    params = [model] + _filter_params(app, None, tag, since_iso, until_iso)
+    params.append(limit)
+    return [row[0] for row in conn.execute(sql, params)]
+
+
+@functools.lru_cache(maxsize=64)
+def rows_by_id_sql(count: int, preview: int = 0, annotated: bool = False) -> str:
+    marks = ", ".join("?" * count)
+    order = " ".join(f"WHEN ? THEN {i}" for i in range(count))
+    body = preview_sql(preview, "c.content") if preview else "c.content"
+    extra = f", {_TAGS_JSON_SQL}, {_NOTES_JSON_SQL}" if annotated else ""
+    return f"""
+        SELECT c.id, c.created_at, c.source_app, c.window_title, {body}, c.pinned, c.title, c.lang, c.file_path{extra}
         FROM clips c
-        JOIN clip_vectors v ON v.clip_id = c.id
-        {where}
-        ORDER BY c.created_at DESC
-        LIMIT ?
+        WHERE c.id IN ({marks})
+        ORDER BY CASE c.id {order} END
     """
-    params.append(limit)
-    cur = conn.execute(sql, params)
-    return cur.fetchall()
+
+
+def fetch_rows_by_id(conn: sqlite3.Connection, ids: list[int], preview: int = 0, annotated: bool = False) -> list[sqlite3.Row]:
+    """Fetch clips for ranked ids, preserving the given order.
+
+    With annotated=True each row also carries tags_json/notes_json columns.
+    """
+    if not ids:
+        return []
+    return conn.execute(rows_by_id_sql(len(ids), preview, annotated), list(ids) + list(ids)).fetchall()
 
 
 def cmd_semantic_search(args: argparse.Namespace) -> None:
@@ -1913,34 +2753,22 @@ def cmd_semantic_search(args: argparse.Namespace) -> None:
     if getattr(args, "since_hours", None) is not None:
         since_iso = iso_hours_ago(args.since_hours)
     until_iso = parse_iso_dt(args.until) if getattr(args, "until", None) else None
-    rows = fetch_semantic_candidates(
+    ids, vecs = fetch_candidate_vectors(
         conn,
-        args.app,
-        args.tag,
-        args.pool,
         model_used,
+        args.pool,
+        app=args.app,
+        tag=args.tag,
         since_iso=since_iso,
         until_iso=until_iso,
         pins_only=args.pins_only,
     )
-    ids, vecs = build_ann_index(rows)
     sims = knn(qvec, ids, vecs, args.limit)
-    tag_map = tags_for_clips(conn, ids)
-    row_map: Dict[int, sqlite3.Row] = {row["id"]: row for row in rows}
-    for sim, cid in sims:
-        row = row_map.get(cid)
-        if not row:
-            continue
-        preview = row["content"].replace("\n", "\\n")
-        if len(preview) > 120:
-            preview = preview[:117] + "..."
-        pin_mark = "*" if row["pinned"] else " "
-        tags = tag_map.get(row["id"], [])
-        tags_str = f" tags={','.join(tags)}" if tags else ""
-        title = f" \"{row['title']}\"" if row["title"] else ""
-        lang = row["lang"] if row["lang"] not in (None, "", "unk") else ""
-        lang_str = f" lang={lang}" if lang else ""
-        say(FATHER, f"{pin_mark}#{row['id']:>5} sim={sim:.3f} [{row['source_app']}] {preview}{title}{tags_str}{lang_str}")
+    scores = {cid: sim for sim, cid in sims}
+    rows = fetch_rows_by_id(conn, list(scores), preview=120)
+    tag_map = tags_for_clips(conn, list(scores))
+    for row in rows:
+        say(FATHER, clip_line(row, 120, tag_map.get(row["id"], []), meta=f"sim={scores[row['id']]:.3f} "))
 
 
 def cmd_delete(args: argparse.Namespace) -> None:
@@ -2332,11 +3160,9 @@ def cmd_export(args: argparse.Namespace) -> None:
         print(data)
 
 
-def build_markdown_outline(
-    conn: sqlite3.Connection, since_iso: Optional[str], limit: int = 200
-) -> tuple[str, int]:
+def _outline_query(since_iso: Optional[str], limit: int) -> tuple[str, list]:
     clauses = []
-    params = []
+    params: list = []
     if since_iso:
         clauses.append("datetime(created_at) >= datetime(?)")
         params.append(since_iso)
@@ -2346,51 +3172,85 @@ def build_markdown_outline(
         FROM clips
         {where}
         ORDER BY created_at DESC
-        LIMIT ?;
+        LIMIT ?
     """
     params.append(limit)
-    cur = conn.execute(sql, params)
-    rows = cur.fetchall()
+    return sql, params
+
+
+def count_markdown_outline(conn: sqlite3.Connection, since_iso: Optional[str], limit: int = 200) -> int:
+    sql, params = _outline_query(since_iso, limit)
+    return conn.execute(f"SELECT COUNT(*) FROM ({sql})", params).fetchone()[0]
+
+
+def _outline_day_lines(conn: sqlite3.Connection, date_key: str, rows: list[sqlite3.Row], tag_counts: Counter) -> list[str]:
     tag_map = tags_for_clips(conn, [row["id"] for row in rows])
-    tag_counts = Counter(t for tags in tag_map.values() for t in tags)
-    grouped: dict[str, dict[str, list[sqlite3.Row]]] = {}
+    tag_counts.update(t for tags in tag_map.values() for t in tags)
+    apps: dict[str, list[sqlite3.Row]] = {}
     for row in rows:
+        apps.setdefault(row["source_app"] or "unknown", []).append(row)
+    lines = [f"\n## {date_key}"]
+    for app in sorted(apps.keys()):
+        lines.append(f"- **{app}**")
+        for row in apps[app]:
+            created = row["created_at"] or ""
+            time_part = created.split("T", 1)[1][:5] if "T" in created else created
+            tags = tag_map.get(row["id"], [])
+            tag_str = f" (tags: {', '.join(tags)})" if tags else ""
+            title = row["title"] or row["window_title"] or ""
+            if not title:
+                title = (row["content"] or "").strip().splitlines()[0] if (row["content"] or "").strip() else ""
+            if len(title) > 120:
+                title = title[:117] + "..."
+            pin = " 🔖" if row["pinned"] else ""
+            lines.append(f"  - [{time_part}] #{row['id']}{pin} {title}{tag_str}")
+            snippet_lines = (row["content"] or "").strip().splitlines()
+            if snippet_lines:
+                lines.append("    ```")
+                for ln in snippet_lines[:8]:
+                    lines.append("    " + ln)
+                if len(snippet_lines) > 8:
+                    lines.append("    ...")
+                lines.append("    ```")
+    return lines
+
+
+def iter_markdown_outline(
+    conn: sqlite3.Connection, since_iso: Optional[str], limit: int = 200, count: Optional[int] = None
+) -> Iterable[str]:
+    """Yield the markdown journal one day at a time; "".join() gives the full text.
+
+    Rows arrive newest first, so each day's clips are contiguous and only one
+    day is held in memory.
+    """
+    if count is None:
+        count = count_markdown_outline(conn, since_iso, limit)
+    yield f"# my--father-mother journal (latest {count} clips)"
+    sql, params = _outline_query(since_iso, limit)
+    tag_counts: Counter = Counter()
+    day_key: Optional[str] = None
+    day_rows: list[sqlite3.Row] = []
+    for row in conn.execute(sql, params):
         created = row["created_at"] or ""
         date_key = created.split("T", 1)[0] if "T" in created else created[:10]
-        app = row["source_app"] or "unknown"
-        grouped.setdefault(date_key, {}).setdefault(app, []).append(row)
-    lines: list[str] = []
-    lines.append(f"# my--father-mother journal (latest {len(rows)} clips)")
-    for date_key in sorted(grouped.keys(), reverse=True):
-        lines.append(f"\n## {date_key}")
-        apps = grouped[date_key]
-        for app in sorted(apps.keys()):
-            lines.append(f"- **{app}**")
-            for row in apps[app]:
-                created = row["created_at"] or ""
-                time_part = created.split("T", 1)[1][:5] if "T" in created else created
-                tags = tag_map.get(row["id"], [])
-                tag_str = f" (tags: {', '.join(tags)})" if tags else ""
-                title = row["title"] or row["window_title"] or ""
-                if not title:
-                    title = (row["content"] or "").strip().splitlines()[0] if (row["content"] or "").strip() else ""
-                if len(title) > 120:
-                    title = title[:117] + "..."
-                pin = " 🔖" if row["pinned"] else ""
-                lines.append(f"  - [{time_part}] #{row['id']}{pin} {title}{tag_str}")
-                snippet_lines = (row["content"] or "").strip().splitlines()
-                if snippet_lines:
-                    lines.append("    ```")
-                    for ln in snippet_lines[:8]:
-                        lines.append("    " + ln)
-                    if len(snippet_lines) > 8:
-                        lines.append("    ...")
-                    lines.append("    ```")
+        if day_rows and date_key != day_key:
+            yield "\n" + "\n".join(_outline_day_lines(conn, day_key, day_rows, tag_counts))
+            day_rows = []
+        day_key = date_key
+        day_rows.append(row)
+    if day_rows:
+        yield "\n" + "\n".join(_outline_day_lines(conn, day_key, day_rows, tag_counts))
     if tag_counts:
-        lines.append("\n## Tag totals")
-        for name, count in tag_counts.most_common(20):
-            lines.append(f"- {name}: {count}")
-    return "\n".join(lines), len(rows)
+        # same order as Counter.most_common over name-sorted tags: count desc, then name
+        top = sorted(tag_counts.items(), key=lambda kv: (-kv[1], kv[0]))[:20]
+        yield "\n\n## Tag totals" + "".join(f"\n- {name}: {n}" for name, n in top)
+
+
+def build_markdown_outline(
+    conn: sqlite3.Connection, since_iso: Optional[str], limit: int = 200
+) -> tuple[str, int]:
+    count = count_markdown_outline(conn, since_iso, limit)
+    return "".join(iter_markdown_outline(conn, since_iso, limit, count=count)), count
 
 
 def cmd_export_md(args: argparse.Namespace) -> None:
@@ -2424,7 +3284,7 @@ def cmd_federate_push(args: argparse.Namespace) -> None:
     init_db(conn)
     since_iso = iso_hours_ago(args.since_hours) if getattr(args, "since_hours", None) is not None else None
     items = export_items(conn, args.limit, app=args.app, tag=args.tag, since_iso=since_iso, pins_only=args.pins_only)
-    payload = json.dumps({"items": items}, ensure_ascii=False).encode("utf-8")
+    payload = json_bytes({"items": items})
     try:
         req = urllib.request.Request(args.url, data=payload, headers={"Content-Type": "application/json"})
         with urllib.request.urlopen(req, timeout=10.0) as resp:
@@ -2780,6 +3640,8 @@ def cmd_restore(args: argparse.Namespace) -> None:
             say(FATHER, f"existing DB backed up to {backup}")
         DB_DIR.mkdir(parents=True, exist_ok=True)
         shutil.copy2(src, DB_PATH)
+        _DB_READY.discard(str(DB_PATH))
+        mark_config_changed()
         say(FATHER, f"restored DB from {src}")
     except Exception as e:
         say(FATHER, f"restore failed: {e}")
@@ -2854,46 +3716,62 @@ def cmd_tags(args: argparse.Namespace) -> None:
     say(FATHER, f"#{args.id} tags: {', '.join(current) if current else 'none'}")
 
 
-def cmd_purge(args: argparse.Namespace) -> None:
-    conn = connect_db()
-    init_db(conn)
+@functools.lru_cache(maxsize=None)
+def purge_filter_sql(app: bool, tag: bool) -> str:
     clauses = []
-    params = []
-    if args.app:
-        clauses.append("LOWER(source_app) = LOWER(?)")
-        params.append(args.app)
-    if args.tag:
+    if app:
+        clauses.append("LOWER(source_app) = LOWER(:app)")
+    if tag:
         clauses.append(
-            "id IN (SELECT clip_id FROM clip_tags ct JOIN tags t ON t.id = ct.tag_id WHERE LOWER(t.name) = LOWER(?))"
+            "id IN (SELECT clip_id FROM clip_tags ct JOIN tags t ON t.id = ct.tag_id WHERE LOWER(t.name) = LOWER(:tag))"
         )
-        params.append(args.tag)
+    return " AND ".join(clauses)
+
+
+def purge_clips(
+    conn: sqlite3.Connection,
+    app: Optional[str] = None,
+    tag: Optional[str] = None,
+    older_than_days: Optional[int] = None,
+    keep_last: Optional[int] = None,
+    all_clips: bool = False,
+) -> int:
+    """Delete clips matching app/tag that are too old or beyond the newest keep_last; returns the count."""
+    where = purge_filter_sql(bool(app), bool(tag))
+    params = {"app": app, "tag": tag}
     deleted = 0
-    if args.older_than_days is not None:
-        cutoff = datetime.now(timezone.utc) - timedelta(days=args.older_than_days)
-        clauses_cutoff = clauses + ["datetime(created_at) < datetime(?)"]
-        params_cutoff = params + [cutoff.isoformat()]
-        where_cutoff = "WHERE " + " AND ".join(clauses_cutoff)
-        cur = conn.execute(f"DELETE FROM clips {where_cutoff}", params_cutoff)
+    if older_than_days is not None:
+        cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+        clauses = [c for c in (where, "datetime(created_at) < datetime(:cutoff)") if c]
+        cur = conn.execute(f"DELETE FROM clips WHERE {' AND '.join(clauses)}", {**params, "cutoff": cutoff.isoformat()})
         deleted += cur.rowcount
-    if args.keep_last is not None:
-        where_keep = "WHERE " + " AND ".join(clauses) if clauses else ""
+    if keep_last is not None:
+        # The survivor list is an uncorrelated subquery, so SQLite builds it once
+        # from an index-ordered scan. (A WITH prefix would plan the same but
+        # leaves cursor.rowcount at -1.)
         sql = f"""
             DELETE FROM clips
             WHERE id NOT IN (
                 SELECT id FROM clips
-                {where_keep}
+                {f'WHERE {where}' if where else ''}
                 ORDER BY created_at DESC
-                LIMIT ?
+                LIMIT :keep
             )
-            {f'AND {where_keep[6:]}' if where_keep else ''}
+            {f'AND {where}' if where else ''}
         """
-        params_keep = params + [args.keep_last] + params
-        cur = conn.execute(sql, params_keep)
+        cur = conn.execute(sql, {**params, "keep": keep_last})
         deleted += cur.rowcount
-    if args.all:
+    if all_clips:
         cur = conn.execute("DELETE FROM clips")
         deleted += cur.rowcount
     conn.commit()
+    return deleted
+
+
+def cmd_purge(args: argparse.Namespace) -> None:
+    conn = connect_db()
+    init_db(conn)
+    deleted = purge_clips(conn, args.app, args.tag, args.older_than_days, args.keep_last, args.all)
     say(FATHER, f"purged {deleted} clips")
 
 
@@ -3074,28 +3952,120 @@ def ingest_transcript(
     return inserted_id
 
 
+# Batches at least this large, and at least a quarter of the table, are cheaper
+# to index with one FTS rebuild than row by row through clips_ai.
+BULK_FTS_MIN_ROWS = 500
+
+
+@contextlib.contextmanager
+def bulk_insert_context(conn: sqlite3.Connection):
+    """One transaction for a large batch of clip writes, indexed by a single FTS rebuild.
+
+    The FTS triggers are dropped for the batch and recreated before commit,
+    so other connections never see the schema without them; on error the
+    rollback restores them too.
+    """
+    if not conn.in_transaction:
+        conn.execute("BEGIN")
+    try:
+        for name in FTS_TRIGGER_NAMES:
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        yield conn
+        conn.execute("INSERT INTO clips_fts(clips_fts) VALUES('rebuild')")
+        for trigger in FTS_TRIGGERS_SQL:
+            conn.execute(trigger)
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+def insert_clips_bulk(
+    conn: sqlite3.Connection, rows: list[tuple], vecs: list[list[float]], model: str
+) -> dict[str, int]:
+    """Insert new clips and their vectors with executemany; returns hash -> clip id.
+
+    rows are (created_at, source_app, window_title, content, hash, title,
+    pinned, file_path, lang) with distinct hashes not yet in the table, and
+    vecs[i] is the embedding of rows[i]. Nothing is committed, so the caller
+    can wrap this together with tags and events in one transaction.
+    """
+    conn.executemany(
+        """
+        INSERT INTO clips (created_at, source_app, window_title, content, hash, title, pinned, file_path, lang)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        rows,
+    )
+    new_ids = clip_ids_by_hash(conn, [row[4] for row in rows])
+    conn.executemany(
+        UPSERT_VECTOR_SQL,
+        [(new_ids[row[4]], len(vec), pack_vector(vec), model) for row, vec in zip(rows, vecs)],
+    )
+    return new_ids
+
+
 def import_clips(conn: sqlite3.Connection, items: list[dict]) -> dict:
-    inserted = 0
-    existing = 0
+    """Import exported clips in one transaction.
+
+    Clips already present (by content hash, including repeats within items)
+    only get a clip_events row; new ones are inserted with embeddings and tags.
+    """
     failed = 0
+    order: list[str] = []
+    rows: dict[str, tuple] = {}
+    tags_by_digest: dict[str, set[str]] = {}
+    now = datetime.now(timezone.utc).isoformat()
     for item in items:
-        content = item.get("content") or ""
-        app = item.get("source_app") or "import"
-        window = item.get("window_title") or item.get("title") or ""
-        created_at = item.get("created_at")
-        pinned = bool(item.get("pinned", False))
-        title = item.get("title")
-        file_path = item.get("file_path")
-        lang = item.get("lang")
-        tags = item.get("tags") or []
-        clip_id = insert_clip_import(conn, content, app, window, created_at, pinned, title, file_path, lang, tags)
-        if clip_id is None:
+        clean = (item.get("content") or "").strip()
+        if not clean:
             failed += 1
             continue
-        if content and get_clip_id_by_hash(conn, hashlib.sha256(content.encode('utf-8')).hexdigest()) == clip_id:
-            inserted += 1
-        else:
-            existing += 1
+        digest = hashlib.sha256(clean.encode("utf-8")).hexdigest()
+        order.append(digest)
+        if digest in rows:
+            continue
+        rows[digest] = (
+            # stamped per item, as single inserts are, so undated clips keep their order
+            item.get("created_at") or datetime.now(timezone.utc).isoformat(),
+            item.get("source_app") or "import",
+            item.get("window_title") or item.get("title") or "",
+            clean,
+            digest,
+            item.get("title"),
+            1 if item.get("pinned", False) else 0,
+            item.get("file_path"),
+            item.get("lang") or detect_language(clean),
+        )
+        tags_by_digest[digest] = {t.strip().lower() for t in item.get("tags") or [] if t and t.strip()}
+
+    known = clip_ids_by_hash(conn, list(rows))
+    fresh = [digest for digest in rows if digest not in known]
+    vecs, model = embed_batch(get_embedder(conn, None), [rows[digest][3] for digest in fresh]) if fresh else ([], "")
+    tag_names = sorted(set().union(*(tags_by_digest[digest] for digest in fresh)))
+    inserted = existing = 0
+    seen: set[str] = set()
+    events = []
+    table_size = conn.execute("SELECT COALESCE(MAX(id), 0) FROM clips").fetchone()[0]
+    bulk = len(fresh) >= BULK_FTS_MIN_ROWS and len(fresh) * 4 >= table_size
+    with bulk_insert_context(conn) if bulk else conn:
+        new_ids = insert_clips_bulk(conn, [rows[digest] for digest in fresh], vecs, model)
+        if tag_names:
+            tag_ids = get_or_create_tags(conn, tag_names)
+            conn.executemany(
+                INSERT_CLIP_TAG_SQL,
+                [(new_ids[digest], tag_ids[name]) for digest in fresh for name in tags_by_digest[digest]],
+            )
+        for digest in order:
+            if digest in known or digest in seen:
+                existing += 1
+                events.append((known.get(digest) or new_ids[digest], now))
+            else:
+                inserted += 1
+                seen.add(digest)
+        conn.executemany(INSERT_EVENT_SQL, events)
+    if tag_names:
+        enforce_tag_caps(conn, tag_names)
     return {"inserted": inserted, "existing": existing, "failed": failed}
 
 
@@ -3117,7 +4087,7 @@ def cmd_ingest_file(args: argparse.Namespace) -> None:
 def cmd_watch_inbox(args: argparse.Namespace) -> None:
     conn = connect_db()
     init_db(conn)
-    inbox_dir = Path(args.dir).expanduser()
+    inbox_dir = Path(args.dir).expanduser() if args.dir else DB_DIR / "inbox"
     inbox_dir.mkdir(parents=True, exist_ok=True)
     max_bytes = get_max_bytes(conn, args.max_bytes)
     max_db_mb = get_max_db_mb(conn, None)
@@ -3218,26 +4188,14 @@ def cmd_related(args: argparse.Namespace) -> None:
         return
     qvec = load_embedding(row)
     model_used = row["model"] if "model" in row.keys() else "hash"
-    rows = fetch_semantic_candidates(conn, args.app, args.tag, args.pool, model_used)
-    ids, vecs = build_ann_index(rows)
+    ids, vecs = fetch_candidate_vectors(conn, model_used, args.pool, app=args.app, tag=args.tag)
     sims_all = knn(qvec, ids, vecs, args.limit + 1)
     sims = [(sim, cid) for sim, cid in sims_all if cid != args.id][: args.limit]
-    row_map: Dict[int, sqlite3.Row] = {row["id"]: row for row in rows}
-    tag_map = tags_for_clips(conn, [cid for _, cid in sims])
-    for sim, cid in sims:
-        r = row_map.get(cid)
-        if not r:
-            continue
-        preview = r["content"].replace("\n", "\\n")
-        if len(preview) > 120:
-            preview = preview[:117] + "..."
-        pin_mark = "*" if r["pinned"] else " "
-        tags = tag_map.get(r["id"], [])
-        tags_str = f" tags={','.join(tags)}" if tags else ""
-        title = f" \"{r['title']}\"" if r["title"] else ""
-        lang = r["lang"] if r["lang"] not in (None, "", "unk") else ""
-        lang_str = f" lang={lang}" if lang else ""
-        say(FATHER, f"{pin_mark}#{r['id']:>5} sim={sim:.3f} [{r['source_app']}] {preview}{title}{tags_str}{lang_str}")
+    scores = {cid: sim for sim, cid in sims}
+    rows = fetch_rows_by_id(conn, list(scores), preview=120)
+    tag_map = tags_for_clips(conn, list(scores))
+    for r in rows:
+        say(FATHER, clip_line(r, 120, tag_map.get(r["id"], []), meta=f"sim={scores[r['id']]:.3f} "))
 
 
 def cmd_recap(args: argparse.Namespace) -> None:
@@ -3245,8 +4203,8 @@ def cmd_recap(args: argparse.Namespace) -> None:
     init_db(conn)
     cutoff = datetime.now(timezone.utc) - timedelta(minutes=args.minutes)
     cur = conn.execute(
-        """
-        SELECT id, created_at, source_app, window_title, content, title, lang
+        f"""
+        SELECT id, created_at, source_app, window_title, {preview_sql(100)}, title, lang
         FROM clips
         WHERE datetime(created_at) >= datetime(?)
         ORDER BY created_at DESC
@@ -3264,13 +4222,10 @@ def cmd_recap(args: argparse.Namespace) -> None:
     for app, items in grouped.items():
         say(FATHER, f"[{app}] {len(items)} clips")
         for row in items:
-            preview = row["content"].replace("\n", "\\n")
-            if len(preview) > 100:
-                preview = preview[:97] + "..."
             title = f" \"{row['title']}\"" if row["title"] else ""
             lang = row["lang"] if row["lang"] not in (None, "", "unk") else ""
             lang_str = f" lang={lang}" if lang else ""
-            say(FATHER, f"  - {row['created_at']}: {preview}{title}{lang_str}")
+            say(FATHER, f"  - {row['created_at']}: {clip_preview(row, 100)}{title}{lang_str}")
 
 
 def cmd_context(args: argparse.Namespace) -> None:
@@ -3288,18 +4243,7 @@ def cmd_context(args: argparse.Namespace) -> None:
         say(FATHER, "no context rows")
         return
     for row in rows:
-        pin_mark = "*" if row["pinned"] else " "
-        tags = row.get("tags") or []
-        tags_str = f" tags={','.join(tags)}" if tags else ""
-        title = f" \"{row['title']}\"" if row["title"] else ""
-        lang = row["lang"] if row["lang"] not in (None, "", "unk") else ""
-        lang_str = f" lang={lang}" if lang else ""
-        note_ct = len(row.get("notes") or [])
-        notes_str = f" notes={note_ct}" if note_ct else ""
-        preview = row["content"].replace("\n", "\\n")
-        if len(preview) > 120:
-            preview = preview[:117] + "..."
-        say(FATHER, f"{pin_mark}#{row['id']:>5} {row['created_at']} [{row['source_app']}] {preview}{title}{tags_str}{notes_str}{lang_str}")
+        say(FATHER, clip_line(row, 120, row.get("tags") or [], meta=f"{row['created_at']} ", notes=len(row.get("notes") or [])))
 
 
 def cmd_topics(args: argparse.Namespace) -> None:
@@ -3325,16 +4269,7 @@ def cmd_topics(args: argparse.Namespace) -> None:
     for grp in groups:
         say(FATHER, f"[{grp['kind']}] {grp['name']} ({grp['count']} clips, latest {grp['latest']})")
         for row in grp["items"]:
-            preview = row["content"].replace("\n", "\\n")
-            if len(preview) > 100:
-                preview = preview[:97] + "..."
-            pin_mark = "*" if row["pinned"] else " "
-            tags = row.get("tags") or []
-            tags_str = f" tags={','.join(tags)}" if tags else ""
-            title = f" \"{row['title']}\"" if row["title"] else ""
-            lang = row["lang"] if row["lang"] not in (None, "", "unk") else ""
-            lang_str = f" lang={lang}" if lang else ""
-            say(FATHER, f"  {pin_mark}#{row['id']:>5} [{row['source_app']}] {preview}{title}{tags_str}{lang_str}")
+            say(FATHER, "  " + clip_line(row, 100, row.get("tags") or []))
 
 
 def cmd_palette(args: argparse.Namespace) -> None:
@@ -3345,86 +4280,26 @@ def cmd_palette(args: argparse.Namespace) -> None:
     if args.semantic and args.query:
         embedder_kind = get_embedder(conn, getattr(args, "embedder", None))
         qvec, model_used = embed_from_kind(embedder_kind, args.query)
-        rows_sem = fetch_semantic_candidates(conn, args.app, args.tag, args.limit * 5, model_used, since_iso=since_iso, pins_only=args.pins_only)
-        ids, vecs = build_ann_index(rows_sem)
+        ids, vecs = fetch_candidate_vectors(
+            conn, model_used, args.limit * 5, app=args.app, tag=args.tag, since_iso=since_iso, pins_only=args.pins_only
+        )
         sims = knn(qvec, ids, vecs, args.limit)
-        row_map = {row["id"]: row for row in rows_sem}
-        for sim, cid in sims:
-            row = row_map.get(cid)
-            if row:
-                rows.append(row)
+        rows = fetch_rows_by_id(conn, [cid for _, cid in sims], preview=80)
     elif args.query:
-        # FTS filter
-        clauses = ["clips_fts MATCH ?"]
-        params = [args.query]
-        if args.app:
-            clauses.append("LOWER(c.source_app) = LOWER(?)")
-            params.append(args.app)
-        if args.tag:
-            clauses.append(
-                "c.id IN (SELECT clip_id FROM clip_tags ct JOIN tags t ON t.id = ct.tag_id WHERE LOWER(t.name) = LOWER(?))"
-            )
-            params.append(args.tag)
-        if args.pins_only:
-            clauses.append("c.pinned = 1")
-        if since_iso:
-            clauses.append("datetime(c.created_at) >= datetime(?)")
-            params.append(since_iso)
-        where = " AND ".join(clauses)
-        sql = f"""
-            SELECT c.id, c.created_at, c.source_app, c.window_title, c.content, c.pinned, c.title, c.lang
-            FROM clips_fts f
-            JOIN clips c ON c.id = f.rowid
-            WHERE {where}
-            ORDER BY c.created_at DESC
-            LIMIT ?;
-        """
-        params.append(args.limit)
-        cur = conn.execute(sql, params)
-        rows = cur.fetchall()
+        rows = search_rows(
+            conn, args.query, args.limit, app=args.app, tag=args.tag, pins_only=args.pins_only, since_iso=since_iso, preview=80
+        )
     else:
-        clauses = []
-        params = []
-        if args.app:
-            clauses.append("LOWER(source_app) = LOWER(?)")
-            params.append(args.app)
-        if args.tag:
-            clauses.append(
-                "id IN (SELECT clip_id FROM clip_tags ct JOIN tags t ON t.id = ct.tag_id WHERE LOWER(t.name) = LOWER(?))"
-            )
-            params.append(args.tag)
-        if args.pins_only:
-            clauses.append("pinned = 1")
-        if since_iso:
-            clauses.append("datetime(created_at) >= datetime(?)")
-            params.append(since_iso)
-        where = "WHERE " + " AND ".join(clauses) if clauses else ""
-        sql = f"""
-            SELECT id, created_at, source_app, window_title, content, pinned, title, lang
-            FROM clips
-            {where}
-            ORDER BY created_at DESC
-            LIMIT ?;
-        """
-        params.append(args.limit)
-        cur = conn.execute(sql, params)
-        rows = cur.fetchall()
+        rows, _ = filtered_rows(
+            conn, args.limit, app=args.app, tag=args.tag, pins_only=args.pins_only, since_iso=since_iso, preview=80
+        )
 
     if not rows:
         say(FATHER, "no clips found for palette")
         return
     tag_map = tags_for_clips(conn, [row["id"] for row in rows])
     for idx, row in enumerate(rows, start=1):
-        preview = row["content"].replace("\n", "\\n")
-        if len(preview) > 80:
-            preview = preview[:77] + "..."
-        title = f" \"{row['title']}\"" if row["title"] else ""
-        tags = tag_map.get(row["id"], [])
-        tags_str = f" tags={','.join(tags)}" if tags else ""
-        pin_mark = "*" if row["pinned"] else " "
-        lang = row["lang"] if row["lang"] not in (None, "", "unk") else ""
-        lang_str = f" lang={lang}" if lang else ""
-        say(FATHER, f"{idx:>2}. {pin_mark}#{row['id']:>5} [{row['source_app']}] {preview}{title}{tags_str}{lang_str}")
+        say(FATHER, f"{idx:>2}. " + clip_line(row, 80, tag_map.get(row["id"], [])))
     choice = input("[father] pick number to copy (blank to cancel): ").strip()
     if not choice:
         return
@@ -3436,56 +4311,115 @@ def cmd_palette(args: argparse.Namespace) -> None:
     if num < 1 or num > len(rows):
         say(FATHER, "out of range")
         return
-    selected = rows[num - 1]
-    if copy_to_clipboard(selected["content"]):
-        say(FATHER, f"copied clip #{selected['id']} to clipboard")
-    else:
-        say(FATHER, "failed to copy to clipboard")
+    selected = fetch_clip(conn, rows[num - 1]["id"])
+    if selected is None:
+        say(FATHER, "clip no longer exists")
+        return
+    content = selected["content"]
+    if len(content) > COPY_BACKGROUND_CHARS:
+        say(FATHER, f"copying clip #{selected['id']} to clipboard in the background")
+        copy_pool().submit(palette_copy, selected["id"], content)
+        return
+    palette_copy(selected["id"], content)
+
+
+def palette_copy(clip_id: int, content: str) -> None:
+    if copy_to_clipboard(content):
+        say(FATHER, f"copied clip #{clip_id} to clipboard")
+    else:
+        say(FATHER, "failed to copy to clipboard")
 
 
 # ---------- HTTP server ----------
-class ApiHandler(http.server.BaseHTTPRequestHandler):
-    def __init__(self, *inner_args, conn: sqlite3.Connection, **kwargs):
-        self.conn = conn
-        super().__init__(*inner_args, **kwargs)
+# compact separators match orjson's output, so bodies are identical either way
+_JSON_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
 
-    def _send(self, status: int, data: dict) -> None:
-        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
-        self.send_response(status)
-        self.send_header("Content-Type", "application/json")
-        self.send_header("Content-Length", str(len(body)))
-        self.send_header("Access-Control-Allow-Origin", "*")
-        self.end_headers()
-        self.wfile.write(body)
 
-    def _parse_json(self) -> dict:
-        length = int(self.headers.get("Content-Length", "0"))
-        if length == 0:
-            return {}
-        raw = self.rfile.read(length)
-        try:
-            return json.loads(raw)
-        except json.JSONDecodeError:
-            return {}
+def json_bytes(data) -> bytes:
+    """Compact UTF-8 JSON for HTTP bodies; orjson when installed (several times faster on large clip lists)."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    return _JSON_ENCODER.encode(data).encode("utf-8")
 
-    def log_message(self, format: str, *args) -> None:
-        # Quiet by default
-        return
 
-    def do_OPTIONS(self) -> None:
-        self.send_response(204)
-        self.send_header("Access-Control-Allow-Origin", "*")
-        self.send_header("Access-Control-Allow-Methods", "GET,POST,DELETE,OPTIONS")
-        self.send_header("Access-Control-Allow-Headers", "Content-Type")
-        self.end_headers()
+_TRUE_VALUES = frozenset(("1", "true", "yes", "on"))
 
-    def do_GET(self) -> None:
-        path, _, query = self.path.partition("?")
-        qs = urllib.parse.parse_qs(query)
-        conn = self.conn
-        init_db(conn)
-        if path in ("/", "/ui"):
-            html = """
+
+QUERY_MAX_FIELDS = 64
+
+
+def parse_query(query: str) -> dict[str, str]:
+    # first value wins, matching the old parse_qs(...)[0] lookups; raises
+    # ValueError past QUERY_MAX_FIELDS so a junk query can't balloon the dict
+    qs: dict[str, str] = {}
+    for key, value in urllib.parse.parse_qsl(query, max_num_fields=QUERY_MAX_FIELDS):
+        qs.setdefault(key, value)
+    return qs
+
+
+def qs_int(qs: dict[str, str], key: str, default: Optional[int]) -> Optional[int]:
+    if key not in qs:
+        return default
+    try:
+        return int(qs[key])
+    except ValueError:
+        return default
+
+
+@dataclass(slots=True)
+class ListParams:
+    limit: int
+    app: Optional[str] = None
+    tag: Optional[str] = None
+    pins_only: bool = False
+    hours: Optional[float] = None
+    since_iso: Optional[str] = None
+    until_iso: Optional[str] = None
+    before: Optional[str] = None
+    after: Optional[str] = None
+    before_id: Optional[int] = None
+    after_id: Optional[int] = None
+    pool: int = 2000
+
+    @classmethod
+    def from_qs(cls, qs: dict[str, str], default_limit: int = 10) -> "ListParams":
+        limit = qs_int(qs, "limit", default_limit)
+        hours = None
+        if "hours" in qs:
+            try:
+                hours = float(qs["hours"])
+            except ValueError:
+                hours = None
+        since = qs.get("since")
+        until = qs.get("until")
+        if hours is not None:
+            since_iso = iso_hours_ago(hours)
+        else:
+            since_iso = parse_iso_dt(since) if since else None
+        return cls(
+            limit=limit,
+            app=qs.get("app"),
+            tag=qs.get("tag"),
+            pins_only=qs.get("pins_only", "false").lower() in _TRUE_VALUES,
+            hours=hours,
+            since_iso=since_iso,
+            until_iso=parse_iso_dt(until) if until else None,
+            before=qs.get("before"),
+            after=qs.get("after"),
+            before_id=qs_int(qs, "before_id", None),
+            after_id=qs_int(qs, "after_id", None),
+            pool=qs_int(qs, "pool", 2000),
+        )
+
+
+def json_loads(raw: bytes):
+    # orjson.JSONDecodeError subclasses json.JSONDecodeError
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+UI_HTML = """
 <!doctype html>
 <html>
 <head>
@@ -3496,6 +4430,7 @@ class ApiHandler(http.server.BaseHTTPRequestHandler):
     h1 { margin-top: 0; }
     input, button, select { padding: 8px; margin: 4px; border-radius: 4px; border: 1px solid #334; background: #111727; color: #e8ecf1; }
     .result { padding: 8px; margin: 8px 0; border: 1px solid #223; border-radius: 6px; background: #111727; }
+    .result.placeholder { min-height: 160px; }
     .topic { border-color: #2a3b5e; }
     .topic-header { color: #9cd1ff; font-weight: 600; margin-bottom: 6px; }
     .topic-items { margin-left: 6px; }
@@ -3539,9 +4474,13 @@ class ApiHandler(http.server.BaseHTTPRequestHandler):
     <button onclick="loadTopics()">Topics</button>
   </div>
   <div id="results"></div>
+  <button id="more" onclick="loadMore()" style="display:none">Load more</button>
   <script>
+    const PAGE_SIZE = 30;
     let lastMode = 'recent';
     let autoTimer = null;
+    let recentItems = [];
+    let hasMore = false;
     async function loadTags() {
       const r = await fetch('/tags');
       const data = await r.json();
@@ -3577,20 +4516,50 @@ class ApiHandler(http.server.BaseHTTPRequestHandler):
         el.textContent = '';
       }
     }
-    async function loadRecent() {
-      lastMode = 'recent';
+    function recentParams() {
       const app = document.getElementById('app').value;
       const tag = document.getElementById('tag').value;
       const pins = document.getElementById('pins').checked;
       const hours = document.getElementById('timeframe').value;
-      const params = new URLSearchParams({limit: 30});
+      const params = new URLSearchParams({limit: PAGE_SIZE});
       if (app) params.set('app', app);
       if (tag) params.set('tag', tag);
       if (pins) params.set('pins_only', 'true');
       if (hours) params.set('hours', hours);
+      return params;
+    }
+    async function fetchRecent(params) {
       const r = await fetch('/recent?' + params.toString());
       const data = await r.json();
-      render(data.items || []);
+      return data.items || [];
+    }
+    async function loadRecent() {
+      lastMode = 'recent';
+      recentItems = await fetchRecent(recentParams());
+      hasMore = recentItems.length >= PAGE_SIZE;
+      render(recentItems);
+    }
+    async function loadMore() {
+      if (lastMode !== 'recent' || !recentItems.length) return;
+      const params = recentParams();
+      const last = recentItems[recentItems.length - 1];
+      params.set('before', last.created_at);
+      params.set('before_id', last.id);
+      const older = await fetchRecent(params);
+      hasMore = older.length >= PAGE_SIZE;
+      recentItems = recentItems.concat(older);
+      render(recentItems);
+    }
+    async function refreshRecent() {
+      if (!recentItems.length) { loadRecent(); return; }
+      const params = recentParams();
+      params.set('after', recentItems[0].created_at);
+      params.set('after_id', recentItems[0].id);
+      const newer = await fetchRecent(params);
+      if (!newer.length) return;
+      if (newer.length >= PAGE_SIZE) { loadRecent(); return; }
+      recentItems = newer.concat(recentItems);
+      render(recentItems);
     }
     async function runSearch() {
       const q = document.getElementById('q').value.trim();
@@ -3640,42 +4609,82 @@ class ApiHandler(http.server.BaseHTTPRequestHandler):
         if (lastMode === 'topics') {
           loadTopics();
         } else {
-          loadRecent();
+          refreshRecent();
         }
       }, seconds * 1000);
     }
+    // Cards are cached by clip id and only mounted once they scroll near the
+    // viewport, so auto-refresh reuses DOM nodes instead of rebuilding them.
+    const cards = new Map();
+    let cardObserver = null;
+    function cardKey(it) {
+      return [it.pinned, it.title, it.lang, (it.tags || []).join(','), (it.notes || []).length, it.score, it.created_at].join('|');
+    }
+    function cardHtml(it) {
+      const pin = it.pinned ? '<span class="pinned" title="pinned">*</span> ' : '';
+      const tags = (it.tags || []).map(t => `<span class="tag">${t}</span>`).join(' ');
+      const score = it.score !== undefined ? `<span class="score"> sim=${it.score.toFixed(3)}</span>` : '';
+      const lang = it.lang && it.lang !== 'unk' ? ` lang=${it.lang}` : '';
+      const notes = (it.notes || []).map(n => `<div class="note">🗒 ${n.note.replace(/</g,'&lt;')} <small>${n.created_at}</small></div>`).join('') || '<div class="note"><small>no notes</small></div>';
+      return `
+        <div class="meta">${pin}#${it.id} [${it.source_app || 'unknown'}${lang}] ${it.created_at} ${score}</div>
+        <div>${(it.title || '').replace(/</g,'&lt;')}</div>
+        <pre style="white-space: pre-wrap; font-family: ui-monospace, SFMono-Regular, Menlo, monospace;">${(it.content || '').replace(/</g,'&lt;')}</pre>
+        <div>${tags}</div>
+        <div>${notes}</div>
+        <div>
+          <textarea id="note-${it.id}" rows="2" style="width:100%; background:#0f1526; color:#e8ecf1; border:1px solid #223; border-radius:4px;" placeholder="Add note..."></textarea>
+          <button onclick="addNote('${it.id}')">Add note</button>
+        </div>
+        <div>
+          <button onclick="copyContent('${it.id}')">Copy</button>
+          <button onclick="togglePin('${it.id}', ${it.pinned ? 'false' : 'true'})">${it.pinned ? 'Unpin' : 'Pin'}</button>
+        </div>
+      `;
+    }
+    function mountCard(div) {
+      div.innerHTML = cardHtml(div._item);
+      div.classList.remove('placeholder');
+    }
     function render(items) {
       const el = document.getElementById('results');
-      el.innerHTML = '';
-      items.forEach(it => {
+      if (!cardObserver) {
+        cardObserver = new IntersectionObserver(entries => {
+          entries.forEach(entry => {
+            if (!entry.isIntersecting) return;
+            cardObserver.unobserve(entry.target);
+            mountCard(entry.target);
+          });
+        }, {rootMargin: '600px 0px'});
+      }
+      const seen = new Set();
+      const nodes = items.map(it => {
+        const id = String(it.id);
+        const key = cardKey(it);
+        seen.add(id);
+        const cached = cards.get(id);
+        if (cached && cached.key === key) return cached.div;
+        if (cached) cardObserver.unobserve(cached.div);
         const div = document.createElement('div');
-        div.className = 'result';
-        const pin = it.pinned ? '<span class="pinned" title="pinned">*</span> ' : '';
-        const tags = (it.tags || []).map(t => `<span class="tag">${t}</span>`).join(' ');
-        const score = it.score !== undefined ? `<span class="score"> sim=${it.score.toFixed(3)}</span>` : '';
-        const lang = it.lang && it.lang !== 'unk' ? ` lang=${it.lang}` : '';
-        const notes = (it.notes || []).map(n => `<div class="note">🗒 ${n.note.replace(/</g,'&lt;')} <small>${n.created_at}</small></div>`).join('') || '<div class="note"><small>no notes</small></div>';
-        div.innerHTML = `
-          <div class="meta">${pin}#${it.id} [${it.source_app || 'unknown'}${lang}] ${it.created_at} ${score}</div>
-          <div>${(it.title || '').replace(/</g,'&lt;')}</div>
-          <pre style="white-space: pre-wrap; font-family: ui-monospace, SFMono-Regular, Menlo, monospace;">${(it.content || '').replace(/</g,'&lt;')}</pre>
-          <div>${tags}</div>
-          <div>${notes}</div>
-          <div>
-            <textarea id="note-${it.id}" rows="2" style="width:100%; background:#0f1526; color:#e8ecf1; border:1px solid #223; border-radius:4px;" placeholder="Add note..."></textarea>
-            <button onclick="addNote('${it.id}')">Add note</button>
-          </div>
-          <div>
-            <button onclick="copyContent('${it.id}')">Copy</button>
-            <button onclick="togglePin('${it.id}', ${it.pinned ? 'false' : 'true'})">${it.pinned ? 'Unpin' : 'Pin'}</button>
-          </div>
-        `;
-        el.appendChild(div);
+        div.className = 'result placeholder';
+        div._item = it;
+        cards.set(id, {key, div});
+        cardObserver.observe(div);
+        return div;
       });
+      for (const id of Array.from(cards.keys())) {
+        if (!seen.has(id)) {
+          cardObserver.unobserve(cards.get(id).div);
+          cards.delete(id);
+        }
+      }
+      el.replaceChildren(...nodes);
+      document.getElementById('more').style.display = lastMode === 'recent' && hasMore ? '' : 'none';
     }
     function renderTopics(groups) {
       const el = document.getElementById('results');
       el.innerHTML = '';
+      document.getElementById('more').style.display = 'none';
       groups.forEach(g => {
         const div = document.createElement('div');
         div.className = 'result topic';
@@ -3799,709 +4808,765 @@ class ApiHandler(http.server.BaseHTTPRequestHandler):
 </body>
 </html>
 """
-            body = html.encode("utf-8")
-            self.send_response(200)
-            self.send_header("Content-Type", "text/html; charset=utf-8")
-            self.send_header("Content-Length", str(len(body)))
-            self.end_headers()
-            self.wfile.write(body)
+UI_HTML_BYTES = UI_HTML.encode("utf-8")
+
+
+class ApiServer(http.server.ThreadingHTTPServer):
+    request_queue_size = 128
+
+
+class ApiHandler(http.server.BaseHTTPRequestHandler):
+    # Keep-alive: every response carries Content-Length or chunked framing, and
+    # request bodies are always drained so the next request parses cleanly.
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    timeout = 30  # drop idle keep-alive connections so their threads exit
+    # helper/AI calls run subprocesses for seconds; keep them off the write lock
+    UNLOCKED_POSTS = frozenset(("/helper", "/ai"))
+
+    def __init__(self, *inner_args, pool: ReadPool, writer: sqlite3.Connection, write_lock: threading.Lock, **kwargs):
+        # Reads borrow a read-only connection from the pool for one request (WAL
+        # lets them run alongside writes); writes share one process-wide
+        # connection under a lock.
+        self.pool = pool
+        self.writer = writer
+        self.write_lock = write_lock
+        self._body: Optional[bytes] = None
+        super().__init__(*inner_args, **kwargs)
+
+    def _send(self, status: int, data: dict) -> None:
+        body = json_bytes(data)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, status: int, content_type: str, chunks: Iterable[bytes], headers: Optional[dict] = None) -> None:
+        # Chunked framing needs HTTP/1.1 on both ends; otherwise stream the raw
+        # body and let the closed connection mark its end.
+        chunked = self.protocol_version == "HTTP/1.1" and self.request_version == "HTTP/1.1"
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        if chunked:
+            self.send_header("Transfer-Encoding", "chunked")
+        else:
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        for chunk in chunks:
+            if not chunk:
+                continue
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk) if chunked else chunk)
+        if chunked:
+            self.wfile.write(b"0\r\n\r\n")
+
+    def _read_body(self) -> bytes:
+        if self._body is None:
+            encoding = self.headers.get("Transfer-Encoding", "identity").strip().lower()
+            if encoding == "chunked":
+                self._body = self._read_chunked()
+            elif encoding != "identity":
+                # other codings aren't decoded; drop the connection rather than misparse it
+                self._body = b""
+                self.close_connection = True
+            else:
+                length = int(self.headers.get("Content-Length", "0"))
+                self._body = self.rfile.read(length) if length > 0 else b""
+        return self._body
+
+    def _read_chunked(self) -> bytes:
+        """Decode a chunked request body so keep-alive parsing resumes after it."""
+        parts = []
+        try:
+            while True:
+                size = int(self.rfile.readline(1024).split(b";", 1)[0], 16)
+                if size == 0:
+                    while self.rfile.readline(1024).strip():  # trailers up to the blank line
+                        pass
+                    return b"".join(parts)
+                parts.append(self.rfile.read(size))
+                self.rfile.readline(1024)  # CRLF after the chunk data
+        except ValueError:
+            pass
+        # malformed framing: nothing after it on this connection can be trusted
+        self.close_connection = True
+        return b"".join(parts)
+
+    def _parse_json(self) -> dict:
+        raw = self._read_body()
+        if not raw:
+            return {}
+        try:
+            return json_loads(raw)
+        except json.JSONDecodeError:
+            return {}
+
+    def log_message(self, format: str, *args) -> None:
+        # Quiet by default
+        return
+
+    def do_OPTIONS(self) -> None:
+        self.send_response(204)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Allow-Methods", "GET,POST,DELETE,OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "Content-Type")
+        self.end_headers()
+
+    def do_GET(self) -> None:
+        path, _, query = self.path.partition("?")
+        handler = self.GET_ROUTES.get(path)
+        if handler is None:
+            self._send(404, {"error": "not found"})
             return
-        if path == "/health":
-            self._send(200, {"ok": True})
+        try:
+            qs = parse_query(query)
+        except ValueError:
+            self._send(400, {"error": "too many query parameters"})
             return
-        if path == "/stats":
-            s = stats(conn)
-            s["db_size_mb"] = round(s["db_size_bytes"] / (1024 * 1024), 3)
-            self._send(200, s)
+        conn = self.pool.acquire()
+        try:
+            handler(self, qs, conn)
+        finally:
+            self.pool.release(conn)
+
+    def do_POST(self) -> None:
+        self._body = None
+        try:
+            self._dispatch_post()
+        finally:
+            self._read_body()
+
+    def _dispatch_post(self) -> None:
+        handler = self.POST_ROUTES.get(self.path)
+        if handler is None:
+            self._send(404, {"error": "not found"})
             return
-        if path == "/recent":
-            limit = int(qs.get("limit", [10])[0])
-            app = qs.get("app", [None])[0]
-            contains = qs.get("contains", [None])[0]
-            tag = qs.get("tag", [None])[0]
-            pins_only = qs.get("pins_only", ["false"])[0].lower() in ("1", "true", "yes", "on")
-            since_param = qs.get("since", [None])[0]
-            until_param = qs.get("until", [None])[0]
-            hours_param = qs.get("hours", [None])[0]
-            since_iso = parse_iso_dt(since_param) if since_param else None
-            if hours_param is not None:
-                try:
-                    since_iso = iso_hours_ago(float(hours_param))
-                except Exception:
-                    pass
-            until_iso = parse_iso_dt(until_param) if until_param else None
+        if self.path in self.UNLOCKED_POSTS:
+            conn = connect_db()
+            try:
+                handler(self, conn)
+            finally:
+                conn.close()
+            return
+        with self.write_lock:
+            try:
+                handler(self, self.writer)
+            finally:
+                self._end_write()
+
+    def _end_write(self) -> None:
+        # a handler that raised mid-write would leave the shared writer holding
+        # the database write lock until some later request committed
+        if self.writer.in_transaction:
+            self.writer.rollback()
+
+    def _get_ui(self, qs: dict[str, str], conn: sqlite3.Connection) -> None:
+        body = UI_HTML_BYTES
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _get_health(self, qs: dict[str, str], conn: sqlite3.Connection) -> None:
+        self._send(200, {"ok": True})
+
+    def _get_stats(self, qs: dict[str, str], conn: sqlite3.Connection) -> None:
+        s = stats(conn)
+        s["db_size_mb"] = round(s["db_size_bytes"] / (1024 * 1024), 3)
+        self._send(200, s)
+
+    def _get_recent(self, qs: dict[str, str], conn: sqlite3.Connection) -> None:
+        p = ListParams.from_qs(qs, default_limit=10)
+        contains = qs.get("contains")
+        if not (p.app or contains or p.tag or p.pins_only or p.since_iso or p.until_iso or p.before or p.after):
+            rows_db, tag_map, notes_map = recent_annotated_rows(conn, p.limit)
+        else:
             rows_db, tag_map = filtered_rows(
                 conn,
-                limit,
-                app=app,
+                p.limit,
+                app=p.app,
                 contains=contains,
-                tag=tag,
-                pins_only=pins_only,
-                since_iso=since_iso,
-                until_iso=until_iso,
+                tag=p.tag,
+                pins_only=p.pins_only,
+                since_iso=p.since_iso,
+                until_iso=p.until_iso,
+                before=p.before,
+                after=p.after,
+                before_id=p.before_id,
+                after_id=p.after_id,
             )
             notes_map = notes_for_clips(conn, [row["id"] for row in rows_db])
-            rows = []
-            for row in rows_db:
-                rows.append(
-                    dict(
-                        id=row["id"],
-                        created_at=row["created_at"],
-                        source_app=row["source_app"],
-                        window_title=row["window_title"],
-                        content=row["content"],
-                        pinned=bool(row["pinned"]),
-                        title=row["title"],
-                        lang=row["lang"],
-                        tags=tag_map.get(row["id"], []),
-                        notes=notes_map.get(row["id"], []),
-                    )
-            )
-            self._send(200, {"items": rows})
-            return
-        if path == "/context":
-            limit = int(qs.get("limit", [20])[0])
-            app = qs.get("app", [None])[0]
-            tag = qs.get("tag", [None])[0]
-            pins_only = qs.get("pins_only", ["false"])[0].lower() in ("1", "true", "yes", "on")
-            hours_param = qs.get("hours", [None])[0]
-            try:
-                hours = float(hours_param) if hours_param is not None else None
-            except Exception:
-                hours = None
-            rows = context_bundle(conn, app=app, tag=tag, limit=limit, hours=hours, pins_only=pins_only)
-            self._send(200, {"items": rows})
-            return
-        if path == "/topics":
-            limit = int(qs.get("limit", [8])[0])
-            per_group = int(qs.get("per_group", [5])[0])
-            app = qs.get("app", [None])[0]
-            tag = qs.get("tag", [None])[0]
-            pins_only = qs.get("pins_only", ["false"])[0].lower() in ("1", "true", "yes", "on")
-            since_param = qs.get("since", [None])[0]
-            until_param = qs.get("until", [None])[0]
-            hours_param = qs.get("hours", [None])[0]
-            since_iso = parse_iso_dt(since_param) if since_param else None
-            if hours_param is not None:
-                try:
-                    since_iso = iso_hours_ago(float(hours_param))
-                except Exception:
-                    pass
-            until_iso = parse_iso_dt(until_param) if until_param else None
-            groups = topic_groups(
-                conn,
-                limit_groups=limit,
-                per_group=per_group,
-                app=app,
-                tag=tag,
-                pins_only=pins_only,
-                since_iso=since_iso,
-                until_iso=until_iso,
-            )
-            self._send(200, {"groups": groups})
-            return
-        if path == "/search":
-            q = qs.get("q", [""])[0]
-            limit = int(qs.get("limit", [10])[0])
-            app = qs.get("app", [None])[0]
-            tag = qs.get("tag", [None])[0]
-            pins_only = qs.get("pins_only", ["false"])[0].lower() in ("1", "true", "yes", "on")
-            since_param = qs.get("since", [None])[0]
-            until_param = qs.get("until", [None])[0]
-            hours_param = qs.get("hours", [None])[0]
-            since_iso = parse_iso_dt(since_param) if since_param else None
-            if hours_param is not None:
-                try:
-                    since_iso = iso_hours_ago(float(hours_param))
-                except Exception:
-                    pass
-            until_iso = parse_iso_dt(until_param) if until_param else None
-            clauses = ["clips_fts MATCH ?"]
-            params = [q]
-            if app:
-                clauses.append("LOWER(c.source_app) = LOWER(?)")
-                params.append(app)
-            if tag:
-                clauses.append(
-                    "c.id IN (SELECT clip_id FROM clip_tags ct JOIN tags t ON t.id = ct.tag_id WHERE LOWER(t.name) = LOWER(?))"
+        rows = []
+        for row in rows_db:
+            rows.append(
+                dict(
+                    id=row["id"],
+                    created_at=row["created_at"],
+                    source_app=row["source_app"],
+                    window_title=row["window_title"],
+                    content=row["content"],
+                    pinned=bool(row["pinned"]),
+                    title=row["title"],
+                    lang=row["lang"],
+                    tags=tag_map.get(row["id"], []),
+                    notes=notes_map.get(row["id"], []),
                 )
-                params.append(tag)
-            if pins_only:
-                clauses.append("c.pinned = 1")
-            if since_iso:
-                clauses.append("datetime(c.created_at) >= datetime(?)")
-                params.append(since_iso)
-            if until_iso:
-                clauses.append("datetime(c.created_at) <= datetime(?)")
-                params.append(until_iso)
-            where = " AND ".join(clauses)
-            sql = f"""
-                SELECT c.id, c.created_at, c.source_app, c.window_title, c.content, c.pinned, c.title, c.lang
-                FROM clips_fts f
-                JOIN clips c ON c.id = f.rowid
-                WHERE {where}
-                ORDER BY c.created_at DESC
-                LIMIT ?;
-            """
-            params.append(limit)
-            cur = conn.execute(sql, params)
-            rows_db = cur.fetchall()
-            tag_map = tags_for_clips(conn, [row["id"] for row in rows_db])
-            notes_map = notes_for_clips(conn, [row["id"] for row in rows_db])
-            rows = []
-            for row in rows_db:
-                rows.append(
-                    dict(
-                        id=row["id"],
-                        created_at=row["created_at"],
-                        source_app=row["source_app"],
-                        window_title=row["window_title"],
-                        content=row["content"],
-                        pinned=bool(row["pinned"]),
-                        title=row["title"],
-                        lang=row["lang"],
-                        tags=tag_map.get(row["id"], []),
-                        notes=notes_map.get(row["id"], []),
-                    )
+        )
+        self._send(200, {"items": rows})
+
+    def _get_context(self, qs: dict[str, str], conn: sqlite3.Connection) -> None:
+        p = ListParams.from_qs(qs, default_limit=20)
+        rows = context_bundle(conn, app=p.app, tag=p.tag, limit=p.limit, hours=p.hours, pins_only=p.pins_only)
+        self._send(200, {"items": rows})
+
+    def _get_topics(self, qs: dict[str, str], conn: sqlite3.Connection) -> None:
+        p = ListParams.from_qs(qs, default_limit=8)
+        per_group = qs_int(qs, "per_group", 5)
+        groups = topic_groups(
+            conn,
+            limit_groups=p.limit,
+            per_group=per_group,
+            app=p.app,
+            tag=p.tag,
+            pins_only=p.pins_only,
+            since_iso=p.since_iso,
+            until_iso=p.until_iso,
+        )
+        self._send(200, {"groups": groups})
+
+    def _get_search(self, qs: dict[str, str], conn: sqlite3.Connection) -> None:
+        q = qs.get("q", "")
+        p = ListParams.from_qs(qs, default_limit=10)
+        rows_db = search_rows(
+            conn,
+            q,
+            p.limit,
+            app=p.app,
+            tag=p.tag,
+            pins_only=p.pins_only,
+            since_iso=p.since_iso,
+            until_iso=p.until_iso,
+            before=p.before,
+            after=p.after,
+            sort=qs.get("sort", "time"),
+            before_id=p.before_id,
+            after_id=p.after_id,
+        )
+        tag_map, notes_map = tags_and_notes_for_clips(conn, [row["id"] for row in rows_db])
+        rows = []
+        for row in rows_db:
+            rows.append(
+                dict(
+                    id=row["id"],
+                    created_at=row["created_at"],
+                    source_app=row["source_app"],
+                    window_title=row["window_title"],
+                    content=row["content"],
+                    pinned=bool(row["pinned"]),
+                    title=row["title"],
+                    lang=row["lang"],
+                    tags=tag_map.get(row["id"], []),
+                    notes=notes_map.get(row["id"], []),
                 )
-            self._send(200, {"items": rows})
-            return
-        if path == "/blocklist":
-            apps = sorted(get_blocklist(conn))
-            self._send(200, {"blocklist": apps})
+            )
+        self._send(200, {"items": rows})
+
+    def _get_blocklist(self, qs: dict[str, str], conn: sqlite3.Connection) -> None:
+        apps = sorted(get_blocklist(conn))
+        self._send(200, {"blocklist": apps})
+
+    def _get_tags(self, qs: dict[str, str], conn: sqlite3.Connection) -> None:
+        self._send(200, {"tags": list_tags(conn)})
+
+    def _get_config(self, qs: dict[str, str], conn: sqlite3.Connection) -> None:
+        mb = get_max_bytes(conn, None)
+        self._send(
+            200,
+            {
+                "max_bytes": mb,
+                "paused": is_paused(conn),
+                "allow_secrets": get_allow_secrets(conn, None),
+                "notify": get_notify(conn, None),
+                "max_db_mb": get_max_db_mb(conn, None),
+                "embedder": get_embedder(conn, None),
+                "cap_by_app": get_cap_map(conn, "cap_by_app"),
+                "cap_by_tag": get_cap_map(conn, "cap_by_tag"),
+                "evict_mode": get_evict_mode(conn),
+                "sync_target": get_setting(conn, "sync_target", ""),
+                "ai_recall_cmd": get_setting(conn, "ai_recall_cmd", ""),
+                "ai_fill_cmd": get_setting(conn, "ai_fill_cmd", ""),
+                "helper_rewrite_cmd": get_setting(conn, "helper_rewrite_cmd", ""),
+                "helper_shorten_cmd": get_setting(conn, "helper_shorten_cmd", ""),
+                "helper_extract_cmd": get_setting(conn, "helper_extract_cmd", ""),
+            },
+        )
+
+    def _get_settings(self, qs: dict[str, str], conn: sqlite3.Connection) -> None:
+        self._send(200, settings_snapshot(conn))
+
+    def _get_status(self, qs: dict[str, str], conn: sqlite3.Connection) -> None:
+        self._send(200, status_snapshot(conn))
+
+    def _get_federate_export(self, qs: dict[str, str], conn: sqlite3.Connection) -> None:
+        p = ListParams.from_qs(qs, default_limit=200)
+        since_iso = iso_hours_ago(p.hours) if p.hours is not None else None
+        items = export_items(conn, p.limit, app=p.app, tag=p.tag, since_iso=since_iso, pins_only=p.pins_only)
+        self._send(200, {"items": items})
+
+    def _get_clip(self, qs: dict[str, str], conn: sqlite3.Connection) -> None:
+        try:
+            cid = int(qs.get("id", 0))
+        except ValueError:
+            self._send(400, {"error": "invalid id"})
             return
-        if path == "/tags":
-            self._send(200, {"tags": list_tags(conn)})
+        row = conn.execute(CLIP_DETAIL_SQL, (cid,)).fetchone()
+        if not row:
+            self._send(404, {"error": "not found"})
             return
-        if path == "/config":
-            mb = get_max_bytes(conn, None)
-            self._send(
-                200,
-                {
-                    "max_bytes": mb,
-                    "paused": is_paused(conn),
-                    "allow_secrets": get_allow_secrets(conn, None),
-                    "notify": get_notify(conn, None),
-                    "max_db_mb": get_max_db_mb(conn, None),
-                    "embedder": get_embedder(conn, None),
-                    "cap_by_app": get_cap_map(conn, "cap_by_app"),
-                    "cap_by_tag": get_cap_map(conn, "cap_by_tag"),
-                    "evict_mode": get_evict_mode(conn),
-                    "sync_target": get_setting(conn, "sync_target", ""),
-                    "ai_recall_cmd": get_setting(conn, "ai_recall_cmd", ""),
-                    "ai_fill_cmd": get_setting(conn, "ai_fill_cmd", ""),
-                    "helper_rewrite_cmd": get_setting(conn, "helper_rewrite_cmd", ""),
-                    "helper_shorten_cmd": get_setting(conn, "helper_shorten_cmd", ""),
-                    "helper_extract_cmd": get_setting(conn, "helper_extract_cmd", ""),
-                },
+        self._send(
+            200,
+            {
+                "id": row["id"],
+                "created_at": row["created_at"],
+                "source_app": row["source_app"],
+                "window_title": row["window_title"],
+                "content": row["content"],
+                "pinned": bool(row["pinned"]),
+                "title": row["title"],
+                "file_path": row["file_path"],
+                "lang": row["lang"],
+                "tags": json_loads(row["tags_json"]),
+                "notes": json_loads(row["notes_json"]),
+            },
+        )
+
+    def _get_recap(self, qs: dict[str, str], conn: sqlite3.Connection) -> None:
+        minutes = qs_int(qs, "minutes", 60)
+        limit = qs_int(qs, "limit", 200)
+        cutoff = datetime.now(timezone.utc) - timedelta(minutes=minutes)
+        cur = conn.execute(RECAP_SQL, (cutoff.isoformat(), limit))
+        rows = [dict(row) for row in cur.fetchall()]
+        self._send(200, {"items": rows})
+
+    def _get_export_md(self, qs: dict[str, str], conn: sqlite3.Connection) -> None:
+        p = ListParams.from_qs(qs, default_limit=200)
+        since_iso = iso_hours_ago(p.hours)
+        count = count_markdown_outline(conn, since_iso, p.limit)
+        blocks = iter_markdown_outline(conn, since_iso, p.limit, count=count)
+        self._send_stream(
+            200, "text/markdown; charset=utf-8", (block.encode("utf-8") for block in blocks), {"X-Clip-Count": str(count)}
+        )
+
+    def _get_semantic_search(self, qs: dict[str, str], conn: sqlite3.Connection) -> None:
+        q = qs.get("q", "")
+        p = ListParams.from_qs(qs, default_limit=10)
+        embedder_kind = get_embedder(conn, qs.get("embedder"))
+        if qs.get("nocache", "").lower() in _TRUE_VALUES:
+            qvec, model_used = get_embed_batcher().embed(embedder_kind, q)
+        else:
+            qvec, model_used = cached_query_embed(embedder_kind, q)
+        ids = fetch_candidate_ids(
+            conn, model_used, p.pool, app=p.app, tag=p.tag, since_iso=p.since_iso, until_iso=p.until_iso, pins_only=p.pins_only
+        )
+        sims = get_vector_index(conn, model_used, refresh=False).search(qvec, ids, p.limit)
+        scores = {cid: sim for sim, cid in sims}
+        rows = fetch_rows_by_id(conn, list(scores), annotated=True)
+        items = []
+        for row in rows:
+            items.append(
+                dict(
+                    id=row["id"],
+                    created_at=row["created_at"],
+                    source_app=row["source_app"],
+                    window_title=row["window_title"],
+                    content=row["content"],
+                    pinned=bool(row["pinned"]),
+                    title=row["title"],
+                    lang=row["lang"],
+                    tags=json_loads(row["tags_json"]),
+                    notes=json_loads(row["notes_json"]),
+                    score=scores[row["id"]],
+                )
             )
+        self._send(200, {"items": items})
+
+    def _post_pin(self, conn: sqlite3.Connection) -> None:
+        data = self._parse_json()
+        try:
+            cid = int(data.get("id", 0))
+        except Exception:
+            self._send(400, {"error": "invalid id"})
             return
-        if path == "/settings":
-            self._send(200, settings_snapshot(conn))
-            return
-        if path == "/status":
-            self._send(200, status_snapshot(conn))
+        state = data.get("pinned")
+        # fetch before commit: the RETURNING row is produced by the UPDATE's own step
+        row = conn.execute(PIN_SQL, (None if state is None else int(bool(state)), cid)).fetchone()
+        conn.commit()
+        if row is None:
+            self._send(404, {"error": "not found"})
             return
-        if path == "/federate_export":
-            limit = int(qs.get("limit", [200])[0])
-            app = qs.get("app", [None])[0]
-            tag = qs.get("tag", [None])[0]
-            pins_only = qs.get("pins_only", ["false"])[0].lower() in ("1", "true", "yes", "on")
-            hours_param = qs.get("hours", [None])[0]
+        self._send(200, {"ok": True, "pinned": bool(row["pinned"])})
+
+    def _post_pause(self, conn: sqlite3.Connection) -> None:
+        set_paused(conn, True)
+        self._send(200, {"paused": True})
+
+    def _post_resume(self, conn: sqlite3.Connection) -> None:
+        set_paused(conn, False)
+        self._send(200, {"paused": False})
+
+    def _post_blocklist(self, conn: sqlite3.Connection) -> None:
+        data = self._parse_json()
+        app = data.get("add") or data.get("app")
+        if app:
+            add_blocked_app(conn, str(app))
+            self._send(200, {"ok": True, "blocklist": sorted(get_blocklist(conn))})
+        else:
+            self._send(400, {"error": "missing app"})
+
+    def _post_config(self, conn: sqlite3.Connection) -> None:
+        data = self._parse_json()
+        updated = {}
+        if "max_bytes" in data:
             try:
-                hours = float(hours_param) if hours_param is not None else None
-            except Exception:
-                hours = None
-            since_iso = iso_hours_ago(hours) if hours is not None else None
-            items = export_items(conn, limit, app=app, tag=tag, since_iso=since_iso, pins_only=pins_only)
-            self._send(200, {"items": items})
-            return
-        if path == "/clip":
+                intval = int(data["max_bytes"])
+                set_setting(conn, "max_bytes", str(intval))
+                updated["max_bytes"] = intval
+            except ValueError:
+                self._send(400, {"error": "invalid max_bytes"})
+                return
+        if "allow_secrets" in data:
+            allow = bool(data["allow_secrets"])
+            set_allow_secrets(conn, allow)
+            updated["allow_secrets"] = allow
+        if "notify" in data:
+            notify_val = bool(data["notify"])
+            set_notify(conn, notify_val)
+            updated["notify"] = notify_val
+        if "max_db_mb" in data:
             try:
-                cid = int(qs.get("id", [0])[0])
+                intval = int(data["max_db_mb"])
             except ValueError:
-                self._send(400, {"error": "invalid id"})
+                self._send(400, {"error": "invalid max_db_mb"})
                 return
-            cur = conn.execute(
-                "SELECT id, created_at, source_app, window_title, content, pinned, title, file_path, lang FROM clips WHERE id = ?",
-                (cid,),
-            )
-            row = cur.fetchone()
-            if not row:
-                self._send(404, {"error": "not found"})
+            set_setting(conn, "max_db_mb", str(intval))
+            updated["max_db_mb"] = intval
+        if "embedder" in data:
+            set_embedder(conn, str(data["embedder"]))
+            updated["embedder"] = get_embedder(conn, None)
+        if "cap_by_app" in data:
+            if isinstance(data["cap_by_app"], dict):
+                set_cap_map(conn, "cap_by_app", data["cap_by_app"])
+                updated["cap_by_app"] = get_cap_map(conn, "cap_by_app")
+            else:
+                self._send(400, {"error": "cap_by_app must be object"})
                 return
-            tags = tags_for_clip(conn, row["id"])
-            note_map = notes_for_clips(conn, [row["id"]])
-            self._send(
-                200,
-                {
-                    "id": row["id"],
-                    "created_at": row["created_at"],
-                    "source_app": row["source_app"],
-                    "window_title": row["window_title"],
-                    "content": row["content"],
-                    "pinned": bool(row["pinned"]),
-                    "title": row["title"],
-                    "file_path": row["file_path"],
-                    "lang": row["lang"],
-                    "tags": tags,
-                    "notes": note_map.get(row["id"], []),
-                },
-            )
+        if "cap_by_tag" in data:
+            if isinstance(data["cap_by_tag"], dict):
+                set_cap_map(conn, "cap_by_tag", data["cap_by_tag"])
+                updated["cap_by_tag"] = get_cap_map(conn, "cap_by_tag")
+            else:
+                self._send(400, {"error": "cap_by_tag must be object"})
+                return
+        if "evict_mode" in data:
+            set_evict_mode(conn, str(data["evict_mode"]))
+            updated["evict_mode"] = get_evict_mode(conn)
+        for helper_key in ("helper_rewrite_cmd", "helper_shorten_cmd", "helper_extract_cmd"):
+            if helper_key in data:
+                set_setting(conn, helper_key, str(data[helper_key]))
+                updated[helper_key] = get_setting(conn, helper_key, "")
+        if "sync_target" in data:
+            set_setting(conn, "sync_target", str(data["sync_target"]))
+            updated["sync_target"] = get_setting(conn, "sync_target", "")
+        if "ai_recall_cmd" in data:
+            set_setting(conn, "ai_recall_cmd", str(data["ai_recall_cmd"]))
+            updated["ai_recall_cmd"] = get_setting(conn, "ai_recall_cmd", "")
+        if "ai_fill_cmd" in data:
+            set_setting(conn, "ai_fill_cmd", str(data["ai_fill_cmd"]))
+            updated["ai_fill_cmd"] = get_setting(conn, "ai_fill_cmd", "")
+        if updated:
+            self._send(200, {"ok": True, **updated})
+        else:
+            self._send(400, {"error": "missing payload"})
+
+    def _post_ingest_url(self, conn: sqlite3.Connection) -> None:
+        data = self._parse_json()
+        url = (data.get("url") or "").strip()
+        title = (data.get("title") or "").strip()
+        selection = (data.get("selection") or "").strip()
+        if not url:
+            self._send(400, {"error": "missing url"})
             return
-        if path == "/recap":
-            minutes = int(qs.get("minutes", [60])[0])
-            limit = int(qs.get("limit", [200])[0])
-            cutoff = datetime.now(timezone.utc) - timedelta(minutes=minutes)
-            cur = conn.execute(
-                """
-                SELECT id, created_at, source_app, window_title, content, title, lang
-                FROM clips
-                WHERE datetime(created_at) >= datetime(?)
-                ORDER BY created_at DESC
-                LIMIT ?;
-                """,
-                (cutoff.isoformat(), limit),
-            )
-            rows = [dict(row) for row in cur.fetchall()]
-            self._send(200, {"items": rows})
+        content_parts = []
+        if title:
+            content_parts.append(title)
+        content_parts.append(url)
+        if selection:
+            content_parts.append("")
+            content_parts.append(selection)
+        body = "\n".join(content_parts)
+        if not body.strip():
+            self._send(400, {"error": "empty payload"})
             return
-        if path == "/export_md":
-            hours_param = qs.get("hours", [None])[0]
-            limit = int(qs.get("limit", [200])[0])
-            since_iso = iso_hours_ago(float(hours_param)) if hours_param is not None else None
-            md, count = build_markdown_outline(conn, since_iso, limit=limit)
-            body = md.encode("utf-8")
-            self.send_response(200)
-            self.send_header("Content-Type", "text/markdown; charset=utf-8")
-            self.send_header("Content-Length", str(len(body)))
-            self.send_header("X-Clip-Count", str(count))
-            self.end_headers()
-            self.wfile.write(body)
+        max_bytes = get_max_bytes(conn, None)
+        allow = get_allow_secrets(conn, None)
+        raw = body.encode("utf-8", errors="ignore")
+        if len(raw) > max_bytes:
+            self._send(400, {"error": f"too large (> {max_bytes} bytes)"})
             return
-        if path == "/semantic_search":
-            q = qs.get("q", [""])[0]
-            limit = int(qs.get("limit", [10])[0])
-            app = qs.get("app", [None])[0]
-            tag = qs.get("tag", [None])[0]
-            pool = int(qs.get("pool", [2000])[0])
-            embedder_kind = get_embedder(conn, qs.get("embedder", [None])[0])
-            qvec, model_used = embed_from_kind(embedder_kind, q)
-            pins_only = qs.get("pins_only", ["false"])[0].lower() in ("1", "true", "yes", "on")
-            since_param = qs.get("since", [None])[0]
-            until_param = qs.get("until", [None])[0]
-            hours_param = qs.get("hours", [None])[0]
-            since_iso = parse_iso_dt(since_param) if since_param else None
-            if hours_param is not None:
-                try:
-                    since_iso = iso_hours_ago(float(hours_param))
-                except Exception:
-                    pass
-            until_iso = parse_iso_dt(until_param) if until_param else None
-            rows = fetch_semantic_candidates(conn, app, tag, pool, model_used, since_iso=since_iso, until_iso=until_iso, pins_only=pins_only)
-            ids, vecs = build_ann_index(rows)
-            sims = knn(qvec, ids, vecs, limit)
-            row_map = {row["id"]: row for row in rows}
-            tag_map = tags_for_clips(conn, ids)
-            notes_map = notes_for_clips(conn, ids)
-            items = []
-            for sim, cid in sims:
-                row = row_map.get(cid)
-                if not row:
-                    continue
-                items.append(
-                    dict(
-                        id=row["id"],
-                        created_at=row["created_at"],
-                        source_app=row["source_app"],
-                        window_title=row["window_title"],
-                        content=row["content"],
-                        pinned=bool(row["pinned"]),
-                        title=row["title"],
-                        lang=row["lang"],
-                        tags=tag_map.get(row["id"], []),
-                        notes=notes_map.get(row["id"], []),
-                        score=sim,
-                    )
-                )
-            self._send(200, {"items": items})
+        if not allow and looks_like_secret(body):
+            self._send(400, {"error": "looks like a secret; enable allow_secrets to force save"})
             return
-        self._send(404, {"error": "not found"})
-
-    def do_POST(self) -> None:
-        path = self.path
-        conn = self.conn
-        init_db(conn)
-        if path == "/pin":
-            data = self._parse_json()
-            try:
-                cid = int(data.get("id", 0))
-            except Exception:
-                self._send(400, {"error": "invalid id"})
-                return
-            state = data.get("pinned")
-            if state is None:
-                cur = conn.execute("UPDATE clips SET pinned = 1 - pinned WHERE id = ?", (cid,))
-            else:
-                cur = conn.execute("UPDATE clips SET pinned = ? WHERE id = ?", (1 if state else 0, cid))
-            conn.commit()
-            if cur.rowcount:
-                cur2 = conn.execute("SELECT pinned FROM clips WHERE id = ?", (cid,))
-                row = cur2.fetchone()
-                self._send(200, {"ok": True, "pinned": bool(row['pinned'])})
-            else:
-                self._send(404, {"error": "not found"})
+        digest = hashlib.sha256(raw).hexdigest()
+        existing_id = get_clip_id_by_hash(conn, digest)
+        if existing_id:
+            insert_event(conn, existing_id)
+            self._send(200, {"ok": True, "id": existing_id, "existing": True})
             return
-        if path == "/pause":
-            set_paused(conn, True)
-            self._send(200, {"paused": True})
+        inserted_id = insert_clip(
+            conn,
+            body,
+            app="bookmarklet",
+            window=title or url,
+            digest=digest,
+            title=title or url,
+            file_path=url,
+        )
+        if inserted_id:
+            insert_event(conn, inserted_id)
+            self._send(200, {"ok": True, "id": inserted_id, "existing": False})
+        else:
+            self._send(500, {"error": "failed to insert"})
+
+    def _post_dropper(self, conn: sqlite3.Connection) -> None:
+        data = self._parse_json()
+        url = (data.get("url") or "").strip()
+        title = (data.get("title") or "").strip()
+        selection = (data.get("selection") or "").strip()
+        html = (data.get("html") or "").strip()
+        app = (data.get("app") or "browser-dropper").strip() or "browser-dropper"
+        body_parts = []
+        if title:
+            body_parts.append(title)
+        if url:
+            body_parts.append(url)
+        if selection:
+            body_parts.append("")
+            body_parts.append(selection)
+        if html:
+            body_parts.append("")
+            body_parts.append(html)
+        body = "\n".join(body_parts).strip()
+        if not body:
+            self._send(400, {"error": "empty payload"})
             return
-        if path == "/resume":
-            set_paused(conn, False)
-            self._send(200, {"paused": False})
+        max_bytes = get_max_bytes(conn, None)
+        allow = get_allow_secrets(conn, None)
+        raw = body.encode("utf-8", errors="ignore")
+        if len(raw) > max_bytes:
+            self._send(400, {"error": f"too large (> {max_bytes} bytes)"})
             return
-        if path == "/blocklist":
-            data = self._parse_json()
-            app = data.get("add") or data.get("app")
-            if app:
-                add_blocked_app(conn, str(app))
-                self._send(200, {"ok": True, "blocklist": sorted(get_blocklist(conn))})
-            else:
-                self._send(400, {"error": "missing app"})
+        if not allow and looks_like_secret(body):
+            self._send(400, {"error": "looks like a secret; enable allow_secrets to force save"})
             return
-        if path == "/config":
-            data = self._parse_json()
-            updated = {}
-            if "max_bytes" in data:
-                try:
-                    intval = int(data["max_bytes"])
-                    set_setting(conn, "max_bytes", str(intval))
-                    updated["max_bytes"] = intval
-                except ValueError:
-                    self._send(400, {"error": "invalid max_bytes"})
-                    return
-            if "allow_secrets" in data:
-                allow = bool(data["allow_secrets"])
-                set_allow_secrets(conn, allow)
-                updated["allow_secrets"] = allow
-            if "notify" in data:
-                notify_val = bool(data["notify"])
-                set_notify(conn, notify_val)
-                updated["notify"] = notify_val
-            if "max_db_mb" in data:
-                try:
-                    intval = int(data["max_db_mb"])
-                except ValueError:
-                    self._send(400, {"error": "invalid max_db_mb"})
-                    return
-                set_setting(conn, "max_db_mb", str(intval))
-                updated["max_db_mb"] = intval
-            if "embedder" in data:
-                set_embedder(conn, str(data["embedder"]))
-                updated["embedder"] = get_embedder(conn, None)
-            if "cap_by_app" in data:
-                if isinstance(data["cap_by_app"], dict):
-                    set_cap_map(conn, "cap_by_app", data["cap_by_app"])
-                    updated["cap_by_app"] = get_cap_map(conn, "cap_by_app")
-                else:
-                    self._send(400, {"error": "cap_by_app must be object"})
-                    return
-            if "cap_by_tag" in data:
-                if isinstance(data["cap_by_tag"], dict):
-                    set_cap_map(conn, "cap_by_tag", data["cap_by_tag"])
-                    updated["cap_by_tag"] = get_cap_map(conn, "cap_by_tag")
-                else:
-                    self._send(400, {"error": "cap_by_tag must be object"})
-                    return
-            if "evict_mode" in data:
-                set_evict_mode(conn, str(data["evict_mode"]))
-                updated["evict_mode"] = get_evict_mode(conn)
-            for helper_key in ("helper_rewrite_cmd", "helper_shorten_cmd", "helper_extract_cmd"):
-                if helper_key in data:
-                    set_setting(conn, helper_key, str(data[helper_key]))
-                    updated[helper_key] = get_setting(conn, helper_key, "")
-            if "sync_target" in data:
-                set_setting(conn, "sync_target", str(data["sync_target"]))
-                updated["sync_target"] = get_setting(conn, "sync_target", "")
-            if "ai_recall_cmd" in data:
-                set_setting(conn, "ai_recall_cmd", str(data["ai_recall_cmd"]))
-                updated["ai_recall_cmd"] = get_setting(conn, "ai_recall_cmd", "")
-            if "ai_fill_cmd" in data:
-                set_setting(conn, "ai_fill_cmd", str(data["ai_fill_cmd"]))
-                updated["ai_fill_cmd"] = get_setting(conn, "ai_fill_cmd", "")
-            if updated:
-                self._send(200, {"ok": True, **updated})
-            else:
-                self._send(400, {"error": "missing payload"})
+        digest = hashlib.sha256(raw).hexdigest()
+        existing_id = get_clip_id_by_hash(conn, digest)
+        if existing_id:
+            insert_event(conn, existing_id)
+            self._send(200, {"ok": True, "id": existing_id, "existing": True})
             return
-        if path == "/ingest_url":
-            data = self._parse_json()
-            url = (data.get("url") or "").strip()
-            title = (data.get("title") or "").strip()
-            selection = (data.get("selection") or "").strip()
-            if not url:
-                self._send(400, {"error": "missing url"})
-                return
-            content_parts = []
-            if title:
-                content_parts.append(title)
-            content_parts.append(url)
-            if selection:
-                content_parts.append("")
-                content_parts.append(selection)
-            body = "\n".join(content_parts)
-            if not body.strip():
-                self._send(400, {"error": "empty payload"})
-                return
-            max_bytes = get_max_bytes(conn, None)
-            allow = get_allow_secrets(conn, None)
-            if len(body.encode("utf-8", errors="ignore")) > max_bytes:
-                self._send(400, {"error": f"too large (> {max_bytes} bytes)"})
-                return
-            if not allow and looks_like_secret(body):
-                self._send(400, {"error": "looks like a secret; enable allow_secrets to force save"})
-                return
-            digest = hashlib.sha256(body.encode("utf-8", errors="ignore")).hexdigest()
-            existing_id = get_clip_id_by_hash(conn, digest)
-            if existing_id:
-                insert_event(conn, existing_id)
-                self._send(200, {"ok": True, "id": existing_id, "existing": True})
-                return
-            inserted_id = insert_clip(
-                conn,
-                body,
-                app="bookmarklet",
-                window=title or url,
-                digest=digest,
-                title=title or url,
-                file_path=url,
-            )
-            if inserted_id:
-                insert_event(conn, inserted_id)
-                self._send(200, {"ok": True, "id": inserted_id, "existing": False})
-            else:
-                self._send(500, {"error": "failed to insert"})
+        inserted_id = insert_clip(
+            conn,
+            body,
+            app=app,
+            window=title or url,
+            digest=digest,
+            title=title or url,
+            file_path=url or None,
+        )
+        if inserted_id:
+            insert_event(conn, inserted_id)
+            self._send(200, {"ok": True, "id": inserted_id, "existing": False})
+        else:
+            self._send(500, {"error": "failed to insert"})
+
+    def _post_federate_import(self, conn: sqlite3.Connection) -> None:
+        data = self._parse_json()
+        items = data.get("items")
+        if not isinstance(items, list):
+            self._send(400, {"error": "items must be a list"})
             return
-        if path == "/dropper":
-            data = self._parse_json()
-            url = (data.get("url") or "").strip()
-            title = (data.get("title") or "").strip()
-            selection = (data.get("selection") or "").strip()
-            html = (data.get("html") or "").strip()
-            app = (data.get("app") or "browser-dropper").strip() or "browser-dropper"
-            body_parts = []
-            if title:
-                body_parts.append(title)
-            if url:
-                body_parts.append(url)
-            if selection:
-                body_parts.append("")
-                body_parts.append(selection)
-            if html:
-                body_parts.append("")
-                body_parts.append(html)
-            body = "\n".join(body_parts).strip()
-            if not body:
-                self._send(400, {"error": "empty payload"})
-                return
-            max_bytes = get_max_bytes(conn, None)
-            allow = get_allow_secrets(conn, None)
-            if len(body.encode("utf-8", errors="ignore")) > max_bytes:
-                self._send(400, {"error": f"too large (> {max_bytes} bytes)"})
-                return
-            if not allow and looks_like_secret(body):
-                self._send(400, {"error": "looks like a secret; enable allow_secrets to force save"})
-                return
-            digest = hashlib.sha256(body.encode("utf-8", errors="ignore")).hexdigest()
-            existing_id = get_clip_id_by_hash(conn, digest)
-            if existing_id:
-                insert_event(conn, existing_id)
-                self._send(200, {"ok": True, "id": existing_id, "existing": True})
-                return
-            inserted_id = insert_clip(
-                conn,
-                body,
-                app=app,
-                window=title or url,
-                digest=digest,
-                title=title or url,
-                file_path=url or None,
-            )
-            if inserted_id:
-                insert_event(conn, inserted_id)
-                self._send(200, {"ok": True, "id": inserted_id, "existing": False})
-            else:
-                self._send(500, {"error": "failed to insert"})
+        res = import_clips(conn, items)
+        self._send(200, {"ok": True, **res})
+
+    def _post_notes(self, conn: sqlite3.Connection) -> None:
+        data = self._parse_json()
+        try:
+            cid = int(data.get("id", 0))
+        except Exception:
+            self._send(400, {"error": "invalid id"})
             return
-        if path == "/federate_import":
-            data = self._parse_json()
-            items = data.get("items")
-            if not isinstance(items, list):
-                self._send(400, {"error": "items must be a list"})
-                return
-            res = import_clips(conn, items)
-            self._send(200, {"ok": True, **res})
+        note = (data.get("note") or "").strip()
+        if not note:
+            self._send(400, {"error": "empty note"})
+            return
+        ok = add_note(conn, cid, note)
+        if not ok:
+            self._send(400, {"error": "failed to add note"})
+            return
+        notes_map = notes_for_clips(conn, [cid])
+        self._send(200, {"ok": True, "notes": notes_map.get(cid, [])})
+
+    def _post_helper(self, conn: sqlite3.Connection) -> None:
+        data = self._parse_json()
+        kind = str(data.get("kind", "")).lower()
+        if kind not in ("rewrite", "shorten", "extract"):
+            self._send(400, {"error": "kind must be rewrite|shorten|extract"})
             return
-        if path == "/notes":
-            data = self._parse_json()
+        target_id = data.get("id")
+        if target_id is not None:
             try:
-                cid = int(data.get("id", 0))
+                target_id = int(target_id)
             except Exception:
                 self._send(400, {"error": "invalid id"})
                 return
-            note = (data.get("note") or "").strip()
-            if not note:
-                self._send(400, {"error": "empty note"})
-                return
-            ok = add_note(conn, cid, note)
-            if not ok:
-                self._send(400, {"error": "failed to add note"})
-                return
-            notes_map = notes_for_clips(conn, [cid])
-            self._send(200, {"ok": True, "notes": notes_map.get(cid, [])})
-            return
-        if path == "/helper":
-            data = self._parse_json()
-            kind = str(data.get("kind", "")).lower()
-            if kind not in ("rewrite", "shorten", "extract"):
-                self._send(400, {"error": "kind must be rewrite|shorten|extract"})
+        else:
+            latest = latest_clip(conn)
+            if not latest:
+                self._send(400, {"error": "no clips found"})
                 return
-            target_id = data.get("id")
-            if target_id is not None:
-                try:
-                    target_id = int(target_id)
-                except Exception:
-                    self._send(400, {"error": "invalid id"})
-                    return
-            else:
-                latest = latest_clip(conn)
-                if not latest:
-                    self._send(400, {"error": "no clips found"})
-                    return
-                target_id = latest["id"]
-            timeout = data.get("timeout", 8.0)
-            try:
-                timeout = float(timeout)
-            except Exception:
-                timeout = 8.0
-            ok, msg, new_id, out = run_user_helper_on_clip(conn, kind, target_id, timeout=timeout)
-            if ok:
-                self._send(200, {"ok": True, "id": new_id, "message": msg, "output": out})
-            else:
-                self._send(400, {"error": msg})
+            target_id = latest["id"]
+        timeout = data.get("timeout", 8.0)
+        try:
+            timeout = float(timeout)
+        except Exception:
+            timeout = 8.0
+        ok, msg, new_id, out = run_user_helper_on_clip(conn, kind, target_id, timeout=timeout)
+        if ok:
+            self._send(200, {"ok": True, "id": new_id, "message": msg, "output": out})
+        else:
+            self._send(400, {"error": msg})
+
+    def _post_ai(self, conn: sqlite3.Connection) -> None:
+        data = self._parse_json()
+        kind = str(data.get("kind", "")).lower()
+        if kind not in ("recall", "fill"):
+            self._send(400, {"error": "kind must be recall|fill"})
             return
-        if path == "/ai":
-            data = self._parse_json()
-            kind = str(data.get("kind", "")).lower()
-            if kind not in ("recall", "fill"):
-                self._send(400, {"error": "kind must be recall|fill"})
-                return
-            hours = data.get("hours")
-            try:
-                hours = float(hours) if hours is not None else None
-            except Exception:
-                hours = None
-            try:
-                limit = int(data.get("limit", 50))
-            except Exception:
-                limit = 50
-            try:
-                timeout = float(data.get("timeout", 12.0))
-            except Exception:
-                timeout = 12.0
-            save = bool(data.get("save"))
-            setting_key = "ai_recall_cmd" if kind == "recall" else "ai_fill_cmd"
-            tag_label = kind
-            ok, msg, new_id, out = run_ai_helper(conn, setting_key, hours, limit, timeout, save=save, tag_label=tag_label)
-            if ok:
-                self._send(200, {"ok": True, "id": new_id, "message": msg, "output": out})
-            else:
-                self._send(400, {"error": msg})
+        hours = data.get("hours")
+        try:
+            hours = float(hours) if hours is not None else None
+        except Exception:
+            hours = None
+        try:
+            limit = int(data.get("limit", 50))
+        except Exception:
+            limit = 50
+        try:
+            timeout = float(data.get("timeout", 12.0))
+        except Exception:
+            timeout = 12.0
+        save = bool(data.get("save"))
+        setting_key = "ai_recall_cmd" if kind == "recall" else "ai_fill_cmd"
+        tag_label = kind
+        ok, msg, new_id, out = run_ai_helper(conn, setting_key, hours, limit, timeout, save=save, tag_label=tag_label)
+        if ok:
+            self._send(200, {"ok": True, "id": new_id, "message": msg, "output": out})
+        else:
+            self._send(400, {"error": msg})
+
+    def _post_purge(self, conn: sqlite3.Connection) -> None:
+        data = self._parse_json()
+        app = data.get("app")
+        tag = data.get("tag")
+        older = data.get("older_than_days")
+        keep_last = data.get("keep_last")
+        all_flag = bool(data.get("all"))
+        try:
+            days = int(older) if older is not None else None
+        except ValueError:
+            self._send(400, {"error": "invalid older_than_days"})
             return
-        if path == "/purge":
-            data = self._parse_json()
-            app = data.get("app")
-            tag = data.get("tag")
-            older = data.get("older_than_days")
-            keep_last = data.get("keep_last")
-            all_flag = bool(data.get("all"))
-            # Reuse logic directly
-            deleted = 0
-            clauses = []
-            params = []
-            if app:
-                clauses.append("LOWER(source_app) = LOWER(?)")
-                params.append(app)
-            if tag:
-                clauses.append(
-                    "id IN (SELECT clip_id FROM clip_tags ct JOIN tags t ON t.id = ct.tag_id WHERE LOWER(t.name) = LOWER(?))"
-                )
-                params.append(tag)
-            if older is not None:
-                try:
-                    days = int(older)
-                except ValueError:
-                    self._send(400, {"error": "invalid older_than_days"})
-                    return
-                cutoff = datetime.now(timezone.utc) - timedelta(days=days)
-                clauses_cutoff = clauses + ["datetime(created_at) < datetime(?)"]
-                params_cutoff = params + [cutoff.isoformat()]
-                where_cutoff = "WHERE " + " AND ".join(clauses_cutoff)
-                cur = conn.execute(f"DELETE FROM clips {where_cutoff}", params_cutoff)
-                deleted += cur.rowcount
-            if keep_last is not None:
-                try:
-                    keep_last_int = int(keep_last)
-                except ValueError:
-                    self._send(400, {"error": "invalid keep_last"})
-                    return
-                where_keep = "WHERE " + " AND ".join(clauses) if clauses else ""
-                sql = f"""
-                    DELETE FROM clips
-                    WHERE id NOT IN (
-                        SELECT id FROM clips
-                        {where_keep}
-                        ORDER BY created_at DESC
-                        LIMIT ?
-                    )
-                    {f'AND {where_keep[6:]}' if where_keep else ''}
-                """
-                params_keep = params + [keep_last_int] + params
-                cur = conn.execute(sql, params_keep)
-                deleted += cur.rowcount
-            if all_flag:
-                cur = conn.execute("DELETE FROM clips")
-                deleted += cur.rowcount
-            conn.commit()
-            self._send(200, {"purged": deleted})
+        try:
+            keep_last_int = int(keep_last) if keep_last is not None else None
+        except ValueError:
+            self._send(400, {"error": "invalid keep_last"})
             return
-        self._send(404, {"error": "not found"})
+        deleted = purge_clips(conn, app, tag, days, keep_last_int, all_flag)
+        self._send(200, {"purged": deleted})
 
     def do_DELETE(self) -> None:
-        path = self.path
-        conn = self.conn
-        init_db(conn)
-        if path.startswith("/blocklist"):
-            data = self._parse_json()
-            app = data.get("remove") or data.get("app")
-            if app:
-                removed = remove_blocked_app(conn, str(app))
-                self._send(200, {"ok": removed, "blocklist": sorted(get_blocklist(conn))})
-            else:
-                self._send(400, {"error": "missing app"})
-            return
-        self._send(404, {"error": "not found"})
+        self._body = None
+        try:
+            # the only DELETE route matches by prefix (/blocklist, /blocklist?app=...)
+            if not self.path.startswith("/blocklist"):
+                self._send(404, {"error": "not found"})
+                return
+            with self.write_lock:
+                try:
+                    self._delete_blocklist(self.writer)
+                finally:
+                    self._end_write()
+        finally:
+            self._read_body()
+
+    def _delete_blocklist(self, conn: sqlite3.Connection) -> None:
+        data = self._parse_json()
+        app = data.get("remove") or data.get("app")
+        if app:
+            removed = remove_blocked_app(conn, str(app))
+            self._send(200, {"ok": removed, "blocklist": sorted(get_blocklist(conn))})
+        else:
+            self._send(400, {"error": "missing app"})
+
+    # one dict lookup per request instead of walking an if-chain
+    GET_ROUTES = {
+        "/": _get_ui,
+        "/ui": _get_ui,
+        "/health": _get_health,
+        "/stats": _get_stats,
+        "/recent": _get_recent,
+        "/context": _get_context,
+        "/topics": _get_topics,
+        "/search": _get_search,
+        "/blocklist": _get_blocklist,
+        "/tags": _get_tags,
+        "/config": _get_config,
+        "/settings": _get_settings,
+        "/status": _get_status,
+        "/federate_export": _get_federate_export,
+        "/clip": _get_clip,
+        "/recap": _get_recap,
+        "/export_md": _get_export_md,
+        "/semantic_search": _get_semantic_search,
+    }
+    POST_ROUTES = {
+        "/pin": _post_pin,
+        "/pause": _post_pause,
+        "/resume": _post_resume,
+        "/blocklist": _post_blocklist,
+        "/config": _post_config,
+        "/ingest_url": _post_ingest_url,
+        "/dropper": _post_dropper,
+        "/federate_import": _post_federate_import,
+        "/notes": _post_notes,
+        "/helper": _post_helper,
+        "/ai": _post_ai,
+        "/purge": _post_purge,
+    }
 
 
 def cmd_serve(args: argparse.Namespace) -> None:
-    conn = connect_db()
-    init_db(conn)
-
-    def handler(*h_args, **h_kwargs):
-        return ApiHandler(*h_args, conn=conn, **h_kwargs)
-
-    class ThreadingHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
-        daemon_threads = True
+    writer = connect_db(check_same_thread=False)
+    init_db(writer)
+    pool = ReadPool(min(32, (os.cpu_count() or 1) * 4))
+    get_vector_index(writer, get_embedder(writer, None))  # warm before the first query
+    start_index_refresher()
+    handler = functools.partial(ApiHandler, pool=pool, writer=writer, write_lock=threading.Lock())
 
     base_port = args.port
     server = None
@@ -4509,7 +5574,7 @@ def cmd_serve(args: argparse.Namespace) -> None:
     for attempt in range(3):
         try_port = base_port + attempt
         try:
-            server = ThreadingHTTPServer((args.host, try_port), handler)
+            server = ApiServer((args.host, try_port), handler)
             bound_port = try_port
             break
         except OSError as e:
@@ -4524,15 +5589,16 @@ def cmd_serve(args: argparse.Namespace) -> None:
     except KeyboardInterrupt:
         say(FATHER, "stopping server")
         server.server_close()
+        pool.close()
+        writer.close()
 
 
-def build_parser() -> argparse.ArgumentParser:
-    parser = argparse.ArgumentParser(description="my--father-mother: local clipboard memory")
-    sub = parser.add_subparsers(dest="command", required=True)
-
+def _add_init_parser(sub: argparse._SubParsersAction) -> None:
     p_init = sub.add_parser("init", help="initialize the database")
     p_init.set_defaults(func=cmd_init)
 
+
+def _add_watch_parser(sub: argparse._SubParsersAction) -> None:
     p_watch = sub.add_parser("watch", help="start clipboard watcher")
     p_watch.add_argument("--interval", type=float, default=1.0, help="poll interval in seconds")
     p_watch.add_argument("--cap", type=int, default=2000, help="max clips to retain (0 = unlimited)")
@@ -4545,6 +5611,8 @@ def build_parser() -> argparse.ArgumentParser:
     g_notify.add_argument("--no-notify", action="store_true", help="disable notifications even if enabled in config")
     p_watch.set_defaults(func=cmd_watch)
 
+
+def _add_recent_parser(sub: argparse._SubParsersAction) -> None:
     p_recent = sub.add_parser("recent", help="show recent clips")
     p_recent.add_argument("--limit", type=int, default=10)
     p_recent.add_argument("--app", help="filter by source app (case-insensitive)")
@@ -4557,6 +5625,8 @@ def build_parser() -> argparse.ArgumentParser:
     p_recent.add_argument("--json", action="store_true", help="emit JSON payload")
     p_recent.set_defaults(func=cmd_recent)
 
+
+def _add_search_parser(sub: argparse._SubParsersAction) -> None:
     p_search = sub.add_parser("search", help="search clips (FTS)")
     p_search.add_argument("query", help="FTS query text")
     p_search.add_argument("--limit", type=int, default=10)
@@ -4566,8 +5636,11 @@ def build_parser() -> argparse.ArgumentParser:
     p_search.add_argument("--since-hours", type=float, help="look back this many hours")
     p_search.add_argument("--until", help="ISO timestamp upper bound")
     p_search.add_argument("--pins-only", action="store_true", help="only pinned clips")
+    p_search.add_argument("--sort", choices=["time", "rank"], default="time", help="order by recency or BM25 relevance")
     p_search.set_defaults(func=cmd_search)
 
+
+def _add_semantic_search_parser(sub: argparse._SubParsersAction) -> None:
     p_ssearch = sub.add_parser("semantic-search", help="semantic search using hash or e5-small embeddings")
     p_ssearch.add_argument("query", help="query text")
     p_ssearch.add_argument("--limit", type=int, default=10)
@@ -4581,23 +5654,35 @@ def build_parser() -> argparse.ArgumentParser:
     p_ssearch.add_argument("--pins-only", action="store_true", help="only pinned clips")
     p_ssearch.set_defaults(func=cmd_semantic_search)
 
+
+def _add_delete_parser(sub: argparse._SubParsersAction) -> None:
     p_delete = sub.add_parser("delete", help="delete a clip by id")
     p_delete.add_argument("--id", type=int, required=True)
     p_delete.set_defaults(func=cmd_delete)
 
+
+def _add_stats_parser(sub: argparse._SubParsersAction) -> None:
     p_stats = sub.add_parser("stats", help="show clip count and db size")
     p_stats.set_defaults(func=cmd_stats)
 
+
+def _add_status_parser(sub: argparse._SubParsersAction) -> None:
     p_status = sub.add_parser("status", help="runtime status (paused/notify/secrets/config)")
     p_status.add_argument("--json", action="store_true", help="emit JSON payload")
     p_status.set_defaults(func=cmd_status)
 
+
+def _add_mcp_urls_parser(sub: argparse._SubParsersAction) -> None:
     p_mcp = sub.add_parser("mcp-urls", help="print MCP server URLs (SSE + MCP)")
     p_mcp.set_defaults(func=cmd_mcp_urls)
 
+
+def _add_personas_parser(sub: argparse._SubParsersAction) -> None:
     p_personas = sub.add_parser("personas", help="show persona role map")
     p_personas.set_defaults(func=cmd_personas)
 
+
+def _add_settings_parser(sub: argparse._SubParsersAction) -> None:
     p_settings = sub.add_parser("settings", help="show or update settings parity")
     group_settings = p_settings.add_mutually_exclusive_group()
     group_settings.add_argument("--list-keys", action="store_true", help="list settings keys")
@@ -4606,6 +5691,8 @@ def build_parser() -> argparse.ArgumentParser:
     p_settings.add_argument("--json", action="store_true", help="print JSON output")
     p_settings.set_defaults(func=cmd_settings)
 
+
+def _add_copilot_parser(sub: argparse._SubParsersAction) -> None:
     p_copilot = sub.add_parser("copilot", help="manage copilot settings and chats")
     p_copilot.add_argument("--set-model", help="set default copilot model")
     p_copilot.add_argument("--set-accent", help="set copilot accent color")
@@ -4625,6 +5712,8 @@ def build_parser() -> argparse.ArgumentParser:
     p_copilot.add_argument("--status", action="store_true", help="show copilot status")
     p_copilot.set_defaults(func=cmd_copilot)
 
+
+def _add_ml_parser(sub: argparse._SubParsersAction) -> None:
     p_ml = sub.add_parser("ml", help="manage machine learning/LTM settings")
     p_ml.add_argument("--context-level", help="set auto-context level (off/low/medium/high)")
     p_ml.add_argument("--processing-mode", help="set processing mode (local/cloud/blended)")
@@ -4641,10 +5730,14 @@ def build_parser() -> argparse.ArgumentParser:
     p_ml.add_argument("--status", action="store_true", help="show ML/LTM status")
     p_ml.set_defaults(func=cmd_ml)
 
+
+def _add_about_parser(sub: argparse._SubParsersAction) -> None:
     p_about = sub.add_parser("about", help="show app/about info")
     p_about.add_argument("--json", action="store_true", help="print JSON output")
     p_about.set_defaults(func=cmd_about)
 
+
+def _add_pause_parser(sub: argparse._SubParsersAction) -> None:
     p_pause = sub.add_parser("pause", help="pause/resume/toggle capture")
     grp = p_pause.add_mutually_exclusive_group()
     grp.add_argument("--on", action="store_true", help="pause capture")
@@ -4652,16 +5745,22 @@ def build_parser() -> argparse.ArgumentParser:
     grp.add_argument("--toggle", action="store_true", help="toggle pause state")
     p_pause.set_defaults(func=cmd_pause)
 
+
+def _add_blocklist_parser(sub: argparse._SubParsersAction) -> None:
     p_block = sub.add_parser("blocklist", help="manage blocked apps for capture")
     p_block.add_argument("--add", help="add app name to blocklist")
     p_block.add_argument("--remove", help="remove app name from blocklist")
     p_block.add_argument("--list", action="store_true", help="list blocklisted apps")
     p_block.set_defaults(func=cmd_blocklist)
 
+
+def _add_show_parser(sub: argparse._SubParsersAction) -> None:
     p_show = sub.add_parser("show", help="show full content for a clip by id")
     p_show.add_argument("--id", type=int, required=True)
     p_show.set_defaults(func=cmd_show)
 
+
+def _add_export_parser(sub: argparse._SubParsersAction) -> None:
     p_export = sub.add_parser("export", help="export clips to JSON (stdout or file)")
     p_export.add_argument("--limit", type=int, default=1000, help="number of clips to export")
     p_export.add_argument("--path", help="path to write JSON (default stdout)")
@@ -4669,18 +5768,24 @@ def build_parser() -> argparse.ArgumentParser:
     p_export.add_argument("--tag", help="filter by tag")
     p_export.set_defaults(func=cmd_export)
 
+
+def _add_export_md_parser(sub: argparse._SubParsersAction) -> None:
     p_export_md = sub.add_parser("export-md", help="export recent clips as markdown outline")
     p_export_md.add_argument("--hours", type=float, help="look back this many hours (optional)")
     p_export_md.add_argument("--limit", type=int, default=200, help="max clips to include")
     p_export_md.add_argument("--path", help="write to file (default stdout)")
     p_export_md.set_defaults(func=cmd_export_md)
 
+
+def _add_config_parser(sub: argparse._SubParsersAction) -> None:
     p_config = sub.add_parser("config", help="get/set config (max_bytes)")
     group_cfg = p_config.add_mutually_exclusive_group(required=True)
     group_cfg.add_argument("--get", help="get a key (max_bytes, allow_secrets, max_db_mb, notify, embedder, cap_by_app, cap_by_tag, evict_mode, allow_pdf, allow_images, auto_summary_cmd, auto_tag_cmd, helper_*_cmd, sync_target, ai_recall_cmd, ai_fill_cmd)")
     group_cfg.add_argument("--set", nargs=2, metavar=("KEY", "VALUE"), help="set a key (max_bytes, allow_secrets, max_db_mb, notify, embedder, cap_by_app, cap_by_tag, evict_mode, allow_pdf, allow_images, auto_summary_cmd, auto_tag_cmd, helper_rewrite_cmd, helper_shorten_cmd, helper_extract_cmd, sync_target, ai_recall_cmd, ai_fill_cmd)")
     p_config.set_defaults(func=cmd_config)
 
+
+def _add_purge_parser(sub: argparse._SubParsersAction) -> None:
     p_purge = sub.add_parser("purge", help="purge clips by age/app/keep-last/all")
     p_purge.add_argument("--older-than-days", type=int, help="delete clips older than N days (optional)")
     p_purge.add_argument("--keep-last", type=int, help="keep last N clips (delete the rest)")
@@ -4689,6 +5794,8 @@ def build_parser() -> argparse.ArgumentParser:
     p_purge.add_argument("--all", action="store_true", help="delete all clips")
     p_purge.set_defaults(func=cmd_purge)
 
+
+def _add_tags_parser(sub: argparse._SubParsersAction) -> None:
     p_tags = sub.add_parser("tags", help="manage tags for a clip or list all")
     p_tags.add_argument("--id", type=int, help="clip id")
     p_tags.add_argument("--add", help="add tag to clip")
@@ -4697,6 +5804,8 @@ def build_parser() -> argparse.ArgumentParser:
     p_tags.add_argument("--list-all", action="store_true", help="list all tags")
     p_tags.set_defaults(func=cmd_tags)
 
+
+def _add_pin_parser(sub: argparse._SubParsersAction) -> None:
     p_pin = sub.add_parser("pin", help="pin/unpin/toggle a clip")
     p_pin.add_argument("--id", type=int, required=True, help="clip id")
     gpin = p_pin.add_mutually_exclusive_group(required=True)
@@ -4705,28 +5814,40 @@ def build_parser() -> argparse.ArgumentParser:
     gpin.add_argument("--toggle", action="store_true", help="toggle pin")
     p_pin.set_defaults(func=cmd_pin)
 
+
+def _add_copy_parser(sub: argparse._SubParsersAction) -> None:
     p_copy = sub.add_parser("copy", help="copy clip content to clipboard")
     p_copy.add_argument("--id", type=int, required=True)
     p_copy.set_defaults(func=cmd_copy)
 
+
+def _add_backup_parser(sub: argparse._SubParsersAction) -> None:
     p_backup = sub.add_parser("backup", help="backup the database to a path")
     p_backup.add_argument("--path", required=True, help="destination path for backup file")
     p_backup.set_defaults(func=cmd_backup)
 
+
+def _add_restore_parser(sub: argparse._SubParsersAction) -> None:
     p_restore = sub.add_parser("restore", help="restore the database from a path")
     p_restore.add_argument("--path", required=True, help="source path of backup file")
     p_restore.set_defaults(func=cmd_restore)
 
+
+def _add_sync_parser(sub: argparse._SubParsersAction) -> None:
     p_sync = sub.add_parser("sync", help="push/pull DB to/from a target path (e.g. iCloud/drive)")
     p_sync.add_argument("--mode", choices=["push", "pull"], default="push")
     p_sync.add_argument("--target", help="override sync_target config")
     p_sync.set_defaults(func=cmd_sync)
 
+
+def _add_history_parser(sub: argparse._SubParsersAction) -> None:
     p_hist = sub.add_parser("history", help="show capture history for a clip")
     p_hist.add_argument("--id", type=int, required=True)
     p_hist.add_argument("--limit", type=int, default=10)
     p_hist.set_defaults(func=cmd_history)
 
+
+def _add_ingest_file_parser(sub: argparse._SubParsersAction) -> None:
     p_ingest = sub.add_parser("ingest-file", help="ingest a text/code file into clips")
     p_ingest.add_argument("--path", required=True, help="path to file")
     p_ingest.add_argument("--max-bytes", type=int, default=None)
@@ -4736,8 +5857,10 @@ def build_parser() -> argparse.ArgumentParser:
     p_ingest.add_argument("--tag", action="append", help="tag(s) to attach")
     p_ingest.set_defaults(func=cmd_ingest_file)
 
+
+def _add_watch_inbox_parser(sub: argparse._SubParsersAction) -> None:
     p_inbox = sub.add_parser("watch-inbox", help="watch a directory and ingest new/changed files")
-    p_inbox.add_argument("--dir", default=str(Path.home() / ".my-father-mother" / "inbox"))
+    p_inbox.add_argument("--dir", help="directory to watch (default ~/.my-father-mother/inbox)")
     p_inbox.add_argument("--interval", type=float, default=5.0)
     p_inbox.add_argument("--max-bytes", type=int, default=None)
     p_inbox.add_argument("--allow-secrets", action="store_true", help="allow secrets while ingesting")
@@ -4746,6 +5869,8 @@ def build_parser() -> argparse.ArgumentParser:
     p_inbox.add_argument("--tag", action="append", help="tag(s) to attach to ingested files")
     p_inbox.set_defaults(func=cmd_watch_inbox)
 
+
+def _add_ingest_image_parser(sub: argparse._SubParsersAction) -> None:
     p_img = sub.add_parser("ingest-image", help="ingest an image via OCR (tesseract)")
     p_img.add_argument("--path", required=True, help="path to image")
     p_img.add_argument("--max-bytes", type=int, default=None)
@@ -4754,6 +5879,8 @@ def build_parser() -> argparse.ArgumentParser:
     p_img.add_argument("--allow-images", action="store_true", help="temporarily allow image OCR ingestion")
     p_img.set_defaults(func=cmd_ingest_image)
 
+
+def _add_ingest_transcript_parser(sub: argparse._SubParsersAction) -> None:
     p_meeting = sub.add_parser("ingest-transcript", help="ingest a meeting transcript/text and tag it")
     p_meeting.add_argument("--path", required=True, help="path to transcript file")
     p_meeting.add_argument("--max-bytes", type=int, default=None)
@@ -4762,34 +5889,46 @@ def build_parser() -> argparse.ArgumentParser:
     p_meeting.add_argument("--tag", action="append", help="extra tag(s) to attach")
     p_meeting.set_defaults(func=cmd_ingest_transcript)
 
+
+def _add_federate_import_parser(sub: argparse._SubParsersAction) -> None:
     p_fed = sub.add_parser("federate-import", help="import clips from an export file or URL (simple federation)")
     p_fed.add_argument("--path", help="path to JSON export")
     p_fed.add_argument("--url", help="URL returning JSON export")
     p_fed.set_defaults(func=cmd_federate_import)
 
+
+def _add_rewrite_parser(sub: argparse._SubParsersAction) -> None:
     p_helper_rewrite = sub.add_parser("rewrite", help="run helper rewrite script on a clip (stdin=clip, stdout=rewrite)")
     p_helper_rewrite.add_argument("--id", type=int, help="clip id (default latest)")
     p_helper_rewrite.add_argument("--timeout", type=float, default=8.0)
     p_helper_rewrite.add_argument("--show", action="store_true", help="print helper output")
     p_helper_rewrite.set_defaults(func=cmd_rewrite)
 
+
+def _add_shorten_parser(sub: argparse._SubParsersAction) -> None:
     p_helper_shorten = sub.add_parser("shorten", help="run helper shorten script on a clip")
     p_helper_shorten.add_argument("--id", type=int, help="clip id (default latest)")
     p_helper_shorten.add_argument("--timeout", type=float, default=8.0)
     p_helper_shorten.add_argument("--show", action="store_true", help="print helper output")
     p_helper_shorten.set_defaults(func=cmd_shorten)
 
+
+def _add_extract_parser(sub: argparse._SubParsersAction) -> None:
     p_helper_extract = sub.add_parser("extract", help="run helper extract script on a clip")
     p_helper_extract.add_argument("--id", type=int, help="clip id (default latest)")
     p_helper_extract.add_argument("--timeout", type=float, default=8.0)
     p_helper_extract.add_argument("--show", action="store_true", help="print helper output")
     p_helper_extract.set_defaults(func=cmd_extract)
 
+
+def _add_note_parser(sub: argparse._SubParsersAction) -> None:
     p_note = sub.add_parser("note", help="append and view notes for a clip")
     p_note.add_argument("--id", type=int, required=True, help="clip id")
     p_note.add_argument("--text", help="note text to append")
     p_note.set_defaults(func=cmd_note)
 
+
+def _add_recall_parser(sub: argparse._SubParsersAction) -> None:
     p_recall = sub.add_parser("recall", help="run recall helper over recent clips (off by default)")
     p_recall.add_argument("--hours", type=float, help="look back this many hours (optional)")
     p_recall.add_argument("--limit", type=int, default=50, help="max clips to send")
@@ -4798,6 +5937,8 @@ def build_parser() -> argparse.ArgumentParser:
     p_recall.add_argument("--show", action="store_true", help="print helper output")
     p_recall.set_defaults(func=cmd_recall)
 
+
+def _add_fill_parser(sub: argparse._SubParsersAction) -> None:
     p_fill = sub.add_parser("fill", help="run fill/gaps helper over recent clips (off by default)")
     p_fill.add_argument("--hours", type=float, help="look back this many hours (optional)")
     p_fill.add_argument("--limit", type=int, default=50, help="max clips to send")
@@ -4806,6 +5947,8 @@ def build_parser() -> argparse.ArgumentParser:
     p_fill.add_argument("--show", action="store_true", help="print helper output")
     p_fill.set_defaults(func=cmd_fill)
 
+
+def _add_related_parser(sub: argparse._SubParsersAction) -> None:
     p_related = sub.add_parser("related", help="semantic related clips for a given clip id")
     p_related.add_argument("--id", type=int, required=True)
     p_related.add_argument("--limit", type=int, default=10)
@@ -4814,11 +5957,15 @@ def build_parser() -> argparse.ArgumentParser:
     p_related.add_argument("--tag", help="filter by tag")
     p_related.set_defaults(func=cmd_related)
 
+
+def _add_recap_parser(sub: argparse._SubParsersAction) -> None:
     p_recap = sub.add_parser("recap", help="session recap grouped by app within a timeframe")
     p_recap.add_argument("--minutes", type=int, default=60, help="lookback window in minutes")
     p_recap.add_argument("--limit", type=int, default=200, help="max clips to consider")
     p_recap.set_defaults(func=cmd_recap)
 
+
+def _add_context_parser(sub: argparse._SubParsersAction) -> None:
     p_context = sub.add_parser("context", help="dump recent context bundle for LLMs/sidecars")
     p_context.add_argument("--limit", type=int, default=20, help="max clips")
     p_context.add_argument("--app", help="filter by app")
@@ -4827,6 +5974,8 @@ def build_parser() -> argparse.ArgumentParser:
     p_context.add_argument("--pins-only", action="store_true", help="only pinned clips")
     p_context.set_defaults(func=cmd_context)
 
+
+def _add_topics_parser(sub: argparse._SubParsersAction) -> None:
     p_topics = sub.add_parser("topics", help="group recent clips into topic buckets (tags/apps)")
     p_topics.add_argument("--limit", type=int, default=8, help="max topic buckets to show")
     p_topics.add_argument("--per-group", type=int, default=5, help="max items per bucket")
@@ -4838,6 +5987,8 @@ def build_parser() -> argparse.ArgumentParser:
     p_topics.add_argument("--pins-only", action="store_true", help="only pinned clips")
     p_topics.set_defaults(func=cmd_topics)
 
+
+def _add_palette_parser(sub: argparse._SubParsersAction) -> None:
     p_palette = sub.add_parser("palette", help="interactive picker to copy a clip")
     p_palette.add_argument("--query", help="filter text (uses FTS if provided)")
     p_palette.add_argument("--semantic", action="store_true", help="use semantic search instead of FTS")
@@ -4849,6 +6000,8 @@ def build_parser() -> argparse.ArgumentParser:
     p_palette.add_argument("--since-hours", type=float, help="look back this many hours")
     p_palette.set_defaults(func=cmd_palette)
 
+
+def _add_install_launchagent_parser(sub: argparse._SubParsersAction) -> None:
     p_launch = sub.add_parser("install-launchagent", help="write/remove LaunchAgent for watcher")
     p_launch.add_argument("--cap", type=int, default=2000, help="cap passed to watcher")
     p_launch.add_argument("--interval", type=float, default=1.0, help="interval passed to watcher")
@@ -4856,16 +6009,92 @@ def build_parser() -> argparse.ArgumentParser:
     p_launch.add_argument("--remove", action="store_true", help="remove the LaunchAgent file")
     p_launch.set_defaults(func=cmd_install_launchagent)
 
+
+def _add_serve_parser(sub: argparse._SubParsersAction) -> None:
     p_serve = sub.add_parser("serve", help="start local HTTP API server")
     p_serve.add_argument("--host", default="127.0.0.1")
     p_serve.add_argument("--port", type=int, default=8765)
     p_serve.set_defaults(func=cmd_serve)
 
+
+# Subcommand name -> builder, in help-listing order. main() builds only the
+# invoked command's subparser; build_parser() with no argument builds them all.
+SUBPARSER_BUILDERS: dict[str, Callable[[argparse._SubParsersAction], None]] = {
+    "init": _add_init_parser,
+    "watch": _add_watch_parser,
+    "recent": _add_recent_parser,
+    "search": _add_search_parser,
+    "semantic-search": _add_semantic_search_parser,
+    "delete": _add_delete_parser,
+    "stats": _add_stats_parser,
+    "status": _add_status_parser,
+    "mcp-urls": _add_mcp_urls_parser,
+    "personas": _add_personas_parser,
+    "settings": _add_settings_parser,
+    "copilot": _add_copilot_parser,
+    "ml": _add_ml_parser,
+    "about": _add_about_parser,
+    "pause": _add_pause_parser,
+    "blocklist": _add_blocklist_parser,
+    "show": _add_show_parser,
+    "export": _add_export_parser,
+    "export-md": _add_export_md_parser,
+    "config": _add_config_parser,
+    "purge": _add_purge_parser,
+    "tags": _add_tags_parser,
+    "pin": _add_pin_parser,
+    "copy": _add_copy_parser,
+    "backup": _add_backup_parser,
+    "restore": _add_restore_parser,
+    "sync": _add_sync_parser,
+    "history": _add_history_parser,
+    "ingest-file": _add_ingest_file_parser,
+    "watch-inbox": _add_watch_inbox_parser,
+    "ingest-image": _add_ingest_image_parser,
+    "ingest-transcript": _add_ingest_transcript_parser,
+    "federate-import": _add_federate_import_parser,
+    "rewrite": _add_rewrite_parser,
+    "shorten": _add_shorten_parser,
+    "extract": _add_extract_parser,
+    "note": _add_note_parser,
+    "recall": _add_recall_parser,
+    "fill": _add_fill_parser,
+    "related": _add_related_parser,
+    "recap": _add_recap_parser,
+    "context": _add_context_parser,
+    "topics": _add_topics_parser,
+    "palette": _add_palette_parser,
+    "install-launchagent": _add_install_launchagent_parser,
+    "serve": _add_serve_parser,
+}
+
+
+# Parsers are only read by parse_args, so one instance per command is reused.
+@functools.lru_cache(maxsize=None)
+def build_parser(command: Optional[str] = None) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="my--father-mother: local clipboard memory")
+    sub = parser.add_subparsers(dest="command", required=True)
+    builders = SUBPARSER_BUILDERS.values() if command is None else [SUBPARSER_BUILDERS[command]]
+    for build in builders:
+        build(sub)
     return parser
 
 
+def sniff_subcommand(argv: list[str]) -> Optional[str]:
+    """The subcommand argv invokes, or None when the full parser is needed.
+
+    The top-level parser only takes -h, so the first bare token is the command.
+    Bare --help and unknown commands return None so argparse still lists every
+    choice in its help and "invalid choice" messages.
+    """
+    for token in argv:
+        if not token.startswith("-"):
+            return token if token in SUBPARSER_BUILDERS else None
+    return None
+
+
 def main(argv: list[str]) -> int:
-    parser = build_parser()
+    parser = build_parser(sniff_subcommand(argv))
     args = parser.parse_args(argv)
     args.func(args)
     return 0
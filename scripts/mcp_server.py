@@ -18,205 +18,295 @@ import sys
 import threading
 import time
 import urllib.parse
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 
-# Import app internals
+try:  # optional: faster JSON encoding (pip install orjson)
+    import orjson
+except ImportError:
+    orjson = None
+
+# App internals are imported on first use (see _get_mfm) so the server binds
+# without paying for main.py's import.
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
-import main as mfm  # type: ignore
+mfm = None
 
 HOST = os.environ.get("MFM_MCP_HOST", "127.0.0.1")
 PORT = int(os.environ.get("MFM_MCP_PORT", "39300"))
 
 
+def _parse_qs_fast(query: str) -> dict[str, str]:
+    """Flat query dict like parse_qs(...)[0] lookups: first value wins, blanks dropped.
+
+    Only fields containing % or + go through unquote_plus.
+    """
+    qs: dict[str, str] = {}
+    if not query:
+        return qs
+    for field in query.split("&"):
+        key, _, value = field.partition("=")
+        if not value:
+            continue
+        if "%" in field or "+" in field:
+            key = urllib.parse.unquote_plus(key)
+            value = urllib.parse.unquote_plus(value)
+        qs.setdefault(key, value)
+    return qs
+
+
+def _qs_limit(qs: dict[str, str], default: int = 20) -> int:
+    try:
+        return int(qs.get("limit", default))
+    except ValueError:
+        return default
+
+
+_TRUE_VALUES = ("1", "true", "yes", "on")
+
+
+# Responses up to this size are buffered and sent with Content-Length; larger
+# ones are streamed as HTTP/1.1 chunks of about this size.
+STREAM_THRESHOLD = 64 * 1024
+# compact separators match orjson's output, so bodies are identical either way
+_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+_encode = _ENCODER.encode
+
+
 def json_bytes(obj: dict) -> bytes:
-    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return _encode(obj).encode("utf-8")
+
+
+def _get_mfm():
+    global mfm
+    if mfm is None:
+        import main as _mfm  # type: ignore
+
+        mfm = _mfm
+    return mfm
+
+
+_TLS = threading.local()
+
+
+def _get_conn():
+    """This thread's connection; init_db returns early once the file is set up."""
+    conn = getattr(_TLS, "conn", None)
+    if conn is None:
+        mfm = _get_mfm()
+        conn = mfm.connect_db()
+        mfm.init_db(conn)
+        _TLS.conn = conn
+    return conn
+
+
+def _clip_items(rows: list, tag_map: dict, notes_map: dict) -> list[dict]:
+    tags_get = tag_map.get
+    notes_get = notes_map.get
+    return [
+        {
+            "id": row["id"],
+            "created_at": row["created_at"],
+            "source_app": row["source_app"],
+            "window_title": row["window_title"],
+            "content": row["content"],
+            "pinned": bool(row["pinned"]),
+            "title": row["title"],
+            "lang": row["lang"],
+            "tags": tags_get(row["id"], []),
+            "notes": notes_get(row["id"], []),
+        }
+        for row in rows
+    ]
 
 
 def recent_items(limit: int = 20) -> list[dict]:
-    conn = mfm.connect_db()
-    mfm.init_db(conn)
-    rows, tag_map = mfm.filtered_rows(conn, limit, app=None, contains=None, tag=None, pins_only=False, since_iso=None, until_iso=None)
-    notes_map = mfm.notes_for_clips(conn, [row["id"] for row in rows])
-    items = []
-    for row in rows:
-        items.append(
-            dict(
-                id=row["id"],
-                created_at=row["created_at"],
-                source_app=row["source_app"],
-                window_title=row["window_title"],
-                content=row["content"],
-                pinned=bool(row["pinned"]),
-                title=row["title"],
-                lang=row["lang"],
-                tags=tag_map.get(row["id"], []),
-                notes=notes_map.get(row["id"], []),
-            )
-        )
-    return items
+    mfm = _get_mfm()
+    conn = _get_conn()
+    rows, tag_map, notes_map = mfm.recent_annotated_rows(conn, limit)
+    return _clip_items(rows, tag_map, notes_map)
 
 
 def context_items(limit: int = 20, app: str | None = None, tag: str | None = None, hours: float | None = None, pins_only: bool = False) -> list[dict]:
-    conn = mfm.connect_db()
-    mfm.init_db(conn)
+    mfm = _get_mfm()
+    conn = _get_conn()
     return mfm.context_bundle(conn, app=app, tag=tag, limit=limit, hours=hours, pins_only=pins_only)
 
 
 def search_items(q: str, limit: int = 20, app: str | None = None, tag: str | None = None, pins_only: bool = False) -> list[dict]:
-    conn = mfm.connect_db()
-    mfm.init_db(conn)
-    clauses = ["clips_fts MATCH ?"]
-    params: list = [q]
-    if app:
-        clauses.append("LOWER(c.source_app) = LOWER(?)")
-        params.append(app)
-    if tag:
-        clauses.append(
-            "c.id IN (SELECT clip_id FROM clip_tags ct JOIN tags t ON t.id = ct.tag_id WHERE LOWER(t.name) = LOWER(?))"
-        )
-        params.append(tag)
-    if pins_only:
-        clauses.append("c.pinned = 1")
-    where = " AND ".join(clauses)
-    sql = f"""
-        SELECT c.id, c.created_at, c.source_app, c.window_title, c.content, c.pinned, c.title, c.lang
-        FROM clips_fts f
-        JOIN clips c ON c.id = f.rowid
-        WHERE {where}
-        ORDER BY c.created_at DESC
-        LIMIT ?;
-    """
-    params.append(limit)
-    cur = conn.execute(sql, params)
-    rows_db = cur.fetchall()
-    tag_map = mfm.tags_for_clips(conn, [row["id"] for row in rows_db])
-    notes_map = mfm.notes_for_clips(conn, [row["id"] for row in rows_db])
-    items = []
-    for row in rows_db:
-        items.append(
-            dict(
-                id=row["id"],
-                created_at=row["created_at"],
-                source_app=row["source_app"],
-                window_title=row["window_title"],
-                content=row["content"],
-                pinned=bool(row["pinned"]),
-                title=row["title"],
-                lang=row["lang"],
-                tags=tag_map.get(row["id"], []),
-                notes=notes_map.get(row["id"], []),
-            )
-        )
-    return items
+    mfm = _get_mfm()
+    conn = _get_conn()
+    # main's cached FTS statement text, keyed on which filters are present
+    rows_db = mfm.search_rows(conn, q, limit, app=app, tag=tag, pins_only=pins_only)
+    tag_map, notes_map = mfm.tags_and_notes_for_clips(conn, [row["id"] for row in rows_db])
+    return _clip_items(rows_db, tag_map, notes_map)
 
 
 class MCPHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 for chunked responses; idle keep-alive connections time out
+    protocol_version = "HTTP/1.1"
+    timeout = 30
+
     def log_message(self, format: str, *args) -> None:
         return
 
-    def _send_json(self, status: int, payload: dict) -> None:
-        body = json_bytes(payload)
+    def _send_body(self, status: int, body: bytes) -> None:
         self.send_response(status)
         self.send_header("Content-Type", "application/json")
         self.send_header("Content-Length", str(len(body)))
         self.end_headers()
         self.wfile.write(body)
 
-    def do_GET(self) -> None:
-        path, _, query = self.path.partition("?")
-        qs = urllib.parse.parse_qs(query)
-        if path == "/health":
-            self._send_json(200, {"ok": True})
+    def _send_json(self, status: int, payload: dict) -> None:
+        if orjson is not None:
+            # orjson builds the whole body in C faster than iterencode can stream it
+            self._send_body(status, json_bytes(payload))
             return
-        if path == "/model_context_protocol/2025-03-26/mcp":
-            resources = [
-                {
-                    "uri": f"http://{HOST}:{PORT}/mcp/recent",
-                    "name": "recent",
-                    "description": "Recent clips from my--father-mother",
-                },
-                {
-                    "uri": f"http://{HOST}:{PORT}/mcp/context",
-                    "name": "context",
-                    "description": "Context bundle with tags/notes (filter by app/tag/hours/pins)",
-                },
-                {
-                    "uri": f"http://{HOST}:{PORT}/mcp/search",
-                    "name": "search",
-                    "description": "FTS search over clips (q param)",
-                },
-                {
-                    "uri": f"http://{HOST}:{PORT}/model_context_protocol/2024-11-05/sse",
-                    "name": "sse",
-                    "description": "Heartbeat SSE with count/latest",
-                },
-            ]
-            self._send_json(200, {"resources": resources, "version": "2025-03-26"})
+        pieces = _ENCODER.iterencode(payload)
+        buf: list[bytes] = []
+        size = 0
+        for piece in pieces:
+            data = piece.encode("utf-8")
+            buf.append(data)
+            size += len(data)
+            if size >= STREAM_THRESHOLD and self.request_version == "HTTP/1.1":
+                break
+        else:
+            self._send_body(status, b"".join(buf))
             return
-        if path == "/mcp/recent":
-            try:
-                limit = int(qs.get("limit", [20])[0])
-            except Exception:
-                limit = 20
-            items = recent_items(limit=limit)
-            self._send_json(200, {"items": items})
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self._write_chunk(b"".join(buf))
+        buf, size = [], 0
+        for piece in pieces:
+            data = piece.encode("utf-8")
+            buf.append(data)
+            size += len(data)
+            if size >= STREAM_THRESHOLD:
+                self._write_chunk(b"".join(buf))
+                buf, size = [], 0
+        if buf:
+            self._write_chunk(b"".join(buf))
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+
+    def do_GET(self) -> None:
+        path, _, query = self.path.partition("?")
+        handler = self.GET_ROUTES.get(path)
+        if handler is None:
+            self._send_json(404, {"error": "not found"})
             return
-        if path == "/mcp/context":
+        handler(self, _parse_qs_fast(query))
+
+    def _get_health(self, qs: dict[str, str]) -> None:
+        self._send_json(200, {"ok": True})
+
+    def _get_mcp(self, qs: dict[str, str]) -> None:
+        resources = [
+            {
+                "uri": f"http://{HOST}:{PORT}/mcp/recent",
+                "name": "recent",
+                "description": "Recent clips from my--father-mother",
+            },
+            {
+                "uri": f"http://{HOST}:{PORT}/mcp/context",
+                "name": "context",
+                "description": "Context bundle with tags/notes (filter by app/tag/hours/pins)",
+            },
+            {
+                "uri": f"http://{HOST}:{PORT}/mcp/search",
+                "name": "search",
+                "description": "FTS search over clips (q param)",
+            },
+            {
+                "uri": f"http://{HOST}:{PORT}/model_context_protocol/2024-11-05/sse",
+                "name": "sse",
+                "description": "Heartbeat SSE with count/latest",
+            },
+        ]
+        self._send_json(200, {"resources": resources, "version": "2025-03-26"})
+
+    def _get_recent(self, qs: dict[str, str]) -> None:
+        items = recent_items(limit=_qs_limit(qs))
+        self._send_json(200, {"items": items})
+
+    def _get_context(self, qs: dict[str, str]) -> None:
+        hours = None
+        if "hours" in qs:
             try:
-                limit = int(qs.get("limit", [20])[0])
-            except Exception:
-                limit = 20
-            app = qs.get("app", [None])[0]
-            tag = qs.get("tag", [None])[0]
-            pins_only = qs.get("pins_only", ["false"])[0].lower() in ("1", "true", "yes", "on")
-            hours = None
-            if "hours" in qs:
-                try:
-                    hours = float(qs["hours"][0])
-                except Exception:
-                    hours = None
-            items = context_items(limit=limit, app=app, tag=tag, hours=hours, pins_only=pins_only)
-            self._send_json(200, {"items": items})
-            return
-        if path == "/mcp/search":
-            q = qs.get("q", [""])[0]
+                hours = float(qs["hours"])
+            except ValueError:
+                hours = None
+        items = context_items(
+            limit=_qs_limit(qs),
+            app=qs.get("app"),
+            tag=qs.get("tag"),
+            hours=hours,
+            pins_only=qs.get("pins_only", "false").lower() in _TRUE_VALUES,
+        )
+        self._send_json(200, {"items": items})
+
+    def _get_search(self, qs: dict[str, str]) -> None:
+        items = search_items(
+            qs.get("q", ""),
+            limit=_qs_limit(qs),
+            app=qs.get("app"),
+            tag=qs.get("tag"),
+            pins_only=qs.get("pins_only", "false").lower() in _TRUE_VALUES,
+        )
+        self._send_json(200, {"items": items})
+
+    def _get_sse(self, qs: dict[str, str]) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        # no length on an event stream: it ends when the connection closes
+        self.send_header("Connection", "close")
+        self.end_headers()
+        mfm = _get_mfm()
+        conn = _get_conn()
+        last_key = None
+        frame = b""
+        for _ in range(60):  # ~60 seconds of heartbeats
+            stats = mfm.status_snapshot(conn)
+            key = (stats.get("count"), stats.get("latest"))
+            if key != last_key:  # steady state re-sends the cached frame
+                frame = b"data: " + json_bytes({"count": key[0], "latest": key[1]}) + b"\n\n"
+                last_key = key
             try:
-                limit = int(qs.get("limit", [20])[0])
+                self.wfile.write(frame)
+                self.wfile.flush()
             except Exception:
-                limit = 20
-            app = qs.get("app", [None])[0]
-            tag = qs.get("tag", [None])[0]
-            pins_only = qs.get("pins_only", ["false"])[0].lower() in ("1", "true", "yes", "on")
-            items = search_items(q, limit=limit, app=app, tag=tag, pins_only=pins_only)
-            self._send_json(200, {"items": items})
-            return
-        if path == "/model_context_protocol/2024-11-05/sse":
-            self.send_response(200)
-            self.send_header("Content-Type", "text/event-stream")
-            self.send_header("Cache-Control", "no-cache")
-            self.send_header("Connection", "keep-alive")
-            self.end_headers()
-            for _ in range(60):  # ~60 seconds of heartbeats
-                stats = mfm.status_snapshot(mfm.connect_db())
-                payload = json.dumps({"count": stats.get("count"), "latest": stats.get("latest")})
-                try:
-                    self.wfile.write(f"data: {payload}\n\n".encode("utf-8"))
-                    self.wfile.flush()
-                except Exception:
-                    break
-                time.sleep(1.0)
-            return
-        self._send_json(404, {"error": "not found"})
+                break
+            time.sleep(1.0)
 
     def do_POST(self) -> None:
+        # drain the body so the next request on a keep-alive connection parses
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > 0:
+            self.rfile.read(length)
         self._send_json(404, {"error": "not found"})
 
+    GET_ROUTES = {
+        "/health": _get_health,
+        "/model_context_protocol/2025-03-26/mcp": _get_mcp,
+        "/mcp/recent": _get_recent,
+        "/mcp/context": _get_context,
+        "/mcp/search": _get_search,
+        "/model_context_protocol/2024-11-05/sse": _get_sse,
+    }
+
 
 def serve() -> None:
-    server = HTTPServer((HOST, PORT), MCPHandler)
+    # one daemon thread per request so a 60s SSE stream doesn't block JSON endpoints
+    server = ThreadingHTTPServer((HOST, PORT), MCPHandler)
     print(f"[mcp] serving on http://{HOST}:{PORT}/model_context_protocol/2025-03-26/mcp (Ctrl+C to stop)")
     try:
         server.serve_forever()
@@ -14,13 +14,24 @@ if str(ROOT) not in sys.path:
 import main as mfm
 
 
+@pytest.fixture(scope="session")
+def schema_template():
+    """In-memory database with the schema built once per test session."""
+    t = sqlite3.connect(":memory:")
+    t.row_factory = sqlite3.Row
+    t.execute("PRAGMA foreign_keys=ON;")
+    mfm.init_db(t)
+    yield t
+    t.close()
+
+
 @pytest.fixture
-def conn():
-    """In-memory SQLite connection with full schema initialized."""
+def conn(schema_template):
+    """In-memory SQLite connection with full schema initialized (cloned from the template)."""
     c = sqlite3.connect(":memory:")
+    schema_template.backup(c)
     c.row_factory = sqlite3.Row
-    c.execute("PRAGMA foreign_keys=ON;")
-    mfm.init_db(c)
+    c.executescript("PRAGMA foreign_keys=ON; " + mfm.EPHEMERAL_PRAGMAS)
     return c
 
 
@@ -33,14 +44,36 @@ def populated_db(conn):
         ("def main():\n    pass", "VSCode", "main.py", now, "hash_b"),
         ("SELECT * FROM users", "DataGrip", "query.sql", now, "hash_c"),
     ]
-    for content, app, window, ts, h in clips:
-        conn.execute(
-            "INSERT INTO clips (created_at, source_app, window_title, content, hash, pinned, lang) VALUES (?,?,?,?,?,0,'unk')",
-            (ts, app, window, content, h),
-        )
+    conn.executemany(
+        "INSERT INTO clips (created_at, source_app, window_title, content, hash, pinned, lang) VALUES (?,?,?,?,?,0,'unk')",
+        ((ts, app, window, content, h) for content, app, window, ts, h in clips),
+    )
     conn.commit()
     # Manually populate FTS (triggers only fire on real inserts through the trigger)
-    for row in conn.execute("SELECT id, content FROM clips").fetchall():
-        conn.execute("INSERT INTO clips_fts(rowid, content) VALUES (?, ?)", (row["id"], row["content"]))
+    rows = conn.execute("SELECT id, content FROM clips").fetchall()
+    conn.executemany("INSERT INTO clips_fts(rowid, content) VALUES (?, ?)", ((row["id"], row["content"]) for row in rows))
     conn.commit()
     return conn
+
+
+@pytest.fixture
+def first_clip_id(populated_db):
+    """Id of the first clip in populated_db."""
+    return populated_db.execute("SELECT MIN(id) FROM clips").fetchone()[0]
+
+
+@pytest.fixture
+def mfm_connection():
+    """Factory for initialized mfm.Connection objects (per-connection caches), closed at teardown."""
+    opened = []
+
+    def connect(path=":memory:"):
+        c = sqlite3.connect(str(path), factory=mfm.Connection)
+        c.row_factory = sqlite3.Row
+        mfm.init_db(c)
+        opened.append(c)
+        return c
+
+    yield connect
+    for c in opened:
+        c.close()
@@ -1,10 +1,15 @@
 """Tests for main.py — database, clips, settings, secrets, embeddings, tags."""
 
+import argparse
+import contextlib
 import hashlib
 import json
 import sqlite3
+import zlib
 from datetime import datetime, timezone, timedelta
 
+import pytest
+
 import main as mfm
 
 
@@ -32,6 +37,20 @@ class TestInitDb:
         # Second call should not raise
         mfm.init_db(conn)
 
+    def test_tune_connection_once(self):
+        c = sqlite3.connect(":memory:", factory=mfm.Connection)
+        mfm.tune_connection(c)
+        assert c.pragmas_done is True
+        assert c.execute("PRAGMA cache_size").fetchone()[0] == -65536
+        assert c.execute("PRAGMA temp_store").fetchone()[0] == 2
+
+    def test_memory_db_skips_durability(self):
+        c = sqlite3.connect(":memory:")
+        c.row_factory = sqlite3.Row
+        mfm.init_db(c)
+        assert c.execute("PRAGMA synchronous").fetchone()[0] == 0
+        assert c.execute("PRAGMA journal_mode").fetchone()[0] == "memory"
+
     def test_clips_columns(self, conn):
         cur = conn.execute("PRAGMA table_info(clips)")
         cols = {row["name"] for row in cur.fetchall()}
@@ -43,6 +62,61 @@ class TestInitDb:
         assert "file_path" in cols
         assert "lang" in cols
 
+    def test_file_db_initialized_once_per_process(self, tmp_path):
+        path = str(tmp_path / "once.db")
+        c = sqlite3.connect(path)
+        c.row_factory = sqlite3.Row
+        mfm.init_db(c)
+        assert mfm.database_file(c) in mfm._DB_READY
+        c.execute("DROP TABLE copilot_chats")
+        mfm.init_db(c)
+        assert not mfm.column_exists(c, "copilot_chats", "id")
+        mfm._DB_READY.discard(mfm.database_file(c))
+        mfm.init_db(c)
+        assert mfm.column_exists(c, "copilot_chats", "id")
+        c.close()
+
+    def test_rowid_tables_migrated(self):
+        c = sqlite3.connect(":memory:")
+        c.row_factory = sqlite3.Row
+        c.executescript(
+            """
+            CREATE TABLE settings (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            CREATE TABLE blocklist (id INTEGER PRIMARY KEY AUTOINCREMENT, app TEXT UNIQUE NOT NULL);
+            CREATE TABLE clip_tags (clip_id INTEGER NOT NULL, tag_id INTEGER NOT NULL, PRIMARY KEY (clip_id, tag_id));
+            INSERT INTO settings VALUES ('paused', '1');
+            INSERT INTO blocklist(app) VALUES ('1password');
+            INSERT INTO clip_tags VALUES (1, 2);
+            """
+        )
+        mfm.init_db(c)
+        for table in ("settings", "blocklist", "clip_tags"):
+            sql = c.execute("SELECT sql FROM sqlite_master WHERE name = ?", (table,)).fetchone()[0]
+            assert "WITHOUT ROWID" in sql
+        assert mfm.get_setting(c, "paused") == "1"
+        assert mfm.get_blocklist(c) == {"1password"}
+        assert [tuple(r) for r in c.execute("SELECT clip_id, tag_id FROM clip_tags")] == [(1, 2)]
+        c.close()
+
+
+class TestReadPool:
+    def test_reuses_read_only_connections(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(mfm, "DB_DIR", tmp_path)
+        monkeypatch.setattr(mfm, "DB_PATH", tmp_path / "db.sqlite3")
+        writer = mfm.connect_db()
+        mfm.init_db(writer)
+        cid = mfm.insert_clip(writer, "pooled read", "App", "Win")
+        pool = mfm.ReadPool(1)
+        reader = pool.acquire()
+        assert reader.execute("SELECT content FROM clips WHERE id = ?", (cid,)).fetchone()[0] == "pooled read"
+        with pytest.raises(sqlite3.OperationalError):
+            reader.execute("DELETE FROM clips")
+        pool.release(reader)
+        assert pool.acquire() is reader
+        pool.release(reader)
+        pool.close()
+        writer.close()
+
 
 class TestColumnExists:
     def test_existing_column(self, conn):
@@ -101,28 +175,104 @@ class TestInsertClip:
 
 
 class TestInsertEvent:
-    def test_inserts_event(self, populated_db):
-        cid = populated_db.execute("SELECT id FROM clips LIMIT 1").fetchone()["id"]
+    def test_inserts_event(self, populated_db, first_clip_id):
+        cid = first_clip_id
         mfm.insert_event(populated_db, cid)
         events = populated_db.execute("SELECT * FROM clip_events WHERE clip_id = ?", (cid,)).fetchall()
         assert len(events) == 1
 
 
+class TestImportClips:
+    def test_counts_and_side_tables(self, conn):
+        existing_id = mfm.insert_clip(conn, "already here", "App", "Win")
+        res = mfm.import_clips(
+            conn,
+            [
+                {"content": "fresh one", "source_app": "Remote", "tags": ["Work", " "], "pinned": True},
+                {"content": "already here"},
+                {"content": "fresh one"},
+                {"content": "   "},
+            ],
+        )
+        assert res == {"inserted": 1, "existing": 2, "failed": 1}
+        row = conn.execute("SELECT * FROM clips WHERE content = 'fresh one'").fetchone()
+        assert row["source_app"] == "Remote"
+        assert row["pinned"] == 1
+        assert mfm.tags_for_clip(conn, row["id"]) == ["work"]
+        assert conn.execute("SELECT model FROM clip_vectors WHERE clip_id = ?", (row["id"],)).fetchone()[0] == "hash"
+        events = [r[0] for r in conn.execute("SELECT clip_id FROM clip_events ORDER BY id")]
+        assert events == [existing_id, row["id"]]
+        assert [r[0] for r in conn.execute("SELECT rowid FROM clips_fts WHERE clips_fts MATCH 'fresh'")] == [row["id"]]
+
+    def test_insert_clips_bulk(self, conn):
+        rows = [("2026-01-01", "App", "Win", f"bulk {i}", f"bulk_{i}", None, 0, None, "unk") for i in range(3)]
+        with conn:
+            ids = mfm.insert_clips_bulk(conn, rows, [[1.0, 0.0]] * 3, "hash")
+        assert sorted(ids) == ["bulk_0", "bulk_1", "bulk_2"]
+        stored = conn.execute("SELECT clip_id, vector FROM clip_vectors ORDER BY clip_id").fetchall()
+        assert [r["clip_id"] for r in stored] == sorted(ids.values())
+        assert mfm.load_embedding(stored[0]) == [1.0, 0.0]
+
+    def test_undated_items_keep_import_order(self, conn):
+        mfm.import_clips(conn, [{"content": f"undated {i}"} for i in range(5)])
+        rows, _ = mfm.filtered_rows(conn, 10)
+        assert [row["content"] for row in rows] == [f"undated {i}" for i in reversed(range(5))]
+        stamps = [row["created_at"] for row in reversed(rows)]
+        assert stamps == sorted(stamps)
+
+    def test_large_import_rebuilds_fts_once(self, conn):
+        items = [{"content": f"bulk item {i}"} for i in range(mfm.BULK_FTS_MIN_ROWS)]
+        assert mfm.import_clips(conn, items)["inserted"] == mfm.BULK_FTS_MIN_ROWS
+        hits = conn.execute("SELECT COUNT(*) FROM clips_fts WHERE clips_fts MATCH 'bulk'").fetchone()[0]
+        assert hits == mfm.BULK_FTS_MIN_ROWS
+        triggers = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+        assert set(mfm.FTS_TRIGGER_NAMES) <= triggers
+
+    def test_bulk_context_rollback_keeps_triggers(self, conn):
+        with pytest.raises(RuntimeError):
+            with mfm.bulk_insert_context(conn):
+                conn.execute("INSERT INTO clips (created_at, content, hash) VALUES ('2026', 'gone', 'h')")
+                raise RuntimeError
+        assert conn.execute("SELECT COUNT(*) FROM clips").fetchone()[0] == 0
+        mfm.insert_clip(conn, "after rollback", "App", "Win")
+        assert conn.execute("SELECT COUNT(*) FROM clips_fts WHERE clips_fts MATCH 'rollback'").fetchone()[0] == 1
+
+
 class TestPrune:
     def test_prune_removes_oldest(self, conn):
-        for i in range(5):
-            ts = f"2026-01-{10+i:02d}T00:00:00+00:00"
-            conn.execute(
+        with conn:
+            conn.executemany(
                 "INSERT INTO clips (created_at, source_app, window_title, content, hash, pinned, lang) VALUES (?,?,?,?,?,0,'unk')",
-                (ts, "App", "Win", f"content {i}", f"hash_{i}"),
+                ((f"2026-01-{10+i:02d}T00:00:00+00:00", "App", "Win", f"content {i}", f"hash_{i}") for i in range(5)),
             )
-        conn.commit()
         removed = mfm.prune(conn, cap=3)
         assert removed == 2
         remaining = conn.execute("SELECT COUNT(*) as c FROM clips").fetchone()["c"]
         assert remaining == 3
 
 
+class TestPurgeClips:
+    def _seed(self, conn):
+        for i in range(6):
+            conn.execute(
+                "INSERT INTO clips (created_at, source_app, window_title, content, hash, pinned, lang) VALUES (?,?,'',?,?,0,'unk')",
+                (f"2026-01-0{i + 1}T10:00:00+00:00", "A" if i % 2 else "B", f"clip {i}", f"h{i}"),
+            )
+        conn.commit()
+
+    def test_keep_last_scoped_to_app(self, conn):
+        self._seed(conn)
+        assert mfm.purge_clips(conn, app="a", keep_last=1) == 2
+        left = [r[0] for r in conn.execute("SELECT content FROM clips ORDER BY id")]
+        assert left == ["clip 0", "clip 2", "clip 4", "clip 5"]
+
+    def test_keep_last_unfiltered_and_older(self, conn):
+        self._seed(conn)
+        assert mfm.purge_clips(conn, keep_last=4) == 2
+        assert mfm.purge_clips(conn, older_than_days=1) == 4
+        assert conn.execute("SELECT COUNT(*) FROM clips").fetchone()[0] == 0
+
+
 # ──────────────────────────────────────────────
 # Settings
 # ──────────────────────────────────────────────
@@ -140,6 +290,25 @@ class TestSettings:
         mfm.set_setting(conn, "key", "v2")
         assert mfm.get_setting(conn, "key") == "v2"
 
+    def test_cached_across_connections(self, tmp_path, mfm_connection):
+        db = str(tmp_path / "s.db")
+        a = mfm_connection(db)
+        b = mfm_connection(db)
+        assert mfm.get_setting(b, "paused", "0") == "0"
+        statements = []
+        b.set_trace_callback(statements.append)
+        assert mfm.get_setting(b, "paused", "0") == "0"
+        assert statements == []
+        mfm.set_setting(a, "paused", "1")  # same process: seen immediately
+        assert mfm.get_setting(b, "paused") == "1"
+        # another process's write shows up at the next data_version check
+        other = sqlite3.connect(db)
+        other.execute("UPDATE settings SET value = '0' WHERE key = 'paused'")
+        other.commit()
+        b.config_checked = 0.0
+        assert mfm.get_setting(b, "paused") == "0"
+        other.close()
+
 
 class TestBoolSettings:
     def test_get_default_true(self, conn):
@@ -198,6 +367,24 @@ class TestSecrets:
         text = "hello world"
         assert mfm.redact_secrets(text) == text
 
+    def test_anchors_prefilter_patterns(self):
+        assert len(mfm.SECRET_ANCHORS) == len(mfm.SECRET_PATTERNS)
+        for anchor, pat in zip(mfm.SECRET_ANCHORS, mfm.SECRET_PATTERNS):
+            assert anchor in pat.pattern.lower()
+        assert mfm.secret_candidates("just some normal text") == []
+        # re's IGNORECASE folds long s to s; the prefilter must too
+        assert mfm.looks_like_secret("pa\u017fsword=hunter2hunter2") is True
+
+    def test_regex_fallback_without_hyperscan(self, monkeypatch):
+        monkeypatch.setattr(mfm, "hyperscan", None)
+        mfm.secret_scanner.cache_clear()
+        try:
+            assert mfm.secret_scanner() is None
+            assert mfm.looks_like_secret("password: hunter2hunter2") is True
+            assert mfm.looks_like_secret("no secrets here") is False
+        finally:
+            mfm.secret_scanner.cache_clear()
+
 
 class TestAllowSecrets:
     def test_default_disallowed(self, conn):
@@ -222,46 +409,86 @@ class TestTags:
         # Same name returns same id
         assert mfm.get_or_create_tag(conn, "work") == tag_id
 
-    def test_assign_tag(self, populated_db):
-        cid = populated_db.execute("SELECT id FROM clips LIMIT 1").fetchone()["id"]
+    def test_get_or_create_cached_per_connection(self, mfm_connection):
+        c = mfm_connection()
+        tag_id = mfm.get_or_create_tag(c, " Work ")
+        assert c.tag_ids == {"work": tag_id}
+        statements = []
+        c.set_trace_callback(statements.append)
+        assert mfm.get_or_create_tag(c, "work") == tag_id
+        assert statements == []
+
+    def test_tag_cache_dropped_on_config_change(self, mfm_connection):
+        c = mfm_connection()
+        mfm.get_or_create_tag(c, "work")
+        # a swapped database (restore / sync pull) renumbers tags
+        c.execute("DELETE FROM tags")
+        c.execute("INSERT INTO tags(id, name) VALUES (42, 'work')")
+        c.commit()
+        mfm.mark_config_changed()
+        assert mfm.get_or_create_tag(c, "work") == 42
+
+    def test_assign_tag(self, populated_db, first_clip_id):
+        cid = first_clip_id
         result = mfm.assign_tag(populated_db, cid, "important")
         assert result is True
         tags = mfm.tags_for_clip(populated_db, cid)
         assert "important" in tags
 
-    def test_assign_tag_idempotent(self, populated_db):
-        cid = populated_db.execute("SELECT id FROM clips LIMIT 1").fetchone()["id"]
+    def test_assign_tag_idempotent(self, populated_db, first_clip_id):
+        cid = first_clip_id
         mfm.assign_tag(populated_db, cid, "work")
         mfm.assign_tag(populated_db, cid, "work")
         tags = mfm.tags_for_clip(populated_db, cid)
         assert tags.count("work") == 1
 
-    def test_remove_tag(self, populated_db):
-        cid = populated_db.execute("SELECT id FROM clips LIMIT 1").fetchone()["id"]
+    def test_remove_tag(self, populated_db, first_clip_id):
+        cid = first_clip_id
         mfm.assign_tag(populated_db, cid, "temp")
         assert mfm.remove_tag(populated_db, cid, "temp") is True
         assert "temp" not in mfm.tags_for_clip(populated_db, cid)
 
-    def test_remove_nonexistent_tag(self, populated_db):
-        cid = populated_db.execute("SELECT id FROM clips LIMIT 1").fetchone()["id"]
+    def test_remove_nonexistent_tag(self, populated_db, first_clip_id):
+        cid = first_clip_id
         assert mfm.remove_tag(populated_db, cid, "nope") is False
 
-    def test_clear_tags(self, populated_db):
-        cid = populated_db.execute("SELECT id FROM clips LIMIT 1").fetchone()["id"]
-        mfm.assign_tag(populated_db, cid, "a")
-        mfm.assign_tag(populated_db, cid, "b")
+    def test_clear_tags(self, populated_db, first_clip_id):
+        cid = first_clip_id
+        assert mfm.assign_tags(populated_db, cid, ["a", "b"]) == 2
+        mfm.assign_tag(populated_db, cid + 1, "a")
+        statements = []
+        populated_db.set_trace_callback(statements.append)
         count = mfm.clear_tags(populated_db, cid)
+        populated_db.set_trace_callback(None)
         assert count == 2
+        # the count comes from the DELETE itself, not a separate SELECT
+        assert [s for s in statements if s.lstrip().upper().startswith(("SELECT", "DELETE"))] == [
+            f"DELETE FROM clip_tags WHERE clip_id = {cid}"
+        ]
         assert mfm.tags_for_clip(populated_db, cid) == []
+        assert mfm.tags_for_clip(populated_db, cid + 1) == ["a"]
 
-    def test_list_tags(self, populated_db):
-        cid = populated_db.execute("SELECT id FROM clips LIMIT 1").fetchone()["id"]
-        mfm.assign_tag(populated_db, cid, "alpha")
-        mfm.assign_tag(populated_db, cid, "beta")
+    def test_list_tags(self, populated_db, first_clip_id):
+        cid = first_clip_id
+        mfm.assign_tags(populated_db, cid, ["alpha", "beta"])
         all_tags = mfm.list_tags(populated_db)
         assert "alpha" in all_tags
         assert "beta" in all_tags
 
+    def test_assign_tags_batch(self, populated_db, first_clip_id):
+        cid = first_clip_id
+        mfm.assign_tag(populated_db, cid, "old")
+        assert mfm.assign_tags(populated_db, cid, [" Old ", "new", "NEW", "", "other"]) == 2
+        assert mfm.tags_for_clip(populated_db, cid) == ["new", "old", "other"]
+        assert mfm.assign_tags(populated_db, cid, []) == 0
+
+    def test_get_or_create_tags(self, conn):
+        existing = mfm.get_or_create_tag(conn, "work")
+        ids = mfm.get_or_create_tags(conn, ["Work", "home", "home"])
+        assert ids["work"] == existing
+        assert set(ids) == {"work", "home"}
+        assert mfm.get_or_create_tags(conn, ["home"]) == {"home": ids["home"]}
+
     def test_tags_for_clips_batch(self, populated_db):
         ids = [r["id"] for r in populated_db.execute("SELECT id FROM clips").fetchall()]
         mfm.assign_tag(populated_db, ids[0], "x")
@@ -276,12 +503,12 @@ class TestTags:
 # ──────────────────────────────────────────────
 
 class TestNotes:
-    def test_add_note(self, populated_db):
-        cid = populated_db.execute("SELECT id FROM clips LIMIT 1").fetchone()["id"]
+    def test_add_note(self, populated_db, first_clip_id):
+        cid = first_clip_id
         assert mfm.add_note(populated_db, cid, "This is important") is True
 
-    def test_notes_for_clips(self, populated_db):
-        cid = populated_db.execute("SELECT id FROM clips LIMIT 1").fetchone()["id"]
+    def test_notes_for_clips(self, populated_db, first_clip_id):
+        cid = first_clip_id
         mfm.add_note(populated_db, cid, "Note A")
         mfm.add_note(populated_db, cid, "Note B")
         notes_map = mfm.notes_for_clips(populated_db, [cid])
@@ -289,6 +516,28 @@ class TestNotes:
         note_texts = [n["note"] for n in notes_map[cid]]
         assert "Note A" in note_texts
 
+    def test_tags_and_notes_match_separate_lookups(self, populated_db):
+        populated_db.execute("INSERT INTO clip_notes (clip_id, note, created_at) VALUES (1, 'old', '2026-01-01')")
+        populated_db.execute("INSERT INTO clip_notes (clip_id, note, created_at) VALUES (1, 'new', '2026-02-01')")
+        mfm.add_note(populated_db, 2, "other clip")
+        for name in ("zeta", "alpha"):
+            mfm.assign_tag(populated_db, 1, name)
+        ids = [1, 2, 3]
+        tag_map, notes_map = mfm.tags_and_notes_for_clips(populated_db, ids)
+        assert tag_map == mfm.tags_for_clips(populated_db, ids) == {1: ["alpha", "zeta"]}
+        assert notes_map == mfm.notes_for_clips(populated_db, ids)
+        assert [n["note"] for n in notes_map[1]] == ["new", "old"]
+        assert mfm.tags_and_notes_for_clips(populated_db, []) == ({}, {})
+
+    def test_lookups_span_id_chunks(self, populated_db):
+        mfm.assign_tag(populated_db, 3, "last")
+        mfm.add_note(populated_db, 3, "tail")
+        ids = list(range(10_000, 10_000 + 2 * mfm.SQL_IN_CHUNK)) + [3]
+        assert mfm.tags_for_clips(populated_db, ids) == {3: ["last"]}
+        assert [n["note"] for n in mfm.notes_for_clips(populated_db, ids)[3]] == ["tail"]
+        tag_map, notes_map = mfm.tags_and_notes_for_clips(populated_db, ids)
+        assert tag_map == {3: ["last"]} and list(notes_map) == [3]
+
 
 # ──────────────────────────────────────────────
 # Blocklist
@@ -318,6 +567,20 @@ class TestBlocklist:
     def test_remove_nonexistent(self, conn):
         assert mfm.remove_blocked_app(conn, "Nope") is False
 
+    def test_cached_until_changed(self, tmp_path, mfm_connection):
+        db = str(tmp_path / "b.db")
+        a = mfm_connection(db)
+        b = mfm_connection(db)
+        assert mfm.get_blocklist(b) == frozenset()
+        statements = []
+        b.set_trace_callback(statements.append)
+        assert mfm.get_blocklist(b) == frozenset()
+        assert statements == []
+        mfm.add_blocked_app(a, "Slack")
+        assert mfm.get_blocklist(b) == {"slack"}
+        mfm.remove_blocked_app(a, "slack")
+        assert mfm.get_blocklist(b) == frozenset()
+
 
 # ──────────────────────────────────────────────
 # Embeddings
@@ -361,6 +624,19 @@ class TestHashEmbed:
         b = mfm.hash_embed("input two")
         assert a != b
 
+    def test_buckets_stable_across_processes(self):
+        # crc32 buckets, not salted str hashes
+        vec = mfm.hash_embed("Hello hello")
+        assert vec[zlib.crc32(b"hello") % mfm.EMBED_DIM] == 1.0
+
+    def test_legacy_hash_vectors_rebuilt(self, populated_db):
+        populated_db.execute("INSERT INTO clip_vectors(clip_id, dim, vector, model) VALUES (1, 1, ?, 'hash')", (mfm.pack_vector([1.0]),))
+        populated_db.execute("DELETE FROM settings WHERE key = 'hash_embed'")
+        populated_db.commit()
+        mfm.init_db(populated_db)
+        row = populated_db.execute("SELECT vector FROM clip_vectors WHERE clip_id = 1").fetchone()
+        assert mfm.load_embedding(row) == pytest.approx(mfm.hash_embed("hello world"))
+
 
 class TestCosine:
     def test_identical(self):
@@ -377,6 +653,11 @@ class TestCosine:
         b = [-1.0, 0.0]
         assert abs(mfm.cosine(a, b) - (-1.0)) < 1e-6
 
+    def test_fallback_matches_active_dot(self):
+        a = mfm.hash_embed("alpha beta gamma")
+        b = mfm.hash_embed("beta gamma delta")
+        assert mfm._dot_fallback(a, b) == pytest.approx(mfm.cosine(a, b), abs=1e-12)
+
 
 class TestKnn:
     def test_returns_sorted(self):
@@ -400,6 +681,45 @@ class TestKnn:
         results = mfm.knn(query, ids, vecs, limit=3)
         assert len(results) == 3
 
+    def test_top_k_matches_full_sort(self):
+        ids = list(range(50))
+        vecs = [mfm.hash_embed(f"doc {i}") for i in ids]
+        query = mfm.hash_embed("doc 7")
+        full = sorted(((mfm.cosine(query, v), cid) for cid, v in zip(ids, vecs)), key=lambda x: x[0], reverse=True)
+        top = mfm.knn(query, ids, vecs, limit=5)
+        assert [cid for _, cid in top] == [cid for _, cid in full[:5]]
+        assert [sim for sim, _ in top] == pytest.approx([sim for sim, _ in full[:5]], abs=1e-6)
+        assert len(mfm.knn(query, ids[:3], vecs[:3], limit=10)) == 3
+        assert mfm.knn(query, [], [], limit=5) == []
+
+    def test_sparse_query_matches_dense_scoring(self, monkeypatch):
+        monkeypatch.setattr(mfm, "np", None)  # the sparse shortcut is the pure-Python path
+        ids = list(range(30))
+        vecs = [mfm.hash_embed(f"clip {i} about topic {i % 4}") for i in ids]
+        for text in ("topic", "clip topic", ""):
+            query = mfm.hash_embed(text)
+            dense = sorted(((mfm.cosine(query, v), cid) for cid, v in zip(ids, vecs)), key=lambda x: x[0], reverse=True)
+            assert mfm.knn(query, ids, vecs, limit=8) == dense[:8]
+
+    def test_float32_rows_match_lists(self):
+        ids = list(range(20))
+        vecs = [mfm.hash_embed(f"row {i} {i % 3}") for i in ids]
+        query = mfm.hash_embed("row 2")
+        packed = [mfm.vector_array(mfm.pack_vector(v)) for v in vecs]
+        got = mfm.knn(query, ids, packed, limit=5)
+        want = mfm.knn(query, ids, vecs, limit=5)
+        assert [cid for _, cid in got] == [cid for _, cid in want]
+        assert [sim for sim, _ in got] == pytest.approx([sim for sim, _ in want], abs=1e-6)
+
+    def test_ties_at_cutoff_keep_input_order(self, monkeypatch):
+        ids = list(range(10, 20))
+        vecs = [[1.0, 0.0]] * 10
+        vecs[3] = [0.0, 1.0]
+        query = [0.6, 0.8]  # id 13 scores 0.8, every other clip ties at 0.6
+        assert [cid for _, cid in mfm.knn(query, ids, vecs, limit=3)] == [13, 10, 11]
+        monkeypatch.setattr(mfm, "np", None)  # pure-Python path agrees
+        assert [cid for _, cid in mfm.knn(query, ids, vecs, limit=3)] == [13, 10, 11]
+
 
 class TestStoreAndLoadEmbedding:
     def test_round_trip(self, conn):
@@ -412,8 +732,24 @@ class TestStoreAndLoadEmbedding:
         vec = [0.1, 0.2, 0.3]
         mfm.store_embedding(conn, cid, vec, "hash")
         row = conn.execute("SELECT * FROM clip_vectors WHERE clip_id = ?", (cid,)).fetchone()
+        assert isinstance(row["vector"], bytes) and len(row["vector"]) == 4 * len(vec)
         loaded = mfm.load_embedding(row)
-        assert loaded == vec
+        assert loaded == pytest.approx(vec, rel=1e-6)
+
+    def test_legacy_json_rows_repacked(self, conn):
+        conn.execute(
+            "INSERT INTO clips (created_at, source_app, window_title, content, hash, pinned, lang) VALUES (?,?,?,?,?,0,'unk')",
+            ("2026-01-01", "App", "Win", "test", "abc", ),
+        )
+        cid = conn.execute("SELECT id FROM clips LIMIT 1").fetchone()["id"]
+        conn.execute("INSERT INTO clip_vectors(clip_id, dim, vector, model) VALUES (?, 2, '[0.5, 0.25]', 'hash')", (cid,))
+        assert mfm.load_embedding(conn.execute("SELECT vector FROM clip_vectors").fetchone()) == [0.5, 0.25]
+        conn.execute("DELETE FROM settings WHERE key = 'vector_format'")
+        conn.commit()
+        mfm.init_db(conn)
+        row = conn.execute("SELECT vector FROM clip_vectors WHERE clip_id = ?", (cid,)).fetchone()
+        assert isinstance(row["vector"], bytes)
+        assert mfm.load_embedding(row) == [0.5, 0.25]
 
 
 # ──────────────────────────────────────────────
@@ -433,6 +769,13 @@ class TestParseIsoDt:
         result = mfm.parse_iso_dt("2026-01-15T10:00:00+00:00")
         assert result is not None
 
+    def test_normalizes_like_isoformat(self):
+        assert mfm.parse_iso_dt("2026-01-15T10:00:00+05:30") == "2026-01-15T10:00:00+05:30"
+        assert mfm.parse_iso_dt("2026-01-15T10:00:00-00:00") == "2026-01-15T10:00:00+00:00"
+        assert mfm.parse_iso_dt("2026-01-15 10:00:00Z") == "2026-01-15T10:00:00+00:00"
+        assert mfm.parse_iso_dt("2026-01-15") == "2026-01-15T00:00:00"
+        assert mfm.parse_iso_dt("2026-02-30T10:00:00") is None
+
 
 class TestIsoHoursAgo:
     def test_none_returns_none(self):
@@ -458,6 +801,319 @@ class TestResolveSyncTarget:
         assert result.name == "mfm.db"
 
 
+class TestFilteredQueries:
+    def test_filtered_rows_by_app(self, populated_db):
+        rows, tag_map = mfm.filtered_rows(populated_db, 10, app="vscode")
+        assert [row["source_app"] for row in rows] == ["VSCode"]
+        assert tag_map == {}
+
+    def test_keyset_pagination(self, conn):
+        for i in range(5):
+            conn.execute(
+                "INSERT INTO clips (created_at, source_app, content, hash) VALUES (?, 'App', ?, ?)",
+                (f"2026-01-0{i + 1}T00:00:00+00:00", f"clip {i}", f"h{i}"),
+            )
+        conn.commit()
+        page1, _ = mfm.filtered_rows(conn, 2)
+        assert [row["content"] for row in page1] == ["clip 4", "clip 3"]
+        page2, _ = mfm.filtered_rows(conn, 2, before=page1[-1]["created_at"])
+        assert [row["content"] for row in page2] == ["clip 2", "clip 1"]
+        newer, _ = mfm.filtered_rows(conn, 10, after=page2[0]["created_at"])
+        assert [row["content"] for row in newer] == ["clip 4", "clip 3"]
+
+    def test_keyset_pagination_across_timestamp_tie(self, conn):
+        now = "2026-01-01T00:00:00+00:00"
+        conn.executemany(
+            "INSERT INTO clips (created_at, source_app, content, hash) VALUES (?, 'App', ?, ?)",
+            [(now, f"clip {i}", f"h{i}") for i in range(6)],
+        )
+        conn.commit()
+        page1, _ = mfm.filtered_rows(conn, 4)
+        last = page1[-1]
+        page2, _ = mfm.filtered_rows(conn, 4, before=last["created_at"], before_id=last["id"])
+        seen = [row["content"] for row in page1 + page2]
+        assert sorted(seen) == [f"clip {i}" for i in range(6)]
+        assert len(set(seen)) == 6
+        first = page2[0]
+        newer, _ = mfm.filtered_rows(conn, 10, after=first["created_at"], after_id=first["id"])
+        assert [row["id"] for row in newer] == [row["id"] for row in page1]
+
+    def test_search_rows_match(self, populated_db):
+        rows = mfm.search_rows(populated_db, "hello", 10)
+        assert [row["content"] for row in rows] == ["hello world"]
+
+    def test_search_rows_rank_sort(self, conn):
+        mfm.insert_clip(conn, "alpha alpha alpha gamma", "App", "Win")
+        mfm.insert_clip(conn, "alpha beta delta epsilon zeta", "App", "Win")
+        rows = mfm.search_rows(conn, "alpha", 10, sort="rank")
+        assert rows[0]["content"] == "alpha alpha alpha gamma"
+
+    def test_search_rows_filters(self, populated_db):
+        assert mfm.search_rows(populated_db, "hello", 10, app="VSCode") == []
+
+    def test_sql_preview_matches_python(self, conn):
+        content = "line one\nline two\n" + "x" * 50
+        mfm.insert_clip(conn, content, "App", "Win")
+        rows, _ = mfm.filtered_rows(conn, 1, preview=20)
+        assert mfm.clip_preview(rows[0], 20) == mfm.clip_preview({"content": content}, 20)
+        assert mfm.clip_preview(rows[0], 20) == "line one\\nline tw..."
+
+    def test_clip_line(self):
+        row = {"id": 7, "pinned": 1, "source_app": "App", "content": "a\nb", "title": "T", "lang": "en"}
+        assert mfm.clip_line(row, 80, ["x", "y"], meta="sim=0.500 ") == '*#    7 sim=0.500 [App] a\\nb "T" tags=x,y lang=en'
+        row.update(pinned=0, title=None, lang="unk")
+        assert mfm.clip_line(row, 80, notes=2) == " #    7 [App] a\\nb notes=2"
+
+    def test_sql_builders_are_cached(self):
+        a = mfm.filtered_rows_sql(True, False, False, False, False, False)
+        b = mfm.filtered_rows_sql(True, False, False, False, False, False)
+        assert a is b
+        assert "clips_fts MATCH ?" in mfm.fts_search_sql(False, True, False, False, False)
+
+    def test_unfiltered_export_matches_filtered_path(self, populated_db):
+        mfm.assign_tag(populated_db, 1, "greeting")
+        mfm.assign_tag(populated_db, 1, "demo")
+        mfm.add_note(populated_db, 1, "first note")
+        fast = mfm.export_items(populated_db, 10)
+        slow = mfm.export_items(populated_db, 10, since_iso="2000-01-01T00:00:00+00:00")
+        assert fast == slow
+        by_id = {item["id"]: item for item in fast}
+        assert by_id[1]["tags"] == ["demo", "greeting"]
+        assert [n["note"] for n in by_id[1]["notes"]] == ["first note"]
+        assert by_id[2]["tags"] == [] and by_id[2]["notes"] == []
+
+
+class TestJsonBytes:
+    def test_round_trip_with_and_without_orjson(self, monkeypatch):
+        data = {"items": [{"id": 1, "content": "héllo ✓", "score": 0.5}], 7: True}
+        expected = {"items": [{"id": 1, "content": "héllo ✓", "score": 0.5}], "7": True}
+        fast = mfm.json_bytes(data)
+        assert json.loads(fast) == expected
+        monkeypatch.setattr(mfm, "orjson", None)
+        body = mfm.json_bytes(data)
+        assert "héllo ✓".encode("utf-8") in body
+        assert json.loads(body) == expected
+        assert body == fast  # same bytes with or without orjson
+
+
+class TestApiRoutes:
+    def test_route_tables(self):
+        get_routes = mfm.ApiHandler.GET_ROUTES
+        assert {"/", "/recent", "/search", "/semantic_search", "/clip", "/export_md"} <= set(get_routes)
+        assert get_routes["/"] is get_routes["/ui"]
+        assert {"/pin", "/ingest_url", "/dropper", "/purge"} <= set(mfm.ApiHandler.POST_ROUTES)
+        assert mfm.ApiHandler.UNLOCKED_POSTS <= set(mfm.ApiHandler.POST_ROUTES)
+
+    def test_pin_sql_toggles_sets_and_misses(self, populated_db):
+        toggle = lambda state, cid: populated_db.execute(mfm.PIN_SQL, (state, cid)).fetchone()
+        assert toggle(None, 1)["pinned"] == 1
+        assert toggle(None, 1)["pinned"] == 0
+        assert toggle(1, 1)["pinned"] == 1
+        assert toggle(1, 1)["pinned"] == 1
+        assert toggle(None, 999) is None
+
+    @contextlib.contextmanager
+    def _api_server(self, tmp_path, monkeypatch):
+        """Yield (port, writer) for an ApiServer on a throwaway database."""
+        import functools
+        import threading
+
+        monkeypatch.setattr(mfm, "DB_DIR", tmp_path)
+        monkeypatch.setattr(mfm, "DB_PATH", tmp_path / "db.sqlite3")
+        writer = mfm.connect_db(check_same_thread=False)
+        mfm.init_db(writer)
+        pool = mfm.ReadPool(2)
+        handler = functools.partial(mfm.ApiHandler, pool=pool, writer=writer, write_lock=threading.Lock())
+        server = mfm.ApiServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            yield server.server_address[1], writer
+        finally:
+            server.shutdown()
+            server.server_close()
+            pool.close()
+            writer.close()
+
+    def test_keep_alive_serves_several_requests_per_connection(self, tmp_path, monkeypatch):
+        import http.client
+
+        with self._api_server(tmp_path, monkeypatch) as (port, writer):
+            mfm.insert_clip(writer, "served over keep-alive", "App", "Win")
+            client = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            client.request("POST", "/pause", body=b'{"ignored": true}')
+            assert json.loads(client.getresponse().read()) == {"paused": True}
+            client.request("GET", "/export_md?limit=5")
+            resp = client.getresponse()
+            assert resp.getheader("Transfer-Encoding") == "chunked"
+            assert "served over keep-alive" in resp.read().decode("utf-8")
+            client.request("GET", "/health")
+            assert json.loads(client.getresponse().read()) == {"ok": True}
+            client.close()
+
+    def test_chunked_post_body_is_drained_before_next_request(self, tmp_path, monkeypatch):
+        import socket
+
+        with self._api_server(tmp_path, monkeypatch) as (port, writer):
+            with socket.create_connection(("127.0.0.1", port), timeout=5) as sock:
+                body = b"".join(b"%x\r\n%s\r\n" % (len(part), part) for part in (b'{"ignored":', b" true}"))
+                sock.sendall(
+                    b"POST /pause HTTP/1.1\r\nHost: x\r\nTransfer-Encoding: chunked\r\n\r\n"
+                    + body
+                    + b"0\r\n\r\n"
+                    + b"GET /health HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n"
+                )
+                replies = b""
+                while chunk := sock.recv(65536):
+                    replies += chunk
+            assert replies.count(b"HTTP/1.1 200") == 2
+            assert b'"paused"' in replies
+            assert b"Bad request" not in replies
+
+    def test_failed_post_rolls_back_shared_writer(self, tmp_path, monkeypatch):
+        import http.client
+
+        monkeypatch.setattr(mfm.ApiServer, "handle_error", lambda self, request, client_address: None)
+        with self._api_server(tmp_path, monkeypatch) as (port, writer):
+            client = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            # clip 99999 doesn't exist: add_note's INSERT fails the foreign key check
+            client.request("POST", "/notes", body=b'{"id": 99999, "note": "x"}')
+            with pytest.raises(http.client.RemoteDisconnected):
+                client.getresponse()
+            client.close()
+            assert not writer.in_transaction
+
+
+class TestListParams:
+    def test_defaults(self):
+        p = mfm.ListParams.from_qs(mfm.parse_query(""), default_limit=20)
+        assert p.limit == 20
+        assert p.app is None and p.tag is None
+        assert p.pins_only is False
+        assert p.since_iso is None and p.hours is None
+
+    def test_parses_values(self):
+        qs = mfm.parse_query("limit=5&app=Term&pins_only=yes&since=2026-01-01T00:00:00&app=other")
+        p = mfm.ListParams.from_qs(qs)
+        assert p.limit == 5
+        assert p.app == "Term"
+        assert p.pins_only is True
+        assert p.since_iso == "2026-01-01T00:00:00"
+
+    def test_hours_overrides_since(self):
+        p = mfm.ListParams.from_qs({"hours": "1", "since": "2020-01-01T00:00:00"})
+        assert p.hours == 1.0
+        assert p.since_iso > "2020-01-02"
+
+    def test_bad_numbers_fall_back(self):
+        p = mfm.ListParams.from_qs({"limit": "lots", "hours": "soon", "pool": "big"}, default_limit=7)
+        assert p.limit == 7
+        assert p.hours is None
+        assert p.pool == 2000
+
+    def test_pool_parsed(self):
+        assert mfm.ListParams.from_qs({"pool": "300"}).pool == 300
+
+    def test_field_cap(self):
+        with pytest.raises(ValueError):
+            mfm.parse_query("&".join(f"k{i}=v" for i in range(mfm.QUERY_MAX_FIELDS + 1)))
+
+
+class TestSemanticFetch:
+    def test_candidates_then_rows_by_id(self, conn):
+        ids = [mfm.insert_clip(conn, text, "App", "Win") for text in ("red apple", "green pear", "blue sky")]
+        cand_ids, vecs = mfm.fetch_candidate_vectors(conn, "hash", 10)
+        assert sorted(cand_ids) == sorted(ids)
+        assert len(vecs) == 3
+        ranked = [ids[2], ids[0]]
+        rows = mfm.fetch_rows_by_id(conn, ranked)
+        assert [row["id"] for row in rows] == ranked
+        assert rows[0]["content"] == "blue sky"
+
+    def test_rows_by_id_empty(self, conn):
+        assert mfm.fetch_rows_by_id(conn, []) == []
+
+    def test_shared_index_write_through_and_background_refresh(self, tmp_path):
+        c = sqlite3.connect(str(tmp_path / "vec.db"))
+        c.row_factory = sqlite3.Row
+        mfm.init_db(c)
+        first = mfm.insert_clip(c, "alpha beta", "App", "Win")
+        index = mfm.get_vector_index(c, "hash", refresh=False)
+        assert index.loaded and list(index.vecs) == [first]
+        second = mfm.insert_clip(c, "gamma delta", "App", "Win")
+        assert second in index.vecs  # added by store_embedding, no refresh needed
+        c.execute("DELETE FROM clip_vectors WHERE clip_id = ?", (first,))
+        c.commit()
+        assert mfm.get_vector_index(c, "hash", refresh=False) is index
+        assert first in index.vecs
+        mfm.refresh_vector_indexes(c)
+        assert list(index.vecs) == [second]
+        mfm._VECTOR_INDEXES.clear()
+        c.close()
+
+    def test_index_signature_uses_model_index(self, conn):
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT COUNT(*), COALESCE(MAX(clip_id), 0) FROM clip_vectors WHERE model = ?", ("hash",)
+        ).fetchall()
+        assert any("idx_clip_vectors_model" in row[-1] for row in plan)
+
+    def test_annotated_rows_carry_tags_and_notes(self, conn):
+        ids = [mfm.insert_clip(conn, text, "App", "Win") for text in ("red apple", "green pear")]
+        mfm.assign_tag(conn, ids[0], "zeta")
+        mfm.assign_tag(conn, ids[0], "alpha")
+        mfm.add_note(conn, ids[0], "first")
+        mfm.add_note(conn, ids[0], "second")
+        rows = mfm.fetch_rows_by_id(conn, ids, annotated=True)
+        assert json.loads(rows[0]["tags_json"]) == mfm.tags_for_clips(conn, ids)[ids[0]]
+        assert json.loads(rows[0]["notes_json"]) == mfm.notes_for_clips(conn, ids)[ids[0]]
+        assert json.loads(rows[1]["tags_json"]) == []
+        detail = conn.execute(mfm.CLIP_DETAIL_SQL, (ids[0],)).fetchone()
+        assert json.loads(detail["tags_json"]) == ["alpha", "zeta"]
+
+    def test_vector_index_refreshes_and_matches_knn(self, conn):
+        ids = [mfm.insert_clip(conn, text, "App", "Win") for text in ("red apple", "green pear", "blue sky")]
+        index = mfm.get_vector_index(conn, "hash")
+        assert sorted(index.vecs) == sorted(ids)
+        ids.append(mfm.insert_clip(conn, "red sky", "App", "Win"))
+        index.refresh(conn)
+        assert sorted(index.vecs) == sorted(ids)
+        conn.execute("DELETE FROM clips WHERE id = ?", (ids[1],))
+        conn.commit()
+        index.refresh(conn)
+        assert ids[1] not in index.vecs
+        pool = mfm.fetch_candidate_ids(conn, "hash", 10)
+        qvec = mfm.hash_embed("red")
+        cand_ids, vecs = mfm.fetch_candidate_vectors(conn, "hash", 10)
+        assert sorted(pool) == sorted(cand_ids)
+        found = index.search(qvec, pool, 2)
+        expected = mfm.knn(qvec, cand_ids, vecs, 2)
+        assert [cid for _, cid in found] == [cid for _, cid in expected]
+        assert [sim for sim, _ in found] == pytest.approx([sim for sim, _ in expected], abs=1e-6)
+
+
+class TestMarkdownOutline:
+    def test_streams_one_block_per_day(self, conn):
+        rows = [
+            ("2026-01-16T09:00:00+00:00", "Terminal", "ls", "h1"),
+            ("2026-01-15T11:00:00+00:00", "VSCode", "def f():\n    pass", "h2"),
+            ("2026-01-15T10:00:00+00:00", "Terminal", "pwd", "h3"),
+        ]
+        for ts, app, content, h in rows:
+            conn.execute(
+                "INSERT INTO clips (created_at, source_app, window_title, content, hash, pinned, lang) VALUES (?,?,'',?,?,0,'unk')",
+                (ts, app, content, h),
+            )
+        conn.commit()
+        mfm.assign_tag(conn, 1, "shell")
+        blocks = list(mfm.iter_markdown_outline(conn, None, limit=10))
+        assert blocks[0] == "# my--father-mother journal (latest 3 clips)"
+        assert blocks[1].startswith("\n\n## 2026-01-16")
+        assert blocks[2].startswith("\n\n## 2026-01-15\n- **Terminal**")
+        assert blocks[3] == "\n\n## Tag totals\n- shell: 1"
+        md, count = mfm.build_markdown_outline(conn, None, limit=2)
+        assert count == 2
+        assert md == "".join(mfm.iter_markdown_outline(conn, None, limit=2))
+
+
 class TestStats:
     def test_empty_db(self, conn):
         s = mfm.stats(conn)
@@ -543,6 +1199,71 @@ class TestEmbedFromKind:
         assert model == "hash"
         assert len(vec) == mfm.EMBED_DIM
 
+    def test_batch_matches_single(self):
+        vecs, model = mfm.embed_batch("hash", ["alpha beta", "gamma"])
+        assert model == "hash"
+        assert vecs == [mfm.hash_embed("alpha beta"), mfm.hash_embed("gamma")]
+
+    def _run_batched(self, batcher, n):
+        import threading
+
+        results = {}
+        gate = threading.Barrier(n)
+
+        def worker(i):
+            gate.wait()
+            results[i] = batcher.embed("e5-small", f"query {i}")
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(timeout=5)
+        return results
+
+    def test_batcher_coalesces_concurrent_queries(self, monkeypatch):
+        batches = []
+        singles = []
+
+        def fake_batch(kind, texts):
+            batches.append(list(texts))
+            return [mfm.hash_embed(t) for t in texts], "fake"
+
+        def fake_single(kind, text):
+            singles.append(text)
+            return mfm.hash_embed(text), "fake"
+
+        monkeypatch.setattr(mfm, "embed_batch", fake_batch)
+        monkeypatch.setattr(mfm, "embed_from_kind", fake_single)
+        batcher = mfm.EmbedBatcher()
+        batcher.WINDOW_S = 0.5  # wide enough that all queued queries share a batch
+        results = self._run_batched(batcher, 8)
+        assert len(results) == 8
+        assert singles == []
+        assert len(batches) < 8
+        assert sorted(t for batch in batches for t in batch) == sorted(f"query {i}" for i in range(8))
+        for i, (vec, model) in results.items():
+            assert model == "fake"
+            assert vec == mfm.hash_embed(f"query {i}")
+
+    def test_batcher_failure_is_logged_and_falls_back(self, monkeypatch, capsys):
+        def broken_batch(kind, texts):
+            raise RuntimeError("model exploded")
+
+        monkeypatch.setattr(mfm, "embed_batch", broken_batch)
+        monkeypatch.setattr(mfm, "embed_from_kind", lambda kind, text: (mfm.hash_embed(text), "fake"))
+        results = self._run_batched(mfm.EmbedBatcher(), 2)
+        assert {model for _, model in results.values()} == {"fake"}
+        assert "batched embed failed" in capsys.readouterr().out
+
+    def test_query_embed_is_memoized(self):
+        mfm.cached_query_embed.cache_clear()
+        first = mfm.cached_query_embed("hash", "repeat me")
+        second = mfm.cached_query_embed("hash", "repeat me")
+        assert first is second
+        assert list(first[0]) == mfm.hash_embed("repeat me")
+        assert mfm.cached_query_embed.cache_info().hits == 1
+
 
 class TestCopilotChats:
     def test_add_and_list(self, conn):
@@ -569,9 +1290,41 @@ class TestCopilotChats:
         mfm.add_copilot_chat(conn, "B", None, None)
         assert mfm.copilot_chat_count(conn) == 2
 
+    def test_add_many(self, conn):
+        chats = [(f"chat {i}", f"t{i}", "gemini-2.5-flash") for i in range(1000)] + [("  ", None, None)]
+        assert mfm.add_copilot_chats(conn, chats) == 1000
+        assert mfm.copilot_chat_count(conn) == 1000
+        assert mfm.add_copilot_chats(conn, []) == 0
+
     def test_clear(self, conn):
         mfm.add_copilot_chat(conn, "A", None, None)
         mfm.add_copilot_chat(conn, "B", None, None)
         cleared = mfm.clear_copilot_chats(conn)
         assert cleared == 2
         assert mfm.copilot_chat_count(conn) == 0
+        assert mfm.clear_copilot_chats(conn) == 0
+
+
+class TestParser:
+    def test_sniff_subcommand(self):
+        assert mfm.sniff_subcommand(["recent", "--limit", "3"]) == "recent"
+        assert mfm.sniff_subcommand(["-h"]) is None
+        assert mfm.sniff_subcommand(["bogus"]) is None
+        assert mfm.sniff_subcommand([]) is None
+
+    def test_single_subparser_matches_full_build(self):
+        argv = ["search", "hello", "--limit", "3", "--sort", "rank"]
+        full = mfm.build_parser().parse_args(argv)
+        lazy = mfm.build_parser(mfm.sniff_subcommand(argv)).parse_args(argv)
+        assert vars(full) == vars(lazy)
+
+    def test_parsers_are_cached(self):
+        assert mfm.build_parser() is mfm.build_parser()
+        assert mfm.build_parser("recent") is mfm.build_parser("recent")
+        first = mfm.build_parser("recent").parse_args(["recent", "--limit", "2"])
+        second = mfm.build_parser("recent").parse_args(["recent"])
+        assert (first.limit, second.limit) == (2, 10)
+
+    def test_full_build_registers_every_command(self):
+        sub = next(a for a in mfm.build_parser()._actions if isinstance(a, argparse._SubParsersAction))
+        assert list(sub.choices) == list(mfm.SUBPARSER_BUILDERS)
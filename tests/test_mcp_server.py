@@ -0,0 +1,68 @@
+"""Tests for scripts/mcp_server.py — query parsing and response streaming."""
+
+import http.client
+import json
+import threading
+import urllib.parse
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import main as mfm
+from scripts import mcp_server as mcp
+
+
+# ──────────────────────────────────────────────
+# Query strings
+# ──────────────────────────────────────────────
+
+class TestParseQsFast:
+    @pytest.mark.parametrize(
+        "query",
+        [
+            "",
+            "q=hello&limit=5",
+            "q=a%20b+c&app=Term",
+            "a%2Bb=1&c+d=2",  # escapes in keys only
+            "q=&limit=3&app",  # blank values are dropped
+            "q=first&q=second&limit=1&limit=2",  # first value wins
+            "q=100%25&tag=%E2%9C%93",
+            "&&q=x&&",
+        ],
+    )
+    def test_matches_parse_qs(self, query):
+        expected = {k: v[0] for k, v in urllib.parse.parse_qs(query).items()}
+        assert mcp._parse_qs_fast(query) == expected
+
+
+# ──────────────────────────────────────────────
+# Responses
+# ──────────────────────────────────────────────
+
+class TestSendJson:
+    def test_large_body_streams_chunked_without_orjson(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(mfm, "DB_DIR", tmp_path)
+        monkeypatch.setattr(mfm, "DB_PATH", tmp_path / "db.sqlite3")
+        monkeypatch.setattr(mcp, "orjson", None)
+        monkeypatch.setattr(mcp, "_TLS", threading.local())  # don't leak this DB's connection
+        conn = mfm.connect_db()
+        mfm.init_db(conn)
+        for i in range(20):
+            mfm.insert_clip(conn, f"clip {i} " + "x" * 8000, "App", "Win")
+        conn.close()
+        server = ThreadingHTTPServer(("127.0.0.1", 0), mcp.MCPHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            client = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=5)
+            client.request("GET", "/mcp/recent?limit=20")
+            resp = client.getresponse()
+            body = resp.read()
+            client.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert resp.getheader("Transfer-Encoding") == "chunked"
+        assert resp.getheader("Content-Length") is None
+        assert len(body) > mcp.STREAM_THRESHOLD
+        assert len(json.loads(body)["items"]) == 20
+        assert body == mcp.json_bytes({"items": mcp.recent_items(limit=20)})